@@ -0,0 +1,275 @@
+import glob
+import os
+import re
+import threading
+from collections import Counter, namedtuple
+from datetime import date, datetime
+from history import POSTS
+from models import SKIPPED
+from utils import notify
+from utils.time_utils import (
+    DEFAULT_START_SLOT, ROUTE_4POST, ROUTE_5POST, RULES_4POST, RULES_5POST, START_SLOTS, THEATERS,
+    format_minutes, to_minutes
+)
+
+# 日報1件分（day: 日付の序数, start: 4ポストの巡回開始[分]（不明なら-1）, skipped: 巡回しなかった枠の数）
+ReportRow = namedtuple('ReportRow', [
+    'day', 'slot', 'start', 'large', 'medium', 'small', 'skipped', 'work_type',
+    'post4', 'post5', 'post1', 'supervisor',
+])
+
+THEATER_LABELS = {'large': '大劇場', 'medium': '中劇場（楽屋）', 'small': '小劇場'}
+
+# 勤務時間（K4）から勤務区分を判定する（それ以外は通常）
+WORK_HOURS = {'7:30～23:00': '早出', '8:00～24:00': '残業'}
+
+# 劇場を使用していない日のコメント
+_DEFAULT_COMMENTS = {slot.default_comment for slot in START_SLOTS.values()}
+_SHEET_NAME_RE = re.compile(r"(\d{1,2})\.(\d{1,2})")
+_FILE_DATE_RE = re.compile(r"(20\d{2})(\d{2})(\d{2})")
+
+
+def _comment_cell(start_cell):
+    return start_cell.replace('C', 'F')
+
+
+def row_from_history(report_date, patrol_data, records):
+    """履歴の1件（PatrolDataと時間記録）をReportRowに変換"""
+    starts = [record.start for post, _, record in records
+              if post == '4ポスト' and record.start is not None and record.start >= 0]
+    skipped = sum(1 for _, cell, record in records if cell is not None and record.start == SKIPPED)
+    return ReportRow(
+        report_date.toordinal(), patrol_data.patrol_start, min(starts) if starts else -1,
+        patrol_data.large_theater_used, patrol_data.medium_theater_used,
+        patrol_data.small_theater_used, skipped, patrol_data.work_type,
+        patrol_data.post4, patrol_data.post5, patrol_data.post1, patrol_data.supervisor,
+    )
+
+
+def row_from_cells(report_date, cells):
+    """作成済みシートのセルの値 {セル番地: 値} をReportRowに変換
+
+    劇場の使用は巡回コメントから、巡回開始時刻の区分は4ポストの最初の時刻から判定する。
+    """
+    start_value = str(cells.get(ROUTE_4POST[0][0]) or "")
+    start = to_minutes(start_value) if ":" in start_value else -1
+    slots = [(slot.base, name) for name, slot in START_SLOTS.items() if 0 <= slot.base <= start]
+    routes = [start_cell for start_cell, _ in ROUTE_4POST] + [start_cell for start_cell, _, _ in ROUTE_5POST]
+    used = {}
+    for name, _ in THEATERS:
+        rule_cells = ([_comment_cell(ROUTE_4POST[index][0]) for index in RULES_4POST[name]]
+                      + [_comment_cell(ROUTE_5POST[index][0]) for index in RULES_5POST[name]])
+        used[name] = bool(rule_cells) and all(cells.get(cell) not in _DEFAULT_COMMENTS for cell in rule_cells)
+    work_type = WORK_HOURS.get(cells.get('K4'), '通常')
+    return ReportRow(
+        report_date.toordinal(), max(slots)[1] if slots else DEFAULT_START_SLOT, start,
+        used['large'], used['medium'], used['small'],
+        sum(1 for cell in routes if cells.get(cell) == "-"), work_type,
+        str(cells.get('F6') or ""), str(cells.get('F7') or ""),
+        "" if work_type == '早出' else str(cells.get('E10') or ""), str(cells.get('J5') or ""),
+    )
+
+
+def rows_from_workbook(path, year=None):
+    """作成済みの日報ファイルから、記入済みの日付シートをReportRowとして読み込む
+
+    年はファイル名の日付（日報_YYYYMMDD.xlsx）から、なければ更新日時から判定する。
+    """
+    if year is None:
+        match = _FILE_DATE_RE.search(os.path.basename(path))
+        year = int(match.group(1)) if match else datetime.fromtimestamp(os.path.getmtime(path)).year
+    # 集計に使う範囲だけを読むため、読み取り専用モードで開く
+    from openpyxl import load_workbook
+    from openpyxl.utils import get_column_letter
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = []
+        for ws in wb.worksheets:
+            match = _SHEET_NAME_RE.fullmatch(ws.title)
+            if not match:
+                continue
+            cells = {}
+            for row_number, values in enumerate(ws.iter_rows(max_row=41, max_col=12, values_only=True), 1):
+                for col, value in enumerate(values, 1):
+                    if value is not None:
+                        cells[f"{get_column_letter(col)}{row_number}"] = value
+            # 担当者が入っていないシートは未作成として除く
+            if not cells.get('F6'):
+                continue
+            try:
+                report_date = date(year, int(match.group(1)), int(match.group(2)))
+            except ValueError:
+                continue
+            rows.append(row_from_cells(report_date, cells))
+        return rows
+    finally:
+        wb.close()
+
+
+class ReportTable:
+    """日報を1行とした列ごとの一覧（同じ日付は新しい内容で置き換える）
+
+    集計時はNumPyがあれば列ごとの配列に変換し、追加・置き換えがあるまで使い回す。
+    """
+
+    def __init__(self):
+        self.columns = {name: [] for name in ReportRow._fields}
+        self._rows = {}  # 日付の序数 -> 行番号
+        self.version = 0
+        self._arrays = None
+
+    def __len__(self):
+        return len(self._rows)
+
+    def upsert(self, row):
+        index = self._rows.get(row.day)
+        if index is None:
+            self._rows[row.day] = len(self._rows)
+            for name, value in zip(ReportRow._fields, row):
+                self.columns[name].append(value)
+        else:
+            for name, value in zip(ReportRow._fields, row):
+                self.columns[name][index] = value
+        self.version += 1
+        self._arrays = None
+
+    def arrays(self):
+        """列名 -> 配列（NumPyがなければリスト）"""
+        if self._arrays is None:
+            try:
+                import numpy as np
+            except ImportError:
+                self._arrays = self.columns
+            else:
+                self._arrays = {name: np.asarray(values) for name, values in self.columns.items()}
+        return self._arrays
+
+
+def _select(columns, first_day, last_day):
+    """期間内の行だけを取り出した列"""
+    days = columns['day']
+    if hasattr(days, 'dtype'):
+        mask = (days >= first_day) & (days <= last_day)
+        return {name: values[mask] for name, values in columns.items()}
+    indexes = [i for i, day in enumerate(days) if first_day <= day <= last_day]
+    return {name: [values[i] for i in indexes] for name, values in columns.items()}
+
+
+def _counts(values):
+    """値ごとの件数（値の順）"""
+    if hasattr(values, 'dtype'):
+        import numpy as np
+        keys, counts = np.unique(values, return_counts=True)
+        return {key.item(): int(count) for key, count in zip(keys, counts)}
+    return dict(sorted(Counter(values).items()))
+
+
+def _total(values):
+    return int(values.sum()) if hasattr(values, 'dtype') else sum(values)
+
+
+def summarize(columns, start_date, end_date):
+    """期間内の日報の集計"""
+    selected = _select(columns, start_date.toordinal(), end_date.toordinal())
+    starts = selected['start']
+    skipped = selected['skipped']
+    if hasattr(starts, 'dtype'):
+        starts = starts[starts >= 0]
+        days_with_skips = int((skipped > 0).sum())
+        medium_skipped = int(((skipped > 0) & selected['medium']).sum()) if len(skipped) else 0
+    else:
+        starts = [start for start in starts if start >= 0]
+        days_with_skips = sum(1 for value in skipped if value > 0)
+        medium_skipped = sum(1 for value, medium in zip(skipped, selected['medium']) if value > 0 and medium)
+    post_counts = []
+    for post, field in POSTS:
+        for staff, count in _counts(selected[field]).items():
+            if staff:
+                post_counts.append((staff, post, count))
+    return {
+        'reports': len(selected['day']),
+        'start_distribution': [(format_minutes(minutes), count) for minutes, count in _counts(starts).items()],
+        'average_start': format_minutes(round(_total(starts) / len(starts))) if len(starts) else None,
+        'slot_counts': _counts(selected['slot']),
+        'theater_days': {name: _total(selected[name]) for name, _ in THEATERS},
+        'skipped_patrols': _total(skipped),
+        'days_with_skips': days_with_skips,
+        'medium_days_with_skips': medium_skipped,
+        'work_types': _counts(selected['work_type']),
+        'post_counts': sorted(post_counts),
+    }
+
+
+class ReportAnalytics:
+    """作成した日報の集計（読み込みも集計も前回からの差分だけを処理する）
+
+    履歴からは前回読み込んだidより後の日報だけを、フォルダからは追加・更新されたファイルだけを
+    読み込む。期間ごとの集計結果は一覧が変わるまで保持する。
+    """
+
+    def __init__(self):
+        self.table = ReportTable()
+        self._last_report_id = 0
+        self._file_mtimes = {}
+        self._summaries = {}
+        self._lock = threading.Lock()
+
+    def refresh_from_history(self, history):
+        """履歴に追加された日報を読み込み、読み込んだ件数を返す"""
+        with self._lock:
+            reports = history.reports_after(self._last_report_id)
+            for report_id, report_date, patrol_data, records in reports:
+                self.table.upsert(row_from_history(report_date, patrol_data, records))
+                self._last_report_id = report_id
+            return len(reports)
+
+    def scan_folder(self, folder):
+        """フォルダ内の追加・更新された日報ファイルを読み込み、読み込んだファイル数を返す"""
+        with self._lock:
+            changed = []
+            for path in glob.glob(os.path.join(folder, "*.xlsx")):
+                mtime = os.stat(path).st_mtime_ns
+                if self._file_mtimes.get(path) != mtime:
+                    changed.append((mtime, path))
+            # 同じ日付が複数のファイルにある場合は新しいファイルの内容を使う
+            for mtime, path in sorted(changed):
+                try:
+                    rows = rows_from_workbook(path)
+                except Exception as e:
+                    notify.warning(f"{os.path.basename(path)} を読み込めませんでした: {e}")
+                    continue
+                for row in rows:
+                    self.table.upsert(row)
+                self._file_mtimes[path] = mtime
+            return len(changed)
+
+    def summary(self, start_date, end_date):
+        """期間内の日報の集計（一覧が変わっていなければ前回の結果を返す）"""
+        with self._lock:
+            key = (self.table.version, start_date, end_date)
+            result = self._summaries.get(key)
+            if result is None:
+                result = summarize(self.table.arrays(), start_date, end_date)
+                self._summaries = {k: v for k, v in self._summaries.items() if k[0] == self.table.version}
+                self._summaries[key] = result
+            return result
+
+
+_shared_analytics = None
+_folder_analytics = {}
+_analytics_lock = threading.Lock()
+
+
+def get_report_analytics():
+    """プロセス内で共有する履歴の集計"""
+    global _shared_analytics
+    with _analytics_lock:
+        if _shared_analytics is None:
+            _shared_analytics = ReportAnalytics()
+        return _shared_analytics
+
+
+def get_folder_analytics(folder):
+    """フォルダごとに共有する日報ファイルの集計"""
+    with _analytics_lock:
+        return _folder_analytics.setdefault(os.path.abspath(folder), ReportAnalytics())
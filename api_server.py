@@ -0,0 +1,357 @@
+"""日報作成のローカルHTTP API（他のシステムからの呼び出し用、Streamlitを使わない）
+
+    python api_server.py --port 8765 --workers 2
+
+POST /reports にテンプレートと巡回データのJSONを送ると、作成した日報（xlsx）を返す。
+
+    {
+        "template": "テンプレート（xlsx）のBase64",
+        "patrol_data": {"post4": "山田 太郎", ..., "work_type": "通常"},
+        "date": "2026-10-17",          省略時は本日
+        "seed": 1,                     省略時は毎回異なる巡回時間
+        "engine": "xml",               省略時は openpyxl
+        "output_profile": "fast"       省略時は default
+    }
+
+GET /health は作成件数・まとめた件数などを返す。
+作成はスレッドプール（--workers 件まで同時に実行）で行い、順番待ちが --max-pending を超えた場合は
+503を返す。同じテンプレート・同じ内容の作成が実行中の場合は、新たに作成せず実行中の結果を返す。
+既定では 127.0.0.1 だけで待ち受ける（同じ端末からのみ呼び出せる）。
+"""
+import argparse
+import asyncio
+import base64
+import binascii
+import http.client
+import json
+import logging
+import sys
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from urllib.parse import quote
+from cli import PATROL_FIELDS, patrol_data_from_row
+from jobs import max_workers_from_env
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# 順番待ちの上限（超えた場合は503を返す）
+DEFAULT_MAX_PENDING = 16
+# リクエスト本文の上限（テンプレート10MBのBase64とJSON）
+MAX_BODY_BYTES = 16 * 1024 * 1024
+# ヘッダーの読み込みを待つ時間[秒]
+HEADER_TIMEOUT = 10
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+logger = logging.getLogger("daily_report.api")
+
+
+class ApiError(Exception):
+    """HTTPのステータスコード付きのエラー"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_report_request(body):
+    """POST /reports のJSONを (テンプレート, PatrolData, 日付, 作成の指定) に変換"""
+    try:
+        data = json.loads(body)
+    except (UnicodeDecodeError, ValueError) as e:
+        raise ApiError(400, f"JSONを読み込めません: {e}")
+    if not isinstance(data, dict):
+        raise ApiError(400, "JSONのオブジェクトを送ってください。")
+    try:
+        template = base64.b64decode(data.get("template") or "", validate=True)
+    except (binascii.Error, TypeError, ValueError):
+        raise ApiError(400, "template はxlsxのBase64で指定してください。")
+    if not template:
+        raise ApiError(400, "template がありません。")
+    row = data.get("patrol_data")
+    if not isinstance(row, dict):
+        raise ApiError(400, "patrol_data がありません。")
+    missing = [name for name in PATROL_FIELDS if name not in row]
+    if missing:
+        raise ApiError(400, f"patrol_data の項目が不足しています: {', '.join(missing)}")
+    try:
+        report_date = date.fromisoformat(data["date"]) if data.get("date") else datetime.today().date()
+    except (TypeError, ValueError):
+        raise ApiError(400, f"date はYYYY-MM-DDで指定してください: {data.get('date')}")
+    seed = data.get("seed")
+    if seed is not None and (isinstance(seed, bool) or not isinstance(seed, int)):
+        raise ApiError(400, f"seed は整数で指定してください: {seed}")
+    options = {
+        "engine": data.get("engine") or "openpyxl",
+        "seed": seed,
+        "output_profile": data.get("output_profile") or None,
+    }
+    return template, patrol_data_from_row(row), report_date, options
+
+
+class ReportService:
+    """日報の作成をスレッドプールで実行し、実行中の同じ作成をまとめる
+
+    同じテンプレート（内容のハッシュ）・入力内容・日付・指定の作成が実行中の場合は、
+    新たに作成せず実行中の作成の完了を待って同じ結果を返す。
+    """
+
+    def __init__(self, max_workers=None, max_pending=DEFAULT_MAX_PENDING):
+        self.max_workers = max_workers or max_workers_from_env()
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix="report-api")
+        self._inflight = {}  # key -> 実行中の作成（asyncio.Future）
+        self.requests = 0
+        self.computed = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.failed = 0
+
+    async def write_report(self, template, patrol_data, report_date, engine="openpyxl",
+                           seed=None, output_profile=None):
+        """日報を作成して (xlsxのバイト列, 実行中の作成にまとめたか) を返す"""
+        from excel.template_cache import TemplateCache
+        self.requests += 1
+        key = (TemplateCache.hash_bytes(template), patrol_data.to_tuple(), report_date,
+               engine, seed, output_profile)
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            # 待っている側が切断しても、実行中の作成は取り消さない
+            return await asyncio.shield(future), True
+        if len(self._inflight) >= self.max_workers + self.max_pending:
+            self.rejected += 1
+            raise ApiError(503, "作成の順番待ちが多いため受け付けられません。しばらくしてから再度お試しください。")
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self._executor, _write_report, template, patrol_data, report_date,
+            engine, seed, output_profile
+        )
+        self._inflight[key] = future
+        self.computed += 1
+        try:
+            return await asyncio.shield(future), False
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def stats(self):
+        return {
+            "workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "in_flight": len(self._inflight),
+            "requests": self.requests,
+            "computed": self.computed,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+            "failed": self.failed,
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+def _write_report(template, patrol_data, report_date, engine, seed, output_profile):
+    """1件の日報を作成（スレッドプールで実行）"""
+    from excel.output_cache import get_output_cache
+    from excel.writer import ExcelWriter
+    writer = ExcelWriter(engine=engine, seed=seed, output_cache=get_output_cache(),
+                         output_profile=output_profile)
+    return writer.write_report(template, patrol_data, report_date)
+
+
+class ReportApiServer:
+    """ReportServiceをHTTPで公開する（asyncioのサーバー、1接続1リクエスト）"""
+
+    def __init__(self, service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.service = service
+        self.host = host
+        self.port = port
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        # port=0 の場合は割り当てられたポートを使う
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        started = time.perf_counter()
+        method = path = "-"
+        status = 0
+        try:
+            try:
+                method, path, headers = await asyncio.wait_for(_read_head(reader), HEADER_TIMEOUT)
+                status, body, extra = await self._dispatch(method, path, headers, reader)
+            except ApiError as e:
+                status, body, extra = e.status, _json_bytes({"error": str(e)}), {}
+            except asyncio.TimeoutError:
+                status, body, extra = 408, _json_bytes({"error": "リクエストの受信がタイムアウトしました。"}), {}
+            except Exception as e:
+                logger.exception("日報の作成に失敗しました")
+                status, body, extra = 500, _json_bytes({"error": f"日報の作成に失敗しました: {e}"}), {}
+            await _write_response(writer, status, body, extra)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            logger.info("%s %s %d %.3fs", method, path, status, time.perf_counter() - started)
+
+    async def _dispatch(self, method, path, headers, reader):
+        path = path.split("?", 1)[0]
+        if path == "/health":
+            if method != "GET":
+                raise ApiError(405, "GETで呼び出してください。")
+            return 200, _json_bytes(dict(self.service.stats(), status="ok")), {}
+        if path != "/reports":
+            raise ApiError(404, f"{path} はありません。")
+        if method != "POST":
+            raise ApiError(405, "POSTで呼び出してください。")
+
+        try:
+            length = int(headers.get("content-length", ""))
+        except ValueError:
+            raise ApiError(411, "Content-Lengthを指定してください。")
+        if length > MAX_BODY_BYTES:
+            raise ApiError(413, f"リクエストが大きすぎます（上限 {MAX_BODY_BYTES // (1024 * 1024)}MB）。")
+        body = await reader.readexactly(length)
+
+        template, patrol_data, report_date, options = parse_report_request(body)
+        try:
+            output_bytes, coalesced = await self.service.write_report(
+                template, patrol_data, report_date, **options)
+        except (ValueError, zipfile.BadZipFile) as e:
+            # テンプレート・指定の誤り（xlsxでない、シートがない、未対応のエンジンなど）
+            raise ApiError(422, str(e))
+        filename = f"日報_{report_date.strftime('%Y%m%d')}.xlsx"
+        return 200, output_bytes, {
+            "Content-Type": XLSX_MIME,
+            "Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}",
+            "X-Report-Coalesced": "1" if coalesced else "0",
+        }
+
+
+async def _read_head(reader):
+    """リクエスト行とヘッダー（名前は小文字）を読み込む"""
+    request_line = (await reader.readline()).decode("latin-1").strip()
+    parts = request_line.split()
+    if len(parts) != 3:
+        raise ApiError(400, "リクエストを読み込めません。")
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode("latin-1")
+        if line in ("\r\n", "\n", ""):
+            break
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return parts[0].upper(), parts[1], headers
+
+
+def _json_bytes(data):
+    return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+
+async def _write_response(writer, status, body, headers):
+    head = [f"HTTP/1.1 {status} {http.client.responses.get(status, '')}"]
+    headers = dict({"Content-Type": "application/json; charset=utf-8"}, **headers)
+    headers["Content-Length"] = str(len(body))
+    headers["Connection"] = "close"
+    head += [f"{name}: {value}" for name, value in headers.items()]
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+    writer.write(body)
+    await writer.drain()
+
+
+class ReportApiClient:
+    """ローカルのAPIを呼び出すクライアント（連携先システムの確認・動作確認用）"""
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=120):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+    def write_report(self, template, patrol_data, report_date=None, **options):
+        """日報を作成してxlsxのバイト列を返す（エラー時はApiError）"""
+        payload = {
+            "template": base64.b64encode(bytes(template)).decode("ascii"),
+            "patrol_data": {name: getattr(patrol_data, name) for name in PATROL_FIELDS},
+            "date": report_date.isoformat() if report_date else None,
+        }
+        payload.update(options)
+        status, headers, body = self._request(
+            "POST", "/reports", _json_bytes(payload), {"Content-Type": "application/json"})
+        if status != 200:
+            raise ApiError(status, _error_message(body))
+        return body
+
+    def health(self):
+        status, _, body = self._request("GET", "/health")
+        if status != 200:
+            raise ApiError(status, _error_message(body))
+        return json.loads(body)
+
+    def _request(self, method, path, body=None, headers=None):
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            connection.request(method, path, body=body, headers=headers or {})
+            response = connection.getresponse()
+            return response.status, dict(response.getheaders()), response.read()
+        finally:
+            connection.close()
+
+
+def _error_message(body):
+    try:
+        return json.loads(body)["error"]
+    except (ValueError, KeyError, TypeError):
+        return body.decode("utf-8", "replace")
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None, max_pending=DEFAULT_MAX_PENDING):
+    service = ReportService(workers, max_pending)
+    server = await ReportApiServer(service, host, port).start()
+    print(f"http://{server.host}:{server.port} で待ち受けています（同時作成 {service.max_workers}件）")
+    try:
+        await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="日報作成のローカルHTTP API")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="待ち受けるアドレス")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="待ち受けるポート")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="同時に作成する数（省略時は DAILY_REPORT_MAX_WORKERS または2）")
+    parser.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING,
+                        help="順番待ちの上限（超えた場合は503を返す）")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s")
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.max_pending))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
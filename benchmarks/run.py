@@ -0,0 +1,309 @@
+"""日報作成のベンチマーク
+
+合成した月次テンプレートで ExcelWriter（全体・段階ごと）、PatrolTimeGenerator（1日分・複数日分）、
+Config（読み込み・保存）の処理時間を計測し、コミット間で比較できるJSONに書き出す。
+
+    python -m benchmarks.run -o bench.json
+    python -m benchmarks.run --quick --compare bench.json --threshold 1.2
+
+--compare を指定した場合、中央値が基準の threshold 倍を超えた項目があれば終了コード1を返す。
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+from benchmarks.templates import QUICK_TEMPLATE_SPECS, TEMPLATE_SPECS, make_template
+from models import PatrolData
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PATROL_DATA = PatrolData(
+    post4="山田 太郎",
+    post5="佐藤 次郎",
+    post1="鈴木 三郎",
+    supervisor="田中 四郎",
+    patrol_start="21:00頃",
+    large_theater_used=True,
+    medium_theater_used=True,
+    small_theater_used=False,
+    weather="晴",
+    work_type="通常"
+)
+MONTH = 10
+YEAR = 2026
+
+
+def measure(fn, repeat, number=1):
+    """fnをnumber回実行する時間をrepeat回計測し、1回あたりの秒数のリストを返す"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((time.perf_counter() - started) / number)
+    return timings
+
+
+class BenchmarkRunner:
+    """計測結果を集める"""
+
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.results = []
+
+    def run(self, group, name, fn, number=1, repeat=None, setup=None, **params):
+        """計測してJSON用の結果を追加（setupは毎回の計測前に呼び、時間に含めない）"""
+        repeat = repeat or self.repeat
+        if setup is None:
+            timings = measure(fn, repeat, number)
+        else:
+            timings = []
+            for _ in range(repeat):
+                setup()
+                timings.extend(measure(fn, 1, number))
+        result = {
+            "name": f"{group}/{name}" + "".join(f"/{value}" for value in params.values()),
+            "group": group,
+            "params": params,
+            "repeat": repeat,
+            "number": number,
+            "min_ms": min(timings) * 1000,
+            "median_ms": statistics.median(timings) * 1000,
+            "mean_ms": statistics.fmean(timings) * 1000,
+            "max_ms": max(timings) * 1000,
+        }
+        self.results.append(result)
+        print(f"{result['median_ms']:12.3f} ms  {result['name']}")
+        return result
+
+
+def bench_writer(runner, specs):
+    from excel.template_cache import TemplateCache
+    from excel.writer import ENGINES, ExcelWriter
+
+    for spec in specs:
+        template = make_template(spec, month=MONTH)
+        report_date = date(YEAR, MONTH, min(spec.sheets, 15))
+        patrol_data_by_date = {
+            date(YEAR, MONTH, day): PATROL_DATA for day in range(1, spec.sheets + 1)
+        }
+        params = {"template": spec.name}
+        print(f"-- {spec.name}: {spec.sheets}シート, 結合{spec.merged}/シート, "
+              f"{len(template) / 1024:.0f} KB --")
+
+        for engine in ENGINES:
+            # 毎回新しいキャッシュ（テンプレートを初めて受け取ったとき）
+            runner.run(
+                "write_report", "cold",
+                lambda: ExcelWriter(TemplateCache(), engine=engine, seed=0).write_report(
+                    template, PATROL_DATA, report_date),
+                engine=engine, **params
+            )
+            # 解析済みのテンプレートを再利用する場合
+            cache = TemplateCache()
+            cache.load_workbook(template)
+            runner.run(
+                "write_report", "warm",
+                lambda: ExcelWriter(cache, engine=engine, seed=0).write_report(
+                    template, PATROL_DATA, report_date),
+                engine=engine, **params
+            )
+            runner.run(
+                "write_reports", "warm",
+                lambda: ExcelWriter(cache, engine=engine, seed=0).write_reports(
+                    template, patrol_data_by_date),
+                repeat=max(1, runner.repeat // 2), engine=engine, **params
+            )
+
+        # 計測を有効にした場合の負荷（warm/openpyxlと比較）
+        from utils.instrumentation import Instrumentation
+        runner.run(
+            "write_report", "instrumented",
+            lambda: ExcelWriter(cache, seed=0, instrumentation=Instrumentation()).write_report(
+                template, PATROL_DATA, report_date),
+            engine="openpyxl", **params
+        )
+
+        # 出力形式（圧縮設定）ごとの時間
+        from excel.output_profile import OUTPUT_PROFILES
+        for engine in ENGINES:
+            for profile in OUTPUT_PROFILES:
+                runner.run(
+                    "write_report", f"profile_{profile}",
+                    lambda: ExcelWriter(cache, engine=engine, seed=0, output_profile=profile).write_report(
+                        template, PATROL_DATA, report_date),
+                    engine=engine, **params
+                )
+
+        bench_writer_stages(runner, template, report_date, params)
+
+
+def bench_writer_stages(runner, template, report_date, params):
+    """openpyxlエンジンの段階ごとの時間"""
+    from excel.source import TemplateSource
+    from excel.template_cache import TemplateCache
+    from excel.writer import ExcelWriter
+
+    writer = ExcelWriter(TemplateCache(), seed=0)
+    source = TemplateSource.wrap(template)
+    data = {report_date: PATROL_DATA}
+    state = {}
+
+    runner.run("stage", "digest", lambda: TemplateSource.wrap(template).digest(), **params)
+    runner.run("stage", "compile_plan", lambda: writer.compile_plan(data), number=20, **params)
+    runner.run("stage", "parse_template", lambda: TemplateCache().load_workbook(source), **params)
+    runner.run("stage", "copy_template", lambda: writer.template_cache.load_workbook(source), **params)
+
+    def prepare():
+        state["wb"] = writer.template_cache.load_workbook(source)
+        state["plan"] = writer.compile_plan(data)
+
+    def resolve_and_write():
+        wb = state["wb"]
+        resolved = state["plan"].resolve(lambda sheet_name: writer._merged_anchor_index(wb[sheet_name]))
+        for sheet_name, cell, value in resolved:
+            writer._safe_set_cell_value(wb[sheet_name], cell, value)
+
+    runner.run("stage", "resolve_and_write", resolve_and_write, setup=prepare, **params)
+    runner.run("stage", "font_sizes", lambda: writer._set_font_sizes(state["wb"]), setup=prepare, **params)
+    runner.run("stage", "save", lambda: writer._save(state["wb"]), setup=prepare, **params)
+    runner.run(
+        "stage", "xml_patch",
+        lambda: writer.xml_engine.patch(source, writer.compile_plan(data)),
+        **params
+    )
+
+
+def bench_time_generator(runner):
+    from utils.time_utils import PatrolTimeGenerator
+
+    generator = PatrolTimeGenerator(seed=0)
+
+    def single_day():
+        generator.generate_4post_times("21:00頃", True, True, False)
+        generator.generate_5post_times(True, True, False)
+        generator.generate_other_times()
+
+    runner.run("time_generator", "single_day", single_day, number=1000)
+
+
+def bench_config(runner):
+    from config import Config
+
+    with tempfile.TemporaryDirectory() as directory:
+        for staff_count in (10, 200):
+            config_file = os.path.join(directory, f"config_{staff_count}.json")
+            with open(config_file, "w", encoding="utf-8") as f:
+                json.dump({
+                    "security_staff": [f"警備 {n}" for n in range(staff_count)],
+                    "facility_staff": [f"設備 {n}" for n in range(staff_count)],
+                }, f, ensure_ascii=False)
+            config = Config(config_file)
+            runner.run("config", "load", config.load, number=20, staff=staff_count)
+            runner.run("config", "save", config.save, number=5, staff=staff_count)
+
+            def add_remove():
+                config.add_security_staff("ベンチ 太郎")
+                config.remove_security_staff("ベンチ 太郎")
+
+            runner.run("config", "add_remove", add_remove, number=5, staff=staff_count)
+            # 名簿全体を一括登録（1回の保存）
+            entries = [("警備", f"一括 {n}") for n in range(staff_count)]
+            runner.run("config", "import", lambda: config.import_staff(entries, replace=True),
+                       number=5, staff=staff_count)
+            runner.run("config", "options", lambda: config.security_staff_options, number=1000,
+                       staff=staff_count)
+
+
+def environment():
+    """結果の比較用に実行環境を記録"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    import openpyxl
+    return {
+        "commit": commit,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "openpyxl": openpyxl.__version__,
+        "numpy": numpy_version,
+    }
+
+
+def compare(results, baseline_path, threshold):
+    """基準のJSONと中央値を比較し、threshold倍を超えた項目名のリストを返す"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {r["name"]: r for r in json.load(f)["results"]}
+    regressions = []
+    print()
+    print(f"== 比較: {baseline_path}（基準に対する倍率） ==")
+    for result in results:
+        base = baseline.get(result["name"])
+        if base is None or base["median_ms"] <= 0:
+            continue
+        ratio = result["median_ms"] / base["median_ms"]
+        mark = ""
+        if ratio > threshold:
+            mark = "  << 遅くなりました"
+            regressions.append(result["name"])
+        print(f"{ratio:8.2f}x  {result['name']}{mark}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="日報作成のベンチマーク")
+    parser.add_argument("-o", "--output", help="結果を保存するJSONのパス")
+    parser.add_argument("--repeat", type=int, default=5, help="各項目の計測回数")
+    parser.add_argument("--quick", action="store_true", help="小さいテンプレートだけで計測")
+    parser.add_argument("--only", choices=("writer", "time_generator", "config"),
+                        action="append", help="計測する項目（複数指定可）")
+    parser.add_argument("--compare", help="比較する基準のJSON")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="遅くなったとみなす倍率（--compare指定時）")
+    args = parser.parse_args(argv)
+
+    # ベンチマーク中の警告表示は計測の邪魔になるため抑える
+    logging.getLogger("daily_report").setLevel(logging.ERROR)
+
+    runner = BenchmarkRunner(args.repeat)
+    only = set(args.only or ("writer", "time_generator", "config"))
+    if "writer" in only:
+        bench_writer(runner, QUICK_TEMPLATE_SPECS if args.quick else TEMPLATE_SPECS)
+    if "time_generator" in only:
+        bench_time_generator(runner)
+    if "config" in only:
+        bench_config(runner)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "results": runner.results},
+                      f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        regressions = compare(runner.results, args.compare, args.threshold)
+        if regressions:
+            print(f"{len(regressions)}件が基準の{args.threshold}倍を超えました")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+"""ベンチマーク用の月次テンプレートを作成する
+
+実際のテンプレートと同じ「M.D」形式の日付シートに、日報で書き込むセルを含む
+結合セルと、ファイルサイズを調整するための記入済みの行を作る。
+"""
+import io
+from collections import namedtuple
+
+# sheets: シート数（1〜31日）、merged: 1シートあたりの結合範囲数、filler_rows: 記入済みの行数
+TemplateSpec = namedtuple('TemplateSpec', ['name', 'sheets', 'merged', 'filler_rows'])
+
+TEMPLATE_SPECS = (
+    TemplateSpec('small', 7, 10, 0),
+    TemplateSpec('monthly', 31, 40, 0),
+    TemplateSpec('many_merges', 31, 400, 0),
+    TemplateSpec('large', 31, 40, 400),
+)
+QUICK_TEMPLATE_SPECS = TEMPLATE_SPECS[:2]
+
+# 日報で書き込むセルを含む結合範囲（テンプレートと同じ配置）
+_REPORT_MERGES = (
+    ['I4:J4', 'J5:K5', 'C10:D10']
+    + [f'F{row}:J{row}' for row in range(15, 28)]
+)
+
+
+def make_template(spec, month=10, first_day=1):
+    """TemplateSpecに従ってxlsxのバイト列を作成（first_day日からspec.sheets日分のシート）"""
+    from openpyxl import Workbook
+    wb = Workbook()
+    wb.remove(wb.active)
+    for day in range(first_day, first_day + spec.sheets):
+        ws = wb.create_sheet(f"{month}.{day}")
+        ws['A1'] = '日報'
+        merges = _REPORT_MERGES[:spec.merged]
+        # 残りは書き込み範囲より下に2列幅の結合セルを並べる
+        for index in range(spec.merged - len(merges)):
+            row = 50 + index // 4
+            col = 1 + (index % 4) * 3
+            merges.append(f'{_letters(col)}{row}:{_letters(col + 1)}{row}')
+        for cell_range in merges:
+            ws.merge_cells(cell_range)
+        for row in range(200, 200 + spec.filler_rows):
+            for col in range(1, 13):
+                ws.cell(row=row, column=col, value=f'記入例 {day}-{row}-{col}')
+    output = io.BytesIO()
+    wb.save(output)
+    return output.getvalue()
+
+
+def _letters(col):
+    from openpyxl.utils import get_column_letter
+    return get_column_letter(col)
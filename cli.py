@@ -0,0 +1,194 @@
+"""複数拠点の日報をまとめて作成するコマンド（Streamlitを使わない）
+
+    python cli.py テンプレートのフォルダ 拠点データ.json -o 出力先
+    python cli.py templates sites.csv -o out --date 2026-10-17 --workers 4
+
+拠点データはJSON（拠点ごとのオブジェクトの配列、または 拠点名 -> オブジェクト）か
+CSV（1行目が項目名）で、PatrolDataの項目に加えて以下を指定できる。
+
+    site      拠点名（必須、出力ファイル名に使う）
+    template  テンプレートのファイル名（省略時は「拠点名.xlsx」）
+    date      作成日（YYYY-MM-DD、省略時は --date の日付）
+
+拠点ごとの作成はプロセスプールで並列に実行し、出力先に日報と summary.json を書き出す。
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import fields
+from datetime import date, datetime
+from models import PatrolData
+
+PATROL_FIELDS = tuple(f.name for f in fields(PatrolData) if f.init)
+BOOL_FIELDS = ("large_theater_used", "medium_theater_used", "small_theater_used")
+_TRUE_VALUES = ("1", "true", "yes", "y", "on", "使用", "○")
+
+SUMMARY_FILE = "summary.json"
+
+
+def _to_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in _TRUE_VALUES
+
+
+def load_sites(path):
+    """拠点データ（JSON/CSV）を読み込み、拠点ごとの辞書のリストを返す"""
+    if path.lower().endswith(".csv"):
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            rows = [dict(row, site=row.get("site", site)) for site, row in data.items()]
+        else:
+            rows = list(data)
+
+    sites = []
+    for number, row in enumerate(rows, 1):
+        site = str(row.get("site") or "").strip()
+        if not site:
+            raise ValueError(f"{number}件目の拠点名（site）がありません。")
+        missing = [name for name in PATROL_FIELDS if name not in row]
+        if missing:
+            raise ValueError(f"拠点 {site} の項目が不足しています: {', '.join(missing)}")
+        site_date = str(row.get("date") or "").strip()
+        if site_date:
+            try:
+                date.fromisoformat(site_date)
+            except ValueError:
+                raise ValueError(f"拠点 {site} の作成日（date）が不正です: {site_date}（YYYY-MM-DDで指定）")
+        row["date"] = site_date
+        sites.append(row)
+    return sites
+
+
+def patrol_data_from_row(row):
+    """拠点データの1件からPatrolDataを作成"""
+    values = {name: row[name] for name in PATROL_FIELDS}
+    for name in BOOL_FIELDS:
+        values[name] = _to_bool(values[name])
+    for name in PATROL_FIELDS:
+        if name not in BOOL_FIELDS:
+            values[name] = "" if values[name] is None else str(values[name])
+    return PatrolData(**values)
+
+
+def build_tasks(template_dir, sites, output_dir, report_date, engine="openpyxl", seed=None):
+    """ワーカーに渡す作成内容（プロセス間で受け渡せる辞書）のリスト"""
+    tasks = []
+    for index, row in enumerate(sites):
+        site = str(row["site"]).strip()
+        site_date = row.get("date") or None
+        site_date = date.fromisoformat(site_date) if site_date else report_date
+        template = row.get("template") or f"{site}.xlsx"
+        tasks.append({
+            "site": site,
+            "template": os.path.join(template_dir, template),
+            "output": os.path.join(output_dir, f"{site}_日報_{site_date.strftime('%Y%m%d')}.xlsx"),
+            "date": site_date.isoformat(),
+            "patrol_data": patrol_data_from_row(row).to_bytes(),
+            "engine": engine,
+            # 拠点ごとに異なるseedを使い、同じ指定なら同じ時間を再現する
+            "seed": None if seed is None else seed + index,
+        })
+    return tasks
+
+
+def run_site(task):
+    """1拠点の日報を作成して出力する（ワーカープロセスで実行）"""
+    started = time.perf_counter()
+    summary = {
+        "site": task["site"],
+        "template": task["template"],
+        "output": task["output"],
+        "date": task["date"],
+    }
+    try:
+        # 各ワーカーで必要になってから読み込む
+        from excel.writer import ExcelWriter
+        writer = ExcelWriter(engine=task["engine"], seed=task["seed"])
+        output_bytes = writer.write_report(
+            task["template"],
+            PatrolData.from_bytes(task["patrol_data"]),
+            date.fromisoformat(task["date"])
+        )
+        with open(task["output"], "wb") as f:
+            f.write(output_bytes)
+        summary.update(status="ok", bytes=len(output_bytes))
+    except Exception as e:
+        summary.update(status="error", error=str(e))
+    summary["seconds"] = round(time.perf_counter() - started, 4)
+    return summary
+
+
+def run_batch(tasks, workers=None):
+    """全拠点をプロセスプールで並列に作成し、拠点ごとの結果を返す"""
+    if workers == 1:
+        return [run_site(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run_site, tasks))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="複数拠点の日報をまとめて作成")
+    parser.add_argument("template_dir", help="テンプレート（xlsx）のフォルダ")
+    parser.add_argument("sites", help="拠点ごとのPatrolData（JSON/CSV）")
+    parser.add_argument("-o", "--output-dir", default="output", help="出力先フォルダ")
+    parser.add_argument("--date", type=date.fromisoformat, default=None,
+                        help="作成日（YYYY-MM-DD、省略時は本日）")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="並列に作成するプロセス数（省略時はCPU数）")
+    parser.add_argument("--engine", choices=("openpyxl", "xml"), default="openpyxl",
+                        help="書き込みエンジン")
+    parser.add_argument("--seed", type=int, default=None, help="巡回時間を再現するためのseed")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s: %(message)s")
+
+    try:
+        sites = load_sites(args.sites)
+    except (OSError, ValueError) as e:
+        print(f"拠点データを読み込めません: {e}", file=sys.stderr)
+        return 2
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    report_date = args.date or datetime.today().date()
+    tasks = build_tasks(args.template_dir, sites, args.output_dir, report_date,
+                        engine=args.engine, seed=args.seed)
+
+    started = time.perf_counter()
+    results = run_batch(tasks, args.workers)
+    elapsed = time.perf_counter() - started
+
+    succeeded = [r for r in results if r["status"] == "ok"]
+    summary = {
+        "date": report_date.isoformat(),
+        "engine": args.engine,
+        "workers": args.workers or os.cpu_count(),
+        "total": len(results),
+        "succeeded": len(succeeded),
+        "failed": len(results) - len(succeeded),
+        "seconds": round(elapsed, 4),
+        "sites": results,
+    }
+    with open(os.path.join(args.output_dir, SUMMARY_FILE), "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    for result in results:
+        if result["status"] == "ok":
+            print(f"OK    {result['site']}: {result['output']}")
+        else:
+            print(f"ERROR {result['site']}: {result['error']}")
+    print(f"{len(succeeded)}/{len(results)}拠点を作成しました（{elapsed:.2f}秒）")
+    return 0 if len(succeeded) == len(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,70 +1,386 @@
 import json
 import os
-import streamlit as st
+import tempfile
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from utils import notify
 
-class Config:
-    def __init__(self):
-        self.script_dir = os.path.dirname(os.path.abspath(__file__))
-        self.config_file = os.path.join(self.script_dir, "daily_report_config.json")
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+
+@contextmanager
+def _file_lock(lock_path):
+    """プロセス間の排他ロック（ロック用ファイルを使用）"""
+    with open(lock_path, "a+b") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        elif msvcrt is not None:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class StaffRegistry:
+    """プロセス内の全セッションで共有する担当者名簿
+
+    設定ファイルの更新日時・サイズが変わったときだけ読み直す。
+    書き込みはファイルロックを取ってから最新の内容に変更を加え、
+    一時ファイルへの書き出しと置き換え（アトミックな更新）で保存する。
+    """
+
+    def __init__(self, config_file):
+        self.config_file = config_file
+        self.lock_file = config_file + ".lock"
+        self._lock = threading.RLock()
+        self._stamp = None
         self.security_staff_list = []
         self.facility_staff_list = []
-        self.load()
-    
-    def load(self):
-        """設定ファイルを読み込む"""
-        if os.path.exists(self.config_file):
+        self.security_staff_options = [""]
+        self.facility_staff_options = [""]
+        self._security_staff_set = set()
+        self._facility_staff_set = set()
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.config_file)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def refresh(self, force=False):
+        """設定ファイルが変更されていれば読み込み直す"""
+        stamp = self._file_stamp()
+        if not force and stamp == self._stamp:
+            return
+        with self._lock:
+            if not force and stamp == self._stamp:
+                return
+            security, facility = [], []
+            if stamp is not None:
+                try:
+                    with open(self.config_file, "r", encoding="utf-8") as f:
+                        data = json.load(f)
+                    security = data.get("security_staff", [])
+                    facility = data.get("facility_staff", [])
+                except Exception as e:
+                    notify.warning(f"設定ファイル読み込みエラー: {e}")
+                    # エラー時はデフォルト値を使用
+                    notify.info("デフォルト設定を使用します。")
+            self._set_lists(security, facility)
+            self._stamp = stamp
+
+    def _set_lists(self, security, facility):
+        # 読み取り中のセッションに影響しないよう、常に新しいリストに差し替える
+        self.security_staff_list = list(security)
+        self.facility_staff_list = list(facility)
+        # 選択肢（先頭は未選択）も名簿の更新時だけ作り直す
+        self.security_staff_options = [""] + self.security_staff_list
+        self.facility_staff_options = [""] + self.facility_staff_list
+        self._security_staff_set = set(security)
+        self._facility_staff_set = set(facility)
+
+    def update(self, change):
+        """ロックを取って最新の名簿に変更を加えて保存する
+
+        change(security, facility, members) は変更したリストと、各区分の名前の集合
+        （{'security': set, 'facility': set}、存在確認用）を受け取り、変更した場合はTrueを返す。
+        """
+        with self._lock:
             try:
-                with open(self.config_file, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    self.security_staff_list = data.get("security_staff", [])
-                    self.facility_staff_list = data.get("facility_staff", [])
+                with _file_lock(self.lock_file):
+                    # 他のプロセスの変更を取りこぼさないよう、ロック内で読み直す
+                    self.refresh()
+                    security = list(self.security_staff_list)
+                    facility = list(self.facility_staff_list)
+                    # 名前の存在確認はリストを走査せずに集合で行う
+                    members = {
+                        'security': set(self._security_staff_set),
+                        'facility': set(self._facility_staff_set),
+                    }
+                    if not change(security, facility, members):
+                        return False
+                    self._write(security, facility)
+                    self._set_lists(security, facility)
+                    self._stamp = self._file_stamp()
+                    return True
             except Exception as e:
-                st.warning(f"設定ファイル読み込みエラー: {e}")
-                # エラー時はデフォルト値を使用
-                self.security_staff_list = []
-                self.facility_staff_list = []
-                st.info("デフォルト設定を使用します。")
-    
-    def save(self):
-        """設定ファイルを保存する"""
+                notify.error(f"設定ファイルの保存に失敗しました: {e}\n保存先: {self.config_file}")
+                return False
+
+    def _write(self, security, facility):
+        data = {
+            "security_staff": security,
+            "facility_staff": facility
+        }
+        directory = os.path.dirname(self.config_file)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".daily_report_config.", suffix=".tmp")
         try:
-            data = {
-                "security_staff": self.security_staff_list,
-                "facility_staff": self.facility_staff_list
-            }
-            with open(self.config_file, "w", encoding="utf-8") as f:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            st.error(f"設定ファイルの保存に失敗しました: {e}\n保存先: {self.config_file}")
-    
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.config_file)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def has_security_staff(self, name):
+        self.refresh()
+        return name in self._security_staff_set
+
+    def has_facility_staff(self, name):
+        self.refresh()
+        return name in self._facility_staff_set
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(config_file):
+    """設定ファイルごとに1つの名簿をプロセス内で共有する"""
+    config_file = os.path.abspath(config_file)
+    with _registries_lock:
+        registry = _registries.get(config_file)
+        if registry is None:
+            registry = _registries[config_file] = StaffRegistry(config_file)
+    return registry
+
+
+# 担当者の区分（一括登録・書き出しで使う）
+STAFF_KINDS = ('security', 'facility')
+STAFF_KIND_LABELS = {'security': '警備担当者', 'facility': '設備担当者'}
+# 一括登録のファイルで区分として受け付ける表記
+_STAFF_KIND_ALIASES = {
+    'security': 'security', '警備': 'security', '警備担当': 'security', '警備担当者': 'security',
+    'facility': 'facility', '設備': 'facility', '設備担当': 'facility', '設備担当者': 'facility',
+}
+
+# 一括登録の結果（added: 区分 -> 追加した名前, duplicates: 登録済み・重複の名前, invalid: (行, 理由)）
+StaffImportResult = namedtuple('StaffImportResult', ['added', 'duplicates', 'invalid'])
+
+
+def staff_kind(value):
+    """区分の表記を 'security' / 'facility' に変換（不明な場合はNone）"""
+    return _STAFF_KIND_ALIASES.get(str(value or "").strip().lower())
+
+
+class StaffBatch:
+    """Config.batch() で受け付けた変更の一覧（withを抜けるときに1回で保存する）"""
+
+    def __init__(self):
+        self._changes = []
+
+    def __len__(self):
+        return len(self._changes)
+
+    def add(self, kind, name):
+        self._changes.append(('add', kind, name))
+
+    def remove(self, kind, name):
+        self._changes.append(('remove', kind, name))
+
+    def add_security_staff(self, name):
+        self.add('security', name)
+
+    def add_facility_staff(self, name):
+        self.add('facility', name)
+
+    def remove_security_staff(self, name):
+        self.remove('security', name)
+
+    def remove_facility_staff(self, name):
+        self.remove('facility', name)
+
+    def apply(self, security, facility, members):
+        """最新の名簿に変更を順に適用（StaffRegistry.updateに渡す）"""
+        lists = {'security': security, 'facility': facility}
+        removed = {kind: set() for kind in lists}
+        changed = False
+        for action, kind, name in self._changes:
+            if action == 'add':
+                if not name.strip():
+                    continue
+                if name in removed[kind]:
+                    # 同じ一覧で削除した名前は元の位置に残す
+                    removed[kind].discard(name)
+                    members[kind].add(name)
+                elif name not in members[kind]:
+                    lists[kind].append(name)
+                    members[kind].add(name)
+                    changed = True
+            elif name in members[kind]:
+                members[kind].discard(name)
+                removed[kind].add(name)
+                changed = True
+        # 削除はまとめて1回でリストから取り除く
+        for kind, names in removed.items():
+            if names:
+                lists[kind][:] = [name for name in lists[kind] if name not in names]
+        return changed
+
+
+class Config:
+    def __init__(self, config_file=None):
+        self.script_dir = os.path.dirname(os.path.abspath(__file__))
+        self.config_file = config_file or os.path.join(self.script_dir, "daily_report_config.json")
+        self.registry = get_registry(self.config_file)
+        self.registry.refresh()
+
+    @property
+    def security_staff_list(self):
+        self.registry.refresh()
+        return self.registry.security_staff_list
+
+    @property
+    def facility_staff_list(self):
+        self.registry.refresh()
+        return self.registry.facility_staff_list
+
+    @property
+    def security_staff_options(self):
+        """警備担当者の選択肢（先頭は未選択）"""
+        self.registry.refresh()
+        return self.registry.security_staff_options
+
+    @property
+    def facility_staff_options(self):
+        """設備担当者の選択肢（先頭は未選択）"""
+        self.registry.refresh()
+        return self.registry.facility_staff_options
+
+    def load(self):
+        """設定ファイルを読み込む"""
+        self.registry.refresh(force=True)
+
+    def save(self):
+        """設定ファイルを保存する"""
+        self.registry.update(lambda security, facility, members: True)
+
+    @contextmanager
+    def batch(self):
+        """複数の追加・削除をまとめて1回だけ保存する
+
+            with config.batch() as batch:
+                batch.add_security_staff("山田 太郎")
+                batch.remove_facility_staff("佐藤 次郎")
+
+        with内で例外が発生した場合は何も保存しない。
+        """
+        batch = StaffBatch()
+        yield batch
+        if batch:
+            self.registry.update(batch.apply)
+
+    def import_staff(self, entries, replace=False):
+        """(区分, 名前) の一覧をまとめて登録し、1回だけ保存する
+
+        区分・名前の確認と重複の除去は保存前にすべて済ませる。
+        replace=True の場合は、一覧に含まれる区分の名簿を一覧の内容で置き換える。
+        """
+        self.registry.refresh()
+        existing = {
+            'security': set() if replace else set(self.registry.security_staff_list),
+            'facility': set() if replace else set(self.registry.facility_staff_list),
+        }
+        added = {kind: [] for kind in STAFF_KINDS}
+        duplicates = []
+        invalid = []
+        for number, (kind_value, name) in enumerate(entries, 1):
+            kind = staff_kind(kind_value)
+            name = str(name or "").strip()
+            if kind is None:
+                invalid.append((number, f"区分を判別できません: {kind_value}"))
+            elif not name:
+                invalid.append((number, "名前がありません"))
+            elif name in existing[kind]:
+                duplicates.append(name)
+            else:
+                existing[kind].add(name)
+                added[kind].append(name)
+
+        def change(security, facility, members):
+            lists = {'security': security, 'facility': facility}
+            changed = False
+            for kind, names in added.items():
+                if replace and names:
+                    changed = changed or lists[kind] != names
+                    lists[kind][:] = names
+                    continue
+                # 確認後に他のセッションが追加した名前は重複として除く
+                new_names = [name for name in names if name not in members[kind]]
+                lists[kind].extend(new_names)
+                changed = changed or bool(new_names)
+            return changed
+
+        if any(added.values()):
+            self.registry.update(change)
+        return StaffImportResult(added, duplicates, invalid)
+
+    def export_staff(self):
+        """名簿を (区分の表示名, 名前) の一覧で返す"""
+        self.registry.refresh()
+        return (
+            [(STAFF_KIND_LABELS['security'], name) for name in self.registry.security_staff_list]
+            + [(STAFF_KIND_LABELS['facility'], name) for name in self.registry.facility_staff_list]
+        )
+
     def add_security_staff(self, name):
         """警備担当者を追加"""
-        if name not in self.security_staff_list and name.strip():
-            self.security_staff_list.append(name)
-            self.save()
-            return True
-        return False
-    
+        def change(security, facility, members):
+            if name not in members['security'] and name.strip():
+                security.append(name)
+                return True
+            return False
+        if self.registry.has_security_staff(name) or not name.strip():
+            return False
+        return self.registry.update(change)
+
     def add_facility_staff(self, name):
         """設備担当者を追加"""
-        if name not in self.facility_staff_list and name.strip():
-            self.facility_staff_list.append(name)
-            self.save()
-            return True
-        return False
-    
+        def change(security, facility, members):
+            if name not in members['facility'] and name.strip():
+                facility.append(name)
+                return True
+            return False
+        if self.registry.has_facility_staff(name) or not name.strip():
+            return False
+        return self.registry.update(change)
+
     def remove_security_staff(self, name):
         """警備担当者を削除"""
-        if name in self.security_staff_list:
-            self.security_staff_list.remove(name)
-            self.save()
-            return True
-        return False
-    
+        def change(security, facility, members):
+            if name in members['security']:
+                security.remove(name)
+                return True
+            return False
+        if not self.registry.has_security_staff(name):
+            return False
+        return self.registry.update(change)
+
     def remove_facility_staff(self, name):
         """設備担当者を削除"""
-        if name in self.facility_staff_list:
-            self.facility_staff_list.remove(name)
-            self.save()
-            return True
-        return False
\ No newline at end of file
+        def change(security, facility, members):
+            if name in members['facility']:
+                facility.remove(name)
+                return True
+            return False
+        if not self.registry.has_facility_staff(name):
+            return False
+        return self.registry.update(change)
@@ -0,0 +1,71 @@
+from collections import OrderedDict
+import threading
+
+
+class SizedLRUCache:
+    """エントリ数とメモリ使用量に上限を持つLRUキャッシュ（スレッドセーフ）
+
+    上限を超えた場合は最も古く使われたものから破棄する。
+    size: 値の大きさ[バイト]を返す関数
+    """
+
+    def __init__(self, max_entries, max_bytes, size=len):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._size = size
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, record=True):
+        """保存済みの値（なければNone）
+
+        record: ヒット・ミスの回数に数えるか
+        """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                if record:
+                    self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if record:
+                self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """値を保存（上限を超える大きさのものは保存せずFalseを返す）"""
+        size = self._size(value)
+        if size > self.max_bytes:
+            return False
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._total_bytes -= self._size(previous)
+            self._entries[key] = value
+            self._total_bytes += size
+            while len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._total_bytes -= self._size(evicted)
+                self.evictions += 1
+        return True
+
+    def clear(self):
+        """キャッシュを空にする"""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        """キャッシュの利用状況"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
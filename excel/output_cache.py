@@ -0,0 +1,39 @@
+from excel.lru import SizedLRUCache
+
+
+def output_key(template_digest, engine, operation, patrol_data_by_date, seed):
+    """作成結果のキャッシュキー（テンプレート・エンジン・入力内容・日付・seed）"""
+    return (
+        template_digest,
+        engine,
+        operation,
+        seed,
+        tuple(
+            (report_date.isoformat(), patrol_data.to_tuple())
+            for report_date, patrol_data in sorted(patrol_data_by_date.items())
+        ),
+    )
+
+
+def _output_size(output):
+    """キャッシュの大きさの計算用（bytesまたはBatchResult）"""
+    return len(getattr(output, 'output_bytes', output))
+
+
+class OutputCache(SizedLRUCache):
+    """作成した日報をテンプレート・入力内容・seedごとに保持するキャッシュ
+
+    同じ内容で作成し直した場合は保存済みの結果をそのまま返す（巡回時間も同じになる）。
+    """
+
+    def __init__(self, max_entries=32, max_bytes=64 * 1024 * 1024):
+        # 値は bytes または BatchResult
+        super().__init__(max_entries, max_bytes, size=_output_size)
+
+
+_shared_cache = OutputCache()
+
+
+def get_output_cache():
+    """プロセス内の全セッションで共有する作成結果のキャッシュ"""
+    return _shared_cache
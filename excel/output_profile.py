@@ -0,0 +1,49 @@
+import io
+import zipfile
+from collections import namedtuple
+from datetime import datetime, timezone
+
+# 出力ファイルの圧縮設定（compresslevel: Noneはzlibの既定値）
+OutputProfile = namedtuple('OutputProfile', ['name', 'label', 'compress_type', 'compresslevel'])
+
+OUTPUT_PROFILES = {
+    'default': OutputProfile('default', '標準', zipfile.ZIP_DEFLATED, None),
+    # 圧縮を弱くして保存にかかる時間を短くする
+    'fast': OutputProfile('fast', '高速（圧縮を弱く）', zipfile.ZIP_DEFLATED, 1),
+    # 時間をかけてファイルを小さくする（通信の遅い環境でのダウンロード向け）
+    'small': OutputProfile('small', '小さく（最大圧縮）', zipfile.ZIP_DEFLATED, 9),
+}
+DEFAULT_OUTPUT_PROFILE = 'default'
+
+
+def get_output_profile(name):
+    """名前からOutputProfileを取得"""
+    if isinstance(name, OutputProfile):
+        return name
+    try:
+        return OUTPUT_PROFILES[name or DEFAULT_OUTPUT_PROFILE]
+    except KeyError:
+        raise ValueError(f"未対応の出力形式です: {name}")
+
+
+def save_workbook(wb, profile):
+    """Workbookを指定の圧縮設定でxlsxのバイト列にする（wb.saveと同じ内容）"""
+    from openpyxl.writer.excel import ExcelWriter as WorkbookWriter
+    output = io.BytesIO()
+    archive = zipfile.ZipFile(output, 'w', profile.compress_type, allowZip64=True,
+                              compresslevel=profile.compresslevel)
+    # wb.save（openpyxl.writer.excel.save_workbook）と同じく更新日時を設定する
+    wb.properties.modified = datetime.now(tz=timezone.utc).replace(tzinfo=None)
+    WorkbookWriter(wb, archive).save()
+    # getvalue()は書き出したバッファを共有するため、ここでの複製は発生しない
+    return output.getvalue()
+
+
+def apply_to_member(info, profile):
+    """zipのメンバー（ZipInfo）に圧縮設定を反映"""
+    info.compress_type = profile.compress_type
+    # Python 3.13以降は compress_level が公開属性
+    if hasattr(info, 'compress_level'):
+        info.compress_level = profile.compresslevel
+    else:
+        info._compresslevel = profile.compresslevel
@@ -0,0 +1,149 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import weakref
+
+# これより大きいテンプレートは一時ファイルに書き出して読み込む
+DEFAULT_SPOOL_THRESHOLD = 4 * 1024 * 1024
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+class _MemoryViewReader(io.RawIOBase):
+    """memoryviewをコピーせずにファイルとして読むためのラッパー"""
+
+    def __init__(self, view):
+        self._view = view
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), len(self._view) - self._pos)
+        if size <= 0:
+            return 0
+        buffer[:size] = self._view[self._pos:self._pos + size]
+        self._pos += size
+        return size
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        else:
+            self._pos = len(self._view) + offset
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+
+class TemplateSource:
+    """アップロードされたテンプレートをコピーせずに扱うための入力
+
+    bytes・bytearray・memoryview・BytesIO（UploadedFile）・ファイルパスを受け付け、
+    読み込みのたびに独立した読み取り用ファイルを返す。
+    大きなテンプレートは一時ファイルに書き出し、openpyxl・zipfileはそこから直接読む。
+    """
+
+    def __init__(self, view=None, path=None, temp_path=None):
+        self._view = view
+        self._path = path or temp_path
+        self._digest = None
+        self._cleanup = weakref.finalize(self, _remove, temp_path) if temp_path else None
+
+    @classmethod
+    def wrap(cls, source, spool_threshold=None):
+        """入力をTemplateSourceに変換（既にTemplateSourceならそのまま）"""
+        if isinstance(source, TemplateSource):
+            return source
+        if isinstance(source, (str, os.PathLike)):
+            return cls(path=os.fspath(source))
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            view = memoryview(source).cast("B")
+        elif hasattr(source, "getbuffer"):
+            # UploadedFile・BytesIOは内部バッファをそのまま参照する
+            view = source.getbuffer()
+        elif hasattr(source, "read"):
+            return cls._spool_stream(source)
+        else:
+            raise TypeError(f"テンプレートとして扱えない入力です: {type(source).__name__}")
+        if spool_threshold is not None and len(view) > spool_threshold:
+            return cls._spool_view(view)
+        return cls(view=view)
+
+    @classmethod
+    def _spool_view(cls, view):
+        fd, temp_path = tempfile.mkstemp(prefix="daily_report_", suffix=".xlsx")
+        with os.fdopen(fd, "wb") as f:
+            for start in range(0, len(view), _CHUNK_SIZE):
+                f.write(view[start:start + _CHUNK_SIZE])
+        return cls(temp_path=temp_path)
+
+    @classmethod
+    def _spool_stream(cls, stream):
+        fd, temp_path = tempfile.mkstemp(prefix="daily_report_", suffix=".xlsx")
+        if hasattr(stream, "seek"):
+            stream.seek(0)
+        with os.fdopen(fd, "wb") as f:
+            shutil.copyfileobj(stream, f, _CHUNK_SIZE)
+        return cls(temp_path=temp_path)
+
+    @property
+    def spooled(self):
+        """一時ファイルに書き出しているか"""
+        return self._cleanup is not None
+
+    @property
+    def size(self):
+        if self._view is not None:
+            return len(self._view)
+        return os.path.getsize(self._path)
+
+    def open(self):
+        """先頭から読む独立したファイルオブジェクトを返す"""
+        if self._view is not None:
+            return io.BufferedReader(_MemoryViewReader(self._view), _CHUNK_SIZE)
+        # 一時ファイルも読み手ごとに開き直すので、並行して読んでも位置が干渉しない
+        return open(self._path, "rb")
+
+    def digest(self):
+        """内容のSHA-256（キャッシュキー用、1度だけ計算する）"""
+        if self._digest is None:
+            sha = hashlib.sha256()
+            if self._view is not None:
+                sha.update(self._view)
+            else:
+                with self.open() as f:
+                    for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+                        sha.update(chunk)
+            self._digest = sha.hexdigest()
+        return self._digest
+
+    def close(self):
+        """一時ファイルを削除し、参照していたバッファを解放する"""
+        if self._cleanup is not None:
+            self._cleanup()
+        if self._view is not None:
+            # UploadedFile（BytesIO）はバッファを参照されている間は閉じられないため
+            self._view.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
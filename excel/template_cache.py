@@ -0,0 +1,74 @@
+import pickle
+import threading
+from excel.lru import SizedLRUCache
+from excel.source import TemplateSource
+
+
+class TemplateCache:
+    """テンプレートの解析結果をファイル内容のハッシュで共有するキャッシュ
+
+    解析済みのWorkbookはpickle化したスナップショットとして保持し、
+    リクエストごとにそこから復元したコピーを渡す（再解析の約1/2〜1/10の時間。
+    記入済みのセルが多いテンプレートほど差は小さい）。
+    エントリ数とメモリ使用量の上限はSizedLRUCacheで管理する。
+    """
+
+    def __init__(self, max_entries=8, max_bytes=256 * 1024 * 1024):
+        self._snapshots = SizedLRUCache(max_entries, max_bytes)  # key -> pickle化したWorkbook
+        self._lock = threading.Lock()
+        self._loading = {}  # key -> 解析中であることを示すロック
+
+    @staticmethod
+    def hash_bytes(file_bytes):
+        """テンプレートの内容からキャッシュキーを作成"""
+        return TemplateSource.wrap(file_bytes).digest()
+
+    def load_workbook(self, file_bytes, key=None):
+        """テンプレートのWorkbookを返す（呼び出しごとに独立したコピー）
+
+        file_bytes: bytes・memoryview・UploadedFile・TemplateSourceのいずれか
+        """
+        source = TemplateSource.wrap(file_bytes)
+        key = key or source.digest()
+        snapshot = self._snapshots.get(key)
+        if snapshot is None:
+            snapshot = self._load_once(key, source)
+        return pickle.loads(snapshot)
+
+    def _load_once(self, key, source):
+        """同じテンプレートを複数セッションが同時に解析しないようにする"""
+        with self._lock:
+            key_lock = self._loading.setdefault(key, threading.Lock())
+        with key_lock:
+            # 待っている間に別のセッションが解析を終えていればそれを使う
+            snapshot = self._snapshots.get(key, record=False)
+            if snapshot is not None:
+                return snapshot
+            try:
+                # openpyxlは初めてテンプレートを解析するときに読み込む
+                from openpyxl import load_workbook
+                with source.open() as f:
+                    wb = load_workbook(f)
+                snapshot = pickle.dumps(wb, protocol=pickle.HIGHEST_PROTOCOL)
+                # 上限を超える大きさのテンプレートはキャッシュしない
+                self._snapshots.put(key, snapshot)
+            finally:
+                with self._lock:
+                    self._loading.pop(key, None)
+            return snapshot
+
+    def clear(self):
+        """キャッシュを空にする"""
+        self._snapshots.clear()
+
+    def stats(self):
+        """キャッシュの利用状況"""
+        return self._snapshots.stats()
+
+
+_shared_cache = TemplateCache()
+
+
+def get_template_cache():
+    """プロセス内の全セッションで共有するテンプレートキャッシュ"""
+    return _shared_cache
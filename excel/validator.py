@@ -0,0 +1,118 @@
+import re
+import zipfile
+from collections import namedtuple
+from xml.etree import ElementTree
+from models import PatrolData
+from excel.source import TemplateSource
+from excel.write_plan import WritePlan, WritePlanCompiler, sheet_name_for
+from excel.xml_writer import XmlPatchEngine, XmlPatchUnsupported
+from utils.time_utils import PatrolTimeGenerator
+
+# 検証結果（errors: 作成できない問題, warnings: 作成はできるが確認が必要な点）
+ValidationResult = namedtuple('ValidationResult', ['errors', 'warnings', 'sheet_names'])
+
+WORK_TYPES = ('通常', '早出', '残業')
+
+_SHEET_DATA_RE = re.compile(r"<sheetData\b")
+
+
+def _layouts():
+    """勤務区分ごとの {書き込むセル番地: 値の例}
+
+    担当者ごとに異なる名前を使い、同じ結合セルに別々の内容が入る配置を見つけられるようにする。
+    """
+    compiler = WritePlanCompiler(PatrolTimeGenerator(0))
+    return [
+        compiler.compile('layout', PatrolData(
+            post4="四 太郎", post5="五 次郎", post1="一 三郎", supervisor="設備 四郎",
+            patrol_start="21:00頃", large_theater_used=False, medium_theater_used=False,
+            small_theater_used=False, weather="晴", work_type=work_type
+        ), WritePlan()).values_for('layout')
+        for work_type in WORK_TYPES
+    ]
+
+
+class TemplateValidator:
+    """テンプレートを全体を解析せずに確認する
+
+    zip内の xl/workbook.xml と対象シートのXMLだけを読み、シートの有無・シートの構成・
+    書き込み先のセルと結合セルの関係を確認する（openpyxlは使わない）。
+    """
+
+    def __init__(self):
+        self.xml_engine = XmlPatchEngine()
+        self._layouts = None
+
+    @property
+    def layouts(self):
+        if self._layouts is None:
+            self._layouts = _layouts()
+        return self._layouts
+
+    def validate(self, file_bytes, sheet_names, allow_missing=False):
+        """指定したシートに日報を書き込めるかを確認してValidationResultを返す
+
+        allow_missing: 一部のシートがなくても作成できる場合（期間一括）はTrue。
+        見つからないシートは注意点として扱い、すべてない場合だけエラーにする。
+        """
+        errors = []
+        warnings = []
+        missing = []
+        try:
+            with TemplateSource.wrap(file_bytes).open() as f, zipfile.ZipFile(f) as zin:
+                try:
+                    sheet_paths = self.xml_engine.read_sheet_paths(zin)
+                except (KeyError, ElementTree.ParseError) as e:
+                    return ValidationResult([f"ブックの構成を読み込めません: {e}"], [], [])
+                for sheet_name in dict.fromkeys(sheet_names):
+                    path = sheet_paths.get(sheet_name)
+                    if path is None:
+                        missing.append(f"シート {sheet_name} が見つかりません。")
+                        continue
+                    try:
+                        sheet_xml = zin.read(path).decode("utf-8")
+                    except KeyError:
+                        errors.append(f"シート {sheet_name} の内容が見つかりません。")
+                        continue
+                    errors.extend(self._check_sheet(sheet_name, sheet_xml, warnings))
+        except zipfile.BadZipFile as e:
+            return ValidationResult([f"xlsxファイルとして読み込めません: {e}"], [], [])
+        if allow_missing and len(missing) < len(set(sheet_names)):
+            warnings[:0] = missing
+        else:
+            errors[:0] = missing
+        return ValidationResult(errors, warnings, list(sheet_paths))
+
+    def _check_sheet(self, sheet_name, sheet_xml, warnings):
+        """シートの構成と結合セルを確認し、エラーのリストを返す（注意点はwarningsに追加）"""
+        if not _SHEET_DATA_RE.search(sheet_xml):
+            return [f"シート {sheet_name} にセルのデータがありません。"]
+        try:
+            anchors = self.xml_engine.merged_anchor_index(sheet_xml)
+        except XmlPatchUnsupported as e:
+            return [f"シート {sheet_name} の結合セルを読み込めません: {e}"]
+
+        # 異なる内容のセルが同じ結合セルに書き込まれると、後の値だけが残る
+        collisions = {}
+        for layout in self.layouts:
+            written = {}
+            for cell, value in layout.items():
+                anchor = anchors.get(cell, cell)
+                previous = written.setdefault(anchor, (cell, value))
+                if previous[1] != value:
+                    collisions.setdefault((previous[0], cell), anchor)
+        for (first, second), anchor in collisions.items():
+            warnings.append(
+                f"シート {sheet_name}: セル {first} と {second} が同じ結合セル {anchor} に"
+                f"書き込まれます（テンプレートの配置を確認してください）。"
+            )
+        return []
+
+
+_shared_validator = TemplateValidator()
+
+
+def validate_template(file_bytes, report_dates, allow_missing=False):
+    """日付ごとのシートに書き込めるかを確認してValidationResultを返す"""
+    return _shared_validator.validate(
+        file_bytes, [sheet_name_for(d) for d in report_dates], allow_missing)
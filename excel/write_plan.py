@@ -0,0 +1,290 @@
+from collections import namedtuple
+from datetime import datetime, time
+from models import PatrolData, TimeRecord, to_minutes
+from utils.instrumentation import NULL_INSTRUMENTATION
+from utils.time_utils import ROUTE_4POST, ROUTE_5POST, RecordedTimes
+
+# 1件の書き込み（シート名, セル番地, 値）
+CellWrite = namedtuple('CellWrite', ['sheet', 'cell', 'value'])
+
+# 1日分の内容（日付, 入力データ, 生成した時間記録 [(ポスト, 開始セル, TimeRecord)]）
+ReportEntry = namedtuple('ReportEntry', ['report_date', 'patrol_data', 'records'])
+
+# その他の時間を書き込むセル
+OTHER_TIME_CELLS = {
+    'morning_4post': 'E32',
+    'morning_5post': 'E34',
+    'morning_1post': 'E36',
+    'morning_4post_2': 'E38',
+    'night_4post': 'H38',
+    'patrol_4post': 'E41',
+    'patrol_4post_end': 'H41',
+}
+# 巡回の開始・終了時刻のセル（巡回順）
+ROUTE_CELLS = (
+    tuple((start_cell, end_cell) for start_cell, end_cell in ROUTE_4POST),
+    tuple((start_cell, end_cell) for start_cell, end_cell, _ in ROUTE_5POST),
+)
+# 作成済みの日報から時刻を読み取るセル
+TIME_CELLS = tuple(
+    [cell for route in ROUTE_CELLS for pair in route for cell in pair]
+    + list(OTHER_TIME_CELLS.values())
+)
+
+
+def sheet_name_for(report_date):
+    """日付に対応するシート名（M.D形式）"""
+    return f"{report_date.month}.{report_date.day}"
+
+
+def cell_minutes(value):
+    """セルの時刻（'21:05'・time・datetime）を0時からの分に変換（時刻でない場合はNone）"""
+    if isinstance(value, (time, datetime)):
+        return value.hour * 60 + value.minute
+    if isinstance(value, str) and ":" in value:
+        try:
+            return to_minutes(value.strip())
+        except ValueError:
+            return None
+    return None
+
+
+def recorded_times_from_cells(cells):
+    """作成済みの日報のセルの値 {セル番地: 値} から乱数で決まった時刻を読み取る"""
+    post4_start = cell_minutes(cells.get(ROUTE_4POST[0][0]))
+    post5_start = cell_minutes(cells.get(ROUTE_5POST[0][0]))
+    other = {key: cell_minutes(cells.get(cell)) for key, cell in OTHER_TIME_CELLS.items()}
+    missing = [cell for cell, minutes in [(ROUTE_4POST[0][0], post4_start), (ROUTE_5POST[0][0], post5_start)]
+               + [(OTHER_TIME_CELLS[key], minutes) for key, minutes in other.items()]
+               if minutes is None]
+    if missing:
+        raise ValueError(f"作成済みの巡回時間を読み取れません（{', '.join(missing)}）。")
+    return RecordedTimes(post4_start, post5_start, other)
+
+
+def route_breaks(cells):
+    """巡回の終了時刻と次の巡回の開始時刻が一致しない箇所 [(終了セル, 開始セル)]
+
+    巡回しない枠（"-"）は飛ばして、前後の巡回どうしを比べる。
+    """
+    breaks = []
+    for route in ROUTE_CELLS:
+        previous_end = None
+        for start_cell, end_cell in route:
+            start = cell_minutes(cells.get(start_cell))
+            if start is None:
+                continue
+            if previous_end is not None and cell_minutes(cells.get(previous_end)) != start:
+                breaks.append((previous_end, start_cell))
+            previous_end = end_cell
+    return breaks
+
+
+class WritePlan:
+    """シートへの書き込み内容をまとめた一覧
+
+    同じセルへの書き込みは後のものだけを残す（順番に書き込んだ場合と同じ結果）。
+    openpyxl・XMLのどちらのエンジンもこの一覧をそのまま適用する。
+    """
+
+    def __init__(self, writes=()):
+        self._writes = {}
+        # シート名 -> ReportEntry（履歴保存用）
+        self.reports = {}
+        for sheet, cell, value in writes:
+            self.set(sheet, cell, value)
+
+    def set(self, sheet, cell, value):
+        """セルへの書き込みを追加"""
+        key = (sheet, cell)
+        # 後の書き込みで上書きし、順序も後ろに移す
+        self._writes.pop(key, None)
+        self._writes[key] = value
+
+    def set_time(self, sheet, cell, time_str):
+        """時間をセルに設定（0埋め除去対応）"""
+        if time_str:
+            if isinstance(time_str, str):
+                time_str = time_str.lstrip("0") if time_str != "-" else time_str
+            else:
+                time_str = str(time_str).lstrip("0")
+            self.set(sheet, cell, time_str)
+
+    def __iter__(self):
+        for (sheet, cell), value in self._writes.items():
+            yield CellWrite(sheet, cell, value)
+
+    def __len__(self):
+        return len(self._writes)
+
+    def __eq__(self, other):
+        return isinstance(other, WritePlan) and list(self) == list(other)
+
+    def sheets(self):
+        """書き込み対象のシート名（出現順）"""
+        return list(dict.fromkeys(sheet for sheet, _ in self._writes))
+
+    def values_for(self, sheet):
+        """指定シートの {セル番地: 値}"""
+        return {cell: value for (s, cell), value in self._writes.items() if s == sheet}
+
+    def dropped(self, other):
+        """この一覧で書き込み、otherでは書き込まなくなるセル [(シート名, セル番地)]"""
+        return [key for key in self._writes if key not in other._writes]
+
+    def diff(self, other, original=None):
+        """この一覧からotherに変えるために必要な書き込みだけの一覧を返す
+
+        値が変わるセルはotherの値を、otherで書き込まなくなったセルは書き込み前の値を書き込む。
+        original: {(シート名, セル番地): 書き込み前（テンプレート）の値}
+        （含まれないセルは書き換えない。結合セルの左上以外のセルなど）
+        """
+        original = original or {}
+        changes = WritePlan()
+        changes.reports = other.reports
+        for key, value in other._writes.items():
+            if key not in self._writes or self._writes[key] != value:
+                changes.set(*key, value)
+        for key in self.dropped(other):
+            if key in original:
+                changes.set(*key, original[key])
+        return changes
+
+    def resolve(self, anchor_index_for):
+        """結合セルを左上セルに置き換えた一覧を返す
+
+        anchor_index_for: シート名 -> {セル番地: 左上セル番地} を返す関数
+        """
+        resolved = WritePlan()
+        resolved.reports = self.reports
+        indexes = {}
+        for sheet, cell, value in self:
+            if sheet not in indexes:
+                indexes[sheet] = anchor_index_for(sheet)
+            resolved.set(sheet, indexes[sheet].get(cell, cell), value)
+        return resolved
+
+    def as_rows(self):
+        """確認表示用の一覧（辞書のリスト）"""
+        return [write._asdict() for write in self]
+
+
+class WritePlanCompiler:
+    """PatrolDataから書き込み内容の一覧を作成する"""
+
+    def __init__(self, time_generator, instrumentation=NULL_INSTRUMENTATION):
+        self.time_generator = time_generator
+        self.instrumentation = instrumentation
+
+    def compile(self, sheet_name, patrol_data: PatrolData, plan=None, report_date=None):
+        """1日分の書き込み内容を一覧に追加して返す"""
+        plan = plan if plan is not None else WritePlan()
+        plan.reports[sheet_name] = ReportEntry(report_date, patrol_data, [])
+        # 基本情報の書き込み
+        with self.instrumentation.stage('basic_info'):
+            self._basic_info(plan, sheet_name, patrol_data)
+        # 巡回記録の書き込み
+        with self.instrumentation.stage('patrol_records'):
+            self._patrol_records(plan, sheet_name, patrol_data)
+        # その他の時間記録
+        with self.instrumentation.stage('other_records'):
+            self._other_records(plan, sheet_name, patrol_data)
+        return plan
+
+    def _basic_info(self, plan, sheet, patrol_data: PatrolData):
+        """基本情報"""
+        plan.set(sheet, 'I4', patrol_data.weather)
+        plan.set(sheet, 'F6', patrol_data.post4)
+        plan.set(sheet, 'F7', patrol_data.post5)
+        # 設備担当者は登録された通りに出力（そのまま）
+        plan.set(sheet, 'J5', patrol_data.supervisor)
+        plan.set(sheet, 'J6', patrol_data.supervisor)
+
+        # 勤務区分による分岐
+        work_type = patrol_data.work_type
+        if work_type == '早出':
+            plan.set(sheet, 'K4', '7:30～23:00')
+            plan.set(sheet, 'L4', '7:30～23:00')
+            # C10, D10は0埋めなしの文字列で書き込む
+            plan.set(sheet, 'C10', '7:30')
+            plan.set(sheet, 'D10', '7:30')
+            plan.set(sheet, 'E10', patrol_data.post4)
+            plan.set(sheet, 'F10', patrol_data.post4)
+            plan.set_time(sheet, 'C11', '23:00')
+            plan.set(sheet, 'E11', patrol_data.post4)
+        elif work_type == '残業':
+            plan.set(sheet, 'K4', '8:00～24:00')
+            plan.set(sheet, 'L4', '8:00～24:00')
+            plan.set_time(sheet, 'C10', '8:00')
+            plan.set(sheet, 'E10', patrol_data.post1)
+            plan.set_time(sheet, 'C11', '24:00')
+            plan.set_time(sheet, 'D11', '24:00')
+            plan.set(sheet, 'E11', patrol_data.post4)
+        else:
+            plan.set_time(sheet, 'C10', '8:00')
+            plan.set(sheet, 'E10', patrol_data.post1)
+            plan.set_time(sheet, 'C11', '23:00')
+            plan.set(sheet, 'E11', patrol_data.post4)
+
+    def _patrol_records(self, plan, sheet, patrol_data: PatrolData):
+        """巡回記録"""
+        # 4ポストの巡回
+        records = self.time_generator.generate_4post_times(
+            patrol_data.patrol_start,
+            patrol_data.large_theater_used,
+            patrol_data.medium_theater_used,
+            patrol_data.small_theater_used
+        )
+        for cell_start, cell_end, record in records:
+            plan.reports[sheet].records.append(('4ポスト', cell_start, record))
+            plan.set_time(sheet, cell_start, record.start_time)
+            plan.set_time(sheet, cell_end, record.end_time)
+            comment_cell = cell_start.replace('C', 'F').replace('E', 'F')
+            plan.set(sheet, comment_cell, record.comment)
+
+        # 5ポストの巡回
+        records_5post = self.time_generator.generate_5post_times(
+            patrol_data.large_theater_used,
+            patrol_data.medium_theater_used,
+            patrol_data.small_theater_used
+        )
+        for cell_start, cell_end, record in records_5post:
+            plan.reports[sheet].records.append(('5ポスト', cell_start, record))
+            plan.set_time(sheet, cell_start, record.start_time)
+            plan.set_time(sheet, cell_end, record.end_time)
+            comment_cell = cell_start.replace('C', 'F')
+            plan.set(sheet, comment_cell, record.comment)
+
+    def _other_records(self, plan, sheet, patrol_data: PatrolData):
+        """その他の時間記録"""
+        other_times = self.time_generator.generate_other_times()
+        for key, time in other_times.items():
+            plan.reports[sheet].records.append((key, None, TimeRecord(to_minutes(time), None, "")))
+
+        for cell, time, lastname in [
+            ('E32', other_times['morning_4post'], patrol_data.post5_lastname),
+            ('E34', other_times['morning_5post'], patrol_data.post5_lastname),
+            ('E36', other_times['morning_1post'], patrol_data.post1_lastname),
+            ('E38', other_times['morning_4post_2'], patrol_data.post4_lastname)
+        ]:
+            plan.set(sheet, cell, time.lstrip("0"))
+            plan.set(sheet, cell.replace('E', 'G'), lastname)
+
+        # 夜の記録
+        if patrol_data.work_type == '残業':
+            # 残業の場合はH34とI34に23:50を入力
+            plan.set_time(sheet, 'H34', "23:50")
+            plan.set(sheet, 'I34', "23:50")
+        else:
+            plan.set_time(sheet, 'H34', "22:50")
+        plan.set(sheet, 'J34', patrol_data.post5_lastname)
+
+        plan.set_time(sheet, 'H38', other_times['night_4post'])
+        plan.set(sheet, 'J38', patrol_data.post4_lastname)
+
+        plan.set_time(sheet, 'E41', other_times['patrol_4post'])
+        plan.set(sheet, 'G41', patrol_data.post4_lastname)
+        plan.set(sheet, 'F41', "23:50")
+
+        plan.set_time(sheet, 'H41', other_times['patrol_4post_end'])
+        plan.set(sheet, 'J41', patrol_data.post4_lastname)
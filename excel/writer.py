@@ -1,207 +1,401 @@
-from openpyxl import load_workbook
-from openpyxl.styles import Font
-from datetime import datetime
-import io
-import streamlit as st
-from models import PatrolData
-from utils.time_utils import PatrolTimeGenerator
+from contextlib import nullcontext
+from dataclasses import replace
+from datetime import date, datetime
+from typing import Dict
+import weakref
+from models import BatchResult, PatrolData
+from excel.output_cache import output_key
+from excel.output_profile import DEFAULT_OUTPUT_PROFILE, get_output_profile, save_workbook
+from excel.source import DEFAULT_SPOOL_THRESHOLD, TemplateSource
+from excel.template_cache import get_template_cache
+from excel.write_plan import (
+    TIME_CELLS, WritePlan, WritePlanCompiler, recorded_times_from_cells, route_breaks, sheet_name_for
+)
+from excel.xml_writer import XmlPatchEngine, XmlPatchUnsupported
+from utils import notify
+from utils.instrumentation import instrumentation_from_env
+from utils.time_utils import PatrolTimeGenerator, RecordedTimeGenerator
+
+# フォントサイズを小さくするセル（担当者名が長い場合に収めるため）
+FONT_SIZE_CELLS = ('I5', 'I6', 'K5', 'K6')
+
+# 書き込みエンジン: openpyxl（全体を読み書き）/ xml（対象シートのXMLだけを書き換え）
+ENGINES = ('openpyxl', 'xml')
+
 
 class ExcelWriter:
-    def __init__(self):
-        self.time_generator = PatrolTimeGenerator()
+    def __init__(self, template_cache=None, engine='openpyxl', seed=None, history=None,
+                 spool_threshold=DEFAULT_SPOOL_THRESHOLD, progress=None, instrumentation=None,
+                 output_cache=None, output_profile=DEFAULT_OUTPUT_PROFILE):
+        if engine not in ENGINES:
+            raise ValueError(f"未対応の書き込みエンジンです: {engine}")
+        self.engine = engine
+        # 出力ファイルの圧縮設定（default / fast / small）
+        self.output_profile = get_output_profile(output_profile)
+        self.xml_engine = XmlPatchEngine()
+        # seedを指定すると同じ巡回時間を再現できる
+        self.time_generator = PatrolTimeGenerator(seed)
+        # 段階ごとの処理時間の計測（既定では環境変数 DAILY_REPORT_INSTRUMENT で有効化）
+        self.instrumentation = instrumentation or instrumentation_from_env()
+        self.plan_compiler = WritePlanCompiler(self.time_generator, self.instrumentation)
+        # 同じテンプレートの再解析を避けるため、既定ではプロセス共有のキャッシュを使う
+        self.template_cache = template_cache or get_template_cache()
+        # 作成した日報の保存先（ReportHistory、Noneなら保存しない）
+        self.history = history
+        # 作成結果のキャッシュ（OutputCache、seedを指定した場合だけ使う）
+        self.output_cache = output_cache
+        # これより大きいテンプレートは一時ファイルに書き出して読み込む
+        self.spool_threshold = spool_threshold
+        # 進捗の通知先 progress(段階, 0〜1)（バックグラウンド実行時の表示用）
+        self.progress = progress
+        # 結合セルの索引（ワークシートごとに1回だけ作成）
+        self._anchor_indexes = weakref.WeakKeyDictionary()
     
-    def write_report(self, file_bytes, patrol_data: PatrolData):
+    def write_report(self, file_bytes, patrol_data: PatrolData, report_date=None):
         """日報をExcelファイルに書き込む"""
-        wb = load_workbook(io.BytesIO(file_bytes))
-        
         # シート名の取得
-        today = datetime.today()
-        sheet_name = f"{today.month}.{today.day}"
+        report_date = report_date or datetime.today().date()
+        self.instrumentation.start()
+        patrol_data_by_date = {report_date: patrol_data}
+        with self._open_template_timed(file_bytes) as source:
+            key = self._output_key(source, "write_report", patrol_data_by_date)
+            output_bytes = self._cached_output(key)
+            if output_bytes is None:
+                self._report_progress("書き込み内容の作成", 0.05)
+                plan = self.compile_plan(patrol_data_by_date)
+                output_bytes = self.apply_plan(source, plan)
+                self._record_history(plan)
+                self._store_output(key, output_bytes)
+        self.instrumentation.finish("write_report")
+        return output_bytes
+    
+    def write_reports(self, file_bytes, patrol_data_by_date: Dict[date, PatrolData]):
+        """複数日の日報を1回の読み込み・保存でまとめて書き込む"""
+        self.instrumentation.start()
+        with self._open_template_timed(file_bytes) as source:
+            key = self._output_key(source, "write_reports", patrol_data_by_date)
+            result = self._cached_output(key)
+            if result is None:
+                result = self._write_reports(source, patrol_data_by_date)
+                self._store_output(key, result)
+        self.instrumentation.finish("write_reports")
+        # 呼び出し側が一覧を書き換えてもキャッシュに影響しないようにする
+        return replace(result, written_dates=list(result.written_dates), errors=dict(result.errors))
+    
+    def _write_reports(self, source, patrol_data_by_date):
+        self._report_progress("シートの確認", 0.02)
+        with self.instrumentation.stage('sheet_names'):
+            sheet_names = self._sheet_names(source)
+        patrol_data_to_write = {}
+        result_dates = []
+        errors = {}
+        
+        for report_date, patrol_data in sorted(patrol_data_by_date.items()):
+            sheet_name = self.sheet_name_for(report_date)
+            if sheet_name not in sheet_names:
+                errors[report_date] = f"シート {sheet_name} が見つかりません。"
+                continue
+            patrol_data_to_write[report_date] = patrol_data
+            result_dates.append(report_date)
+        
+        if not result_dates:
+            raise ValueError("\n".join(errors.values()) or "対象の日付がありません。")
+        
+        self._report_progress("書き込み内容の作成", 0.05)
+        plan = self.compile_plan(patrol_data_to_write)
+        output_bytes = self.apply_plan(source, plan)
+        self._record_history(plan)
+        return BatchResult(
+            output_bytes=output_bytes,
+            written_dates=result_dates,
+            errors=errors
+        )
+    
+    def _output_key(self, source, operation, patrol_data_by_date):
+        """作成結果のキャッシュキー（キャッシュを使わない場合はNone）
+
+        seedを指定していない場合は毎回異なる時間になるため、キャッシュしない。
+        """
+        if self.output_cache is None or self.time_generator.seed is None:
+            return None
+        with self.instrumentation.stage('digest'):
+            digest = source.digest()
+        return output_key(digest, (self.engine, self.output_profile.name), operation,
+                          patrol_data_by_date, self.time_generator.seed)
+    
+    def _cached_output(self, key):
+        """保存済みの作成結果（なければNone）
+
+        キャッシュを使う場合は、同じキーから常に同じ結果になるよう乱数をseedから初期化し直す。
+        """
+        if key is None:
+            return None
+        output = self.output_cache.get(key)
+        if output is not None:
+            self.instrumentation.count('output_cache_hits')
+            self._report_progress("作成済みの結果を使用", 0.9)
+            return output
+        self.time_generator.reset()
+        return None
+    
+    def _store_output(self, key, output):
+        if key is not None:
+            self.output_cache.put(key, output)
+    
+    def update_report(self, report_bytes, old_patrol_data: PatrolData, new_patrol_data: PatrolData,
+                      report_date=None, template_bytes=None):
+        """作成済みの日報のうち、入力の変更で値が変わるセルだけを書き換える
+
+        日報のシートから作成時の巡回開始・その他の時間を読み取り、変更前後のPatrolDataを
+        その時刻で書き込み内容に変換して比べる。劇場使用・勤務区分を変えた場合は開始時刻を
+        そのままに手順の時刻だけを作り直し、巡回開始時刻の区分を変えた場合だけ開始時刻も作り直す。
+        勤務区分の変更で書き込まなくなるセル（K4・D10など）はtemplate_bytes（作成に使った
+        テンプレート）の値に戻す。変更がなければ作成済みの日報をそのまま返す。
+        """
+        report_date = report_date or datetime.today().date()
+        sheet_name = self.sheet_name_for(report_date)
+        self.instrumentation.start()
+        self._report_progress("変更箇所の確認", 0.05)
         
-        if sheet_name not in wb.sheetnames:
-            raise ValueError(f"シート {sheet_name} が見つかりません。")
+        with self._open_template_timed(report_bytes) as source:
+            if old_patrol_data == new_patrol_data:
+                # 入力が同じなら日報を読み込まずにそのまま返す
+                output_bytes = self._read_bytes(report_bytes, source)
+                self.instrumentation.count('changed_cells', 0)
+                self.instrumentation.finish("update_report")
+                return output_bytes
+            with self.instrumentation.stage('read_report'):
+                cells = self._read_cells(source, sheet_name, TIME_CELLS)
+            recorded = recorded_times_from_cells(cells)
+            # 作り直す時刻は変更前後で同じ乱数を使う
+            seed = self.time_generator.random.getrandbits(64)
+            old_plan = WritePlanCompiler(RecordedTimeGenerator(recorded, seed)).compile(
+                sheet_name, old_patrol_data, report_date=report_date)
+            new_plan = WritePlanCompiler(RecordedTimeGenerator(recorded, seed), self.instrumentation).compile(
+                sheet_name, new_patrol_data, report_date=report_date)
+            original = self._original_values(template_bytes, old_plan.dropped(new_plan))
+            changes = old_plan.diff(new_plan, original)
+            self.instrumentation.count('changed_cells', len(changes))
+            # 書き換え後の巡回の終了時刻と次の開始時刻が一致することを確認する
+            updated = dict(cells, **changes.values_for(sheet_name))
+            breaks = route_breaks(updated)
+            if breaks:
+                raise ValueError("修正後の巡回時間がつながりません: " + ", ".join(
+                    f"{end_cell}→{start_cell}" for end_cell, start_cell in breaks))
+            if not changes:
+                output_bytes = self._read_bytes(report_bytes, source)
+            else:
+                output_bytes = self.apply_plan(source, changes)
+        if changes:
+            self._record_history(new_plan)
+        self.instrumentation.finish("update_report")
+        return output_bytes
+    
+    def _original_values(self, template_bytes, keys):
+        """書き込まなくなるセルのテンプレートでの値 {(シート名, セル番地): 値}
+
+        結合セルの左上以外のセルは値を持たないため含めない（左上セルの値を消さないように）。
+        """
+        if not keys:
+            return {}
+        if template_bytes is None:
+            raise ValueError(
+                "書き込まなくなるセル（" + ", ".join(cell for _, cell in keys) + "）を元に戻すため、"
+                "作成に使ったテンプレートを指定してください。"
+            )
+        with self.instrumentation.stage('read_template'):
+            # 数式もそのまま戻せるよう、計算結果ではなくセルの内容を読む
+            wb = self.template_cache.load_workbook(template_bytes)
+        original = {}
+        for sheet_name, cell in keys:
+            if sheet_name not in wb.sheetnames:
+                raise ValueError(f"テンプレートにシート {sheet_name} が見つかりません。")
+            ws = wb[sheet_name]
+            if self._merged_anchor_index(ws).get(cell, cell) == cell:
+                original[sheet_name, cell] = ws[cell].value
+        return original
+    
+    @staticmethod
+    def _read_bytes(report_bytes, source):
+        if isinstance(report_bytes, bytes):
+            return report_bytes
+        with source.open() as f:
+            return f.read()
+    
+    @staticmethod
+    def _read_cells(source, sheet_name, cells):
+        """シートの指定セルの値を読み取り専用モードで読み込む {セル番地: 値}"""
+        from openpyxl import load_workbook
+        from openpyxl.utils import coordinate_to_tuple
+        positions = {cell: coordinate_to_tuple(cell) for cell in cells}
+        max_row = max(row for row, _ in positions.values())
+        max_col = max(col for _, col in positions.values())
+        with source.open() as f:
+            wb = load_workbook(f, read_only=True, data_only=True)
+            try:
+                if sheet_name not in wb.sheetnames:
+                    raise ValueError(f"シート {sheet_name} が見つかりません。")
+                rows = list(wb[sheet_name].iter_rows(max_row=max_row, max_col=max_col, values_only=True))
+            finally:
+                wb.close()
+        values = {}
+        for cell, (row, col) in positions.items():
+            if row <= len(rows) and col <= len(rows[row - 1]):
+                values[cell] = rows[row - 1][col - 1]
+        return values
+    
+    def open_template(self, file_bytes):
+        """テンプレートを1度だけ包み、以降の読み込みでコピーしないようにする
+
+        bytes・UploadedFileは内部バッファをそのまま参照し、
+        spool_thresholdを超える場合は一時ファイルに書き出す（withを抜けると削除）。
+        """
+        if isinstance(file_bytes, TemplateSource):
+            # 呼び出し側が用意したものは呼び出し側で閉じる
+            return nullcontext(file_bytes)
+        return TemplateSource.wrap(file_bytes, self.spool_threshold)
+    
+    def _open_template_timed(self, file_bytes):
+        with self.instrumentation.stage('open_template'):
+            return self.open_template(file_bytes)
+    
+    @staticmethod
+    def sheet_name_for(report_date):
+        """日付に対応するシート名（M.D形式）"""
+        return sheet_name_for(report_date)
+    
+    def compile_plan(self, patrol_data_by_date) -> WritePlan:
+        """日付ごとのPatrolDataから書き込み内容の一覧を作成（ファイルには触れない）"""
+        plan = WritePlan()
+        for report_date, patrol_data in patrol_data_by_date.items():
+            self.plan_compiler.compile(self.sheet_name_for(report_date), patrol_data, plan, report_date)
+        return plan
+    
+    def apply_plan(self, file_bytes, plan: WritePlan):
+        """書き込み内容の一覧をテンプレートに適用してバイト配列を返す"""
+        file_bytes = TemplateSource.wrap(file_bytes)
+        instrumentation = self.instrumentation
+        instrumentation.count('bytes_in', file_bytes.size)
+        if self.engine == 'xml':
+            try:
+                self._report_progress("シートの書き換え", 0.2)
+                with instrumentation.stage('xml_patch'):
+                    output_bytes = self.xml_engine.patch(
+                        file_bytes, plan, font_cells=FONT_SIZE_CELLS, profile=self._xml_profile())
+                instrumentation.count('cell_writes', len(plan))
+                instrumentation.count('bytes_out', len(output_bytes))
+                return output_bytes
+            except XmlPatchUnsupported as e:
+                notify.info(f"XML直接書き込みに対応していないテンプレートのため通常処理で作成します: {e}")
         
-        ws = wb[sheet_name]
+        # シートがない場合は全体を読み込む前に中止する
+        with instrumentation.stage('preflight'):
+            self._check_sheets(file_bytes, plan.sheets())
         
-        # 基本情報の書き込み
-        self._write_basic_info(ws, patrol_data)
+        self._report_progress("テンプレートの読み込み", 0.1)
+        with instrumentation.stage('load_workbook'):
+            wb = self.template_cache.load_workbook(file_bytes)
         
-        # 巡回記録の書き込み
-        self._write_patrol_records(ws, patrol_data)
+        for sheet_name in plan.sheets():
+            if sheet_name not in wb.sheetnames:
+                raise ValueError(f"シート {sheet_name} が見つかりません。")
         
-        # その他の時間記録
-        self._write_other_records(ws, patrol_data)
+        # 結合セルを左上セルにまとめてから一括で書き込む
+        self._report_progress("セルへの書き込み", 0.5)
+        with instrumentation.stage('write_cells'):
+            resolved = plan.resolve(lambda sheet_name: self._merged_anchor_index(wb[sheet_name]))
+            for sheet_name, cell, value in resolved:
+                self._safe_set_cell_value(wb[sheet_name], cell, value)
+        instrumentation.count('cell_writes', len(resolved))
         
         # フォントサイズの設定
-        self._set_font_sizes(wb)
+        with instrumentation.stage('font_sizes'):
+            self._set_font_sizes(wb)
         
-        # バイト配列として返す
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)
-        return output.getvalue()
+        self._report_progress("ファイルの保存", 0.7)
+        with instrumentation.stage('save'):
+            output_bytes = self._save(wb)
+        instrumentation.count('bytes_out', len(output_bytes))
+        return output_bytes
+    
+    def _record_history(self, plan):
+        """作成した内容を履歴に保存（失敗しても日報の作成は止めない）"""
+        if self.history is None:
+            return
+        self._report_progress("履歴の保存", 0.95)
+        try:
+            with self.instrumentation.stage('history'):
+                self.history.record_plan(plan)
+        except Exception as e:
+            notify.warning(f"履歴の保存でエラー: {e}")
+    
+    def _report_progress(self, stage, fraction):
+        if self.progress is not None:
+            self.progress(stage, fraction)
+    
+    def _check_sheets(self, file_bytes, sheet_names):
+        """書き込み先のシートがあるかをzip内のworkbook.xmlだけで確認"""
+        try:
+            existing = set(self.xml_engine.sheet_names(file_bytes))
+        except XmlPatchUnsupported:
+            # 読み込めない場合はopenpyxlでの読み込み後に確認する
+            return
+        for sheet_name in sheet_names:
+            if sheet_name not in existing:
+                raise ValueError(f"シート {sheet_name} が見つかりません。")
+    
+    def _sheet_names(self, file_bytes):
+        """テンプレートのシート名一覧"""
+        try:
+            return self.xml_engine.sheet_names(file_bytes)
+        except XmlPatchUnsupported:
+            return self.template_cache.load_workbook(file_bytes).sheetnames
+    
+    def _save(self, wb):
+        """出力形式の圧縮設定でバイト配列として返す"""
+        return save_workbook(wb, self.output_profile)
+    
+    def _xml_profile(self):
+        """XMLエンジンの圧縮設定（標準ではテンプレートの圧縮をそのまま使う）"""
+        if self.output_profile.name == DEFAULT_OUTPUT_PROFILE:
+            return None
+        return self.output_profile
+    
+    def _merged_anchor_index(self, ws):
+        """結合セル内の座標→左上セル座標の索引を返す（初回のみ作成）"""
+        index = self._anchor_indexes.get(ws)
+        if index is None:
+            from openpyxl.utils import get_column_letter
+            index = {}
+            for merged_range in ws.merged_cells.ranges:
+                top_left = merged_range.start_cell.coordinate
+                for row, col in merged_range.cells:
+                    index[f"{get_column_letter(col)}{row}"] = top_left
+            self._anchor_indexes[ws] = index
+            # 索引の作成回数・走査した結合範囲数（セルの書き込み数に比例しないことの確認用）
+            self.instrumentation.count('anchor_index_builds')
+            self.instrumentation.count('merged_range_scans', len(ws.merged_cells.ranges))
+        return index
     
     def _safe_set_cell_value(self, ws, cell_address, value):
         """結合セルかどうかをチェックしてから値を設定"""
         try:
-            cell = ws[cell_address]
-            for merged_range in ws.merged_cells.ranges:
-                if cell.coordinate in merged_range:
-                    top_left = merged_range.start_cell
-                    ws[top_left.coordinate] = value
-                    return
-            cell.value = value
+            anchor = self._merged_anchor_index(ws).get(cell_address, cell_address)
+            ws[anchor] = value
         except Exception as e:
-            st.warning(f"セル {cell_address} への値設定でエラー: {e}")
+            notify.warning(f"セル {cell_address} への値設定でエラー: {e}")
             # エラーが発生しても処理を継続
             try:
                 ws[cell_address] = value
             except Exception as fallback_error:
-                st.error(f"フォールバック処理でもエラー: {fallback_error}")
-    
-    def _set_time(self, ws, cell, time_str):
-        """時間をセルに設定（0埋め除去対応）"""
-        if time_str:
-            try:
-                if isinstance(time_str, str):
-                    # 0埋め除去
-                    time_str = time_str.lstrip("0") if time_str != "-" else time_str
-                    # 文字列として書き込む
-                    self._safe_set_cell_value(ws, cell, time_str)
-                else:
-                    self._safe_set_cell_value(ws, cell, str(time_str).lstrip("0"))
-            except Exception as time_error:
-                self._safe_set_cell_value(ws, cell, time_str)
-    
-    def _write_basic_info(self, ws, patrol_data: PatrolData):
-        """基本情報を書き込む"""
-        self._safe_set_cell_value(ws, 'I4', patrol_data.weather)
-        self._safe_set_cell_value(ws, 'F6', patrol_data.post4)
-        self._safe_set_cell_value(ws, 'F7', patrol_data.post5)
-        # 設備担当者は登録された通りに出力（そのまま）
-        self._safe_set_cell_value(ws, 'J5', patrol_data.supervisor)
-        self._safe_set_cell_value(ws, 'J6', patrol_data.supervisor)
-
-        # 勤務区分による分岐
-        if getattr(patrol_data, 'work_type', '通常') == '早出':
-            # 早出
-            self._safe_set_cell_value(ws, 'K4', '7:30～23:00')
-            self._safe_set_cell_value(ws, 'L4', '7:30～23:00')
-            # C10, D10は0埋めなしの文字列で書き込む
-            self._safe_set_cell_value(ws, 'C10', '7:30')
-            self._safe_set_cell_value(ws, 'D10', '7:30')
-            self._safe_set_cell_value(ws, 'E10', patrol_data.post4)
-            self._safe_set_cell_value(ws, 'F10', patrol_data.post4)
-            self._set_time(ws, 'C11', '23:00')
-            self._safe_set_cell_value(ws, 'E11', patrol_data.post4)
-        elif getattr(patrol_data, 'work_type', '通常') == '残業':
-            # 残業
-            self._safe_set_cell_value(ws, 'K4', '8:00～24:00')
-            self._safe_set_cell_value(ws, 'L4', '8:00～24:00')
-            # C10は従来通り（例として）
-            self._set_time(ws, 'C10', '8:00')
-            self._safe_set_cell_value(ws, 'E10', patrol_data.post1)
-            self._set_time(ws, 'C11', '24:00')
-            self._set_time(ws, 'D11', '24:00')
-            self._safe_set_cell_value(ws, 'E11', patrol_data.post4)
-        else:
-            # 通常
-            self._set_time(ws, 'C10', '8:00')
-            self._safe_set_cell_value(ws, 'E10', patrol_data.post1)
-            self._set_time(ws, 'C11', '23:00')
-            self._safe_set_cell_value(ws, 'E11', patrol_data.post4)
-    
-    def _write_patrol_records(self, ws, patrol_data: PatrolData):
-        """巡回記録を書き込む"""
-        # 4ポストの巡回
-        records = self.time_generator.generate_4post_times(
-            patrol_data.patrol_start,
-            patrol_data.large_theater_used,
-            patrol_data.medium_theater_used,
-            patrol_data.small_theater_used
-        )
-        
-        for cell_start, cell_end, record in records:
-            if record.start_time != "-":
-                self._set_time(ws, cell_start, record.start_time)
-            else:
-                self._safe_set_cell_value(ws, cell_start, "-")
-                
-            if record.end_time != "-":
-                self._set_time(ws, cell_end, record.end_time)
-            else:
-                self._safe_set_cell_value(ws, cell_end, "-")
-            
-            # コメントの書き込み
-            comment_cell = cell_start.replace('C', 'F').replace('E', 'F')
-            self._safe_set_cell_value(ws, comment_cell, record.comment)
-        
-        # 5ポストの巡回
-        records_5post = self.time_generator.generate_5post_times(
-            patrol_data.large_theater_used,
-            patrol_data.medium_theater_used,
-            patrol_data.small_theater_used
-        )
-        
-        for cell_start, cell_end, record in records_5post:
-            self._set_time(ws, cell_start, record.start_time)
-            self._set_time(ws, cell_end, record.end_time)
-            comment_cell = cell_start.replace('C', 'F')
-            self._safe_set_cell_value(ws, comment_cell, record.comment)
-    
-    def _write_other_records(self, ws, patrol_data: PatrolData):
-        """その他の時間記録を書き込む"""
-        other_times = self.time_generator.generate_other_times()
-        
-        for cell, time, name_attr in [
-            ('E32', other_times['morning_4post'], 'post5_lastname'),
-            ('E34', other_times['morning_5post'], 'post5_lastname'),
-            ('E36', other_times['morning_1post'], 'post1_lastname'),
-            ('E38', other_times['morning_4post_2'], 'post4_lastname')
-        ]:
-            self._safe_set_cell_value(ws, cell, time.lstrip("0"))
-            name_cell = cell.replace('E', 'G')
-            self._safe_set_cell_value(ws, name_cell, 
-                                    getattr(patrol_data, name_attr))
-        
-        # 夜の記録
-        if getattr(patrol_data, 'work_type', '通常') == '残業':
-            # 残業の場合はH34とI34に23:50を入力
-            self._set_time(ws, 'H34', "23:50")
-            self._safe_set_cell_value(ws, 'I34', "23:50")
-        else:
-            self._set_time(ws, 'H34', "22:50")
-        self._safe_set_cell_value(ws, 'J34', patrol_data.post5_lastname)
-        
-        self._set_time(ws, 'H38', other_times['night_4post'])
-        self._safe_set_cell_value(ws, 'J38', patrol_data.post4_lastname)
-        
-        self._set_time(ws, 'E41', other_times['patrol_4post'])
-        self._safe_set_cell_value(ws, 'G41', patrol_data.post4_lastname)
-        self._safe_set_cell_value(ws, 'F41', "23:50")
-        
-        self._set_time(ws, 'H41', other_times['patrol_4post_end'])
-        self._safe_set_cell_value(ws, 'J41', patrol_data.post4_lastname)
+                notify.error(f"フォールバック処理でもエラー: {fallback_error}")
     
     def _set_font_sizes(self, wb):
         """特定セルのフォントサイズを設定"""
+        from openpyxl.styles import Font
         for ws_item in wb.worksheets:
-            for cell in ['I5', 'I6', 'K5', 'K6']:
+            for cell in FONT_SIZE_CELLS:
                 try:
                     ws_item[cell].font = Font(size=8)
                 except Exception as font_error:
-                    st.write(f"フォント設定エラー (セル {cell}): {font_error}")
-
-# 追加ボタンが押されたら、rerun で初期値に戻す
-st.session_state.new_security = ""
-st.session_state.new_facility = ""
-new_security = st.text_input("新しい警備担当者を追加", key="new_security")
-if st.button("追加", key="add_security"):
-    if new_security:
-        if config.add_security_staff(new_security):
-            st.success(f"'{new_security}' を追加しました。")
-            st.experimental_rerun()  # これでフィールドが初期化される
-        else:
-            st.warning("既に登録されているか、無効な名前です。")
-    else:
-        st.warning("名前を入力してください。")
\ No newline at end of file
+                    notify.warning(f"フォント設定エラー (セル {cell}): {font_error}")
@@ -0,0 +1,344 @@
+import io
+import posixpath
+import re
+import shutil
+import zipfile
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+from excel.output_profile import apply_to_member
+from excel.source import TemplateSource
+
+MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+_SHEET_DATA_RE = re.compile(r"<sheetData\s*/>|<sheetData>(.*?)</sheetData>", re.S)
+_ROW_RE = re.compile(r"<row\b([^>]*?)(?:/>|>(.*?)</row>)", re.S)
+_CELL_RE = re.compile(r"<c\b([^>]*?)(?:/>|>(.*?)</c>)", re.S)
+_ATTR_RE = r'\b{}="([^"]*)"'
+_MERGE_RE = re.compile(r'<mergeCell\b[^>]*\bref="([A-Z]+\d+):([A-Z]+\d+)"')
+_DIMENSION_RE = re.compile(r'<dimension\b[^>]*\bref="([^"]*)"\s*/>')
+_COORD_RE = re.compile(r"^([A-Z]+)(\d+)$")
+_ILLEGAL_CHARS_RE = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+class XmlPatchUnsupported(Exception):
+    """XMLの直接書き換えに対応していないテンプレート（openpyxlで処理する）"""
+
+
+def column_index(letters):
+    """列名（A, B, ..., AA）を1始まりの番号に変換"""
+    index = 0
+    for ch in letters:
+        index = index * 26 + ord(ch) - 64
+    return index
+
+
+def column_letters(index):
+    """1始まりの列番号を列名に変換"""
+    letters = ""
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def split_coordinate(coordinate):
+    """'C17' -> (3, 17)"""
+    match = _COORD_RE.match(coordinate)
+    if not match:
+        raise XmlPatchUnsupported(f"セル番地 {coordinate} を解釈できません。")
+    return column_index(match.group(1)), int(match.group(2))
+
+
+def _attr(attrs, name):
+    match = re.search(_ATTR_RE.format(name), attrs)
+    return match.group(1) if match else None
+
+
+def _without_attrs(attrs, *names):
+    for name in names:
+        attrs = re.sub(r'\s*\b{}="[^"]*"'.format(name), "", attrs)
+    return attrs
+
+
+class XmlPatchEngine:
+    """xlsx（zip）内の対象シートXMLだけを書き換えるエンジン
+
+    シートXML（書き込み先と、フォントサイズを変更するシート）とstyles.xmlだけを書き換え、
+    その他のメンバーは内容を変えずにそのまま出力へ流す。値は共有文字列を使わずインライン文字列で書き込む。
+    """
+
+    def read_sheet_paths(self, zin):
+        """シート名 -> zip内のシートXMLパス"""
+        workbook = ElementTree.fromstring(zin.read("xl/workbook.xml"))
+        rels = ElementTree.fromstring(zin.read("xl/_rels/workbook.xml.rels"))
+        targets = {
+            rel.get("Id"): rel.get("Target")
+            for rel in rels.iter(f"{{{PKG_REL_NS}}}Relationship")
+        }
+        paths = {}
+        for sheet in workbook.iter(f"{{{MAIN_NS}}}sheet"):
+            target = targets.get(sheet.get(f"{{{REL_NS}}}id"))
+            if target is None:
+                continue
+            if target.startswith("/"):
+                paths[sheet.get("name")] = target.lstrip("/")
+            else:
+                paths[sheet.get("name")] = posixpath.normpath(posixpath.join("xl", target))
+        return paths
+
+    def sheet_names(self, file_bytes):
+        """ブック内のシート名一覧（シートXMLは読み込まない）"""
+        try:
+            with TemplateSource.wrap(file_bytes).open() as f, zipfile.ZipFile(f) as zin:
+                return list(self.read_sheet_paths(zin))
+        except (zipfile.BadZipFile, KeyError, ElementTree.ParseError) as e:
+            raise XmlPatchUnsupported(f"ブックの構成を読み込めません: {e}")
+
+    def merged_anchor_index(self, sheet_xml):
+        """結合セル内の座標 -> 左上セル座標の索引"""
+        index = {}
+        for start, end in _MERGE_RE.findall(sheet_xml):
+            min_col, min_row = split_coordinate(start)
+            max_col, max_row = split_coordinate(end)
+            for row in range(min_row, max_row + 1):
+                for col in range(min_col, max_col + 1):
+                    index[f"{column_letters(col)}{row}"] = start
+        return index
+
+    def patch(self, file_bytes, plan, font_cells=(), font_size=8, profile=None):
+        """書き込み内容の一覧（WritePlan）を適用したxlsxのバイト列を返す
+
+        font_cells: フォントサイズを変更するセル番地（openpyxlエンジンと同じく全ワークシートに適用）
+        profile: 出力の圧縮設定（OutputProfile、Noneならメンバーごとにテンプレートと同じ圧縮）
+        """
+        with TemplateSource.wrap(file_bytes).open() as f:
+            try:
+                zin = zipfile.ZipFile(f)
+            except zipfile.BadZipFile as e:
+                raise XmlPatchUnsupported(f"xlsxファイルとして読み込めません: {e}")
+            with zin:
+                return self._patch_zip(zin, plan, font_cells, font_size, profile)
+
+    def _patch_zip(self, zin, plan, font_cells, font_size, profile=None):
+        """開いたテンプレートから書き換え後のxlsxを作成"""
+        try:
+            sheet_paths = self.read_sheet_paths(zin)
+            styles_xml = zin.read("xl/styles.xml").decode("utf-8")
+        except (KeyError, ElementTree.ParseError) as e:
+            raise XmlPatchUnsupported(f"ブックの構成を読み込めません: {e}")
+        missing = [name for name in plan.sheets() if name not in sheet_paths]
+        if missing:
+            raise ValueError(f"シート {missing[0]} が見つかりません。")
+
+        # フォントサイズはopenpyxlエンジン（wb.worksheets）と同じく全ワークシートで変更する
+        font_sheets = [
+            sheet_name for sheet_name, path in sheet_paths.items() if "/worksheets/" in path
+        ] if font_cells else []
+        sheet_xmls = {
+            sheet_name: zin.read(sheet_paths[sheet_name]).decode("utf-8")
+            for sheet_name in dict.fromkeys(plan.sheets() + font_sheets)
+        }
+        # 結合セルは左上セルに書き込む
+        resolved = plan.resolve(lambda sheet_name: self.merged_anchor_index(sheet_xmls[sheet_name]))
+
+        styles = _StylePatcher(styles_xml, font_size)
+        patched = {}
+        for sheet_name, sheet_xml in sheet_xmls.items():
+            cells = {
+                cell: ("value", value)
+                for cell, value in resolved.values_for(sheet_name).items()
+            }
+            for coordinate in (font_cells if sheet_name in font_sheets else ()):
+                kind, value = cells.get(coordinate, ("style", None))
+                cells[coordinate] = (kind + "+font", value)
+            patched[sheet_paths[sheet_name]] = _patch_sheet_xml(sheet_xml, cells, styles).encode("utf-8")
+        if styles.changed:
+            patched["xl/styles.xml"] = styles.render().encode("utf-8")
+
+        output = io.BytesIO()
+        with zipfile.ZipFile(output, "w") as zout:
+            for info in zin.infolist():
+                out_info = zipfile.ZipInfo(info.filename, info.date_time)
+                out_info.compress_type = info.compress_type
+                out_info.external_attr = info.external_attr
+                if profile is not None:
+                    apply_to_member(out_info, profile)
+                if info.filename in patched:
+                    zout.writestr(out_info, patched[info.filename])
+                else:
+                    # 対象外のメンバーは内容をそのまま流す
+                    with zin.open(info) as src, zout.open(out_info, "w") as dst:
+                        shutil.copyfileobj(src, dst)
+        return output.getvalue()
+
+
+def _cell_xml(coordinate, style, value):
+    """セル要素を作成（文字列はインライン文字列として書き込む）"""
+    style_attr = f' s="{style}"' if style not in (None, "0") else ""
+    if value is None:
+        return f'<c r="{coordinate}"{style_attr}/>'
+    if isinstance(value, bool):
+        return f'<c r="{coordinate}"{style_attr} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c r="{coordinate}"{style_attr}><v>{value}</v></c>'
+    text = str(value)
+    if isinstance(value, str) and text.startswith("="):
+        # openpyxlは"="で始まる文字列を数式として書き込むため、同じ結果にできない
+        raise XmlPatchUnsupported(f"セル {coordinate} の値は数式です。")
+    if _ILLEGAL_CHARS_RE.search(text):
+        raise XmlPatchUnsupported(f"セル {coordinate} の値に使用できない文字が含まれています。")
+    return (f'<c r="{coordinate}"{style_attr} t="inlineStr">'
+            f'<is><t xml:space="preserve">{escape(text)}</t></is></c>')
+
+
+def _patch_row_cells(row_body, row_cells, styles):
+    """行内のセルを書き換え・追加する（列順を保つ）"""
+    pending = dict(row_cells)  # 列番号 -> (番地, 種別, 値)
+    parts = []
+    pos = 0
+    for match in _CELL_RE.finditer(row_body or ""):
+        coordinate = _attr(match.group(1), "r")
+        if coordinate is None:
+            raise XmlPatchUnsupported("セル番地のないセル要素があります。")
+        col, _ = split_coordinate(coordinate)
+        # 既存セルより左に入る新規セルを先に出力
+        for new_col in sorted(c for c in pending if c < col):
+            parts.append(row_body[pos:match.start()])
+            pos = match.start()
+            parts.append(_new_cell(pending.pop(new_col), None, None, styles))
+        if col in pending:
+            parts.append(row_body[pos:match.start()])
+            parts.append(_new_cell(pending.pop(col), match.group(1), match.group(2), styles))
+            pos = match.end()
+    parts.append((row_body or "")[pos:])
+    for new_col in sorted(pending):
+        parts.append(_new_cell(pending[new_col], None, None, styles))
+    return "".join(parts)
+
+
+def _new_cell(cell, attrs, body, styles):
+    coordinate, kind, value = cell
+    style = _attr(attrs, "s") if attrs else None
+    if body and "<f" in body:
+        # 数式セルを上書きするとcalcChainの整合が取れないため対象外とする
+        raise XmlPatchUnsupported(f"セル {coordinate} は数式セルです。")
+    if kind.endswith("+font"):
+        style = styles.with_font_size(style)
+    if kind.startswith("style"):
+        if body:
+            # 値は変えずにスタイルだけ差し替える
+            return f'<c{_without_attrs(attrs, "s")} s="{style}">{body}</c>'
+        value = None
+    return _cell_xml(coordinate, style, value)
+
+
+def _patch_sheet_xml(sheet_xml, cells, styles):
+    """シートXMLのsheetData内の対象セルを書き換える"""
+    match = _SHEET_DATA_RE.search(sheet_xml)
+    if not match:
+        raise XmlPatchUnsupported("sheetData要素が見つかりません。")
+
+    by_row = {}
+    for coordinate, (kind, value) in cells.items():
+        col, row = split_coordinate(coordinate)
+        by_row.setdefault(row, {})[col] = (coordinate, kind, value)
+
+    body = match.group(1) or ""
+    parts = []
+    pos = 0
+    for row_match in _ROW_RE.finditer(body):
+        row_number = _attr(row_match.group(1), "r")
+        if row_number is None:
+            raise XmlPatchUnsupported("行番号のない行要素があります。")
+        row_number = int(row_number)
+        # 既存行より上に入る新規行を先に出力
+        for new_row in sorted(r for r in by_row if r < row_number):
+            parts.append(body[pos:row_match.start()])
+            pos = row_match.start()
+            parts.append(f'<row r="{new_row}">{_patch_row_cells("", by_row.pop(new_row), styles)}</row>')
+        if row_number in by_row:
+            parts.append(body[pos:row_match.start()])
+            # 列範囲が変わるためspansは削除する（省略可能な属性）
+            attrs = _without_attrs(row_match.group(1), "spans")
+            row_body = _patch_row_cells(row_match.group(2), by_row.pop(row_number), styles)
+            parts.append(f"<row{attrs}>{row_body}</row>")
+            pos = row_match.end()
+    parts.append(body[pos:])
+    for new_row in sorted(by_row):
+        parts.append(f'<row r="{new_row}">{_patch_row_cells("", by_row[new_row], styles)}</row>')
+
+    patched = sheet_xml[:match.start()] + "<sheetData>" + "".join(parts) + "</sheetData>" + sheet_xml[match.end():]
+    return _expand_dimension(patched, cells)
+
+
+def _expand_dimension(sheet_xml, cells):
+    """dimension要素の範囲を書き込んだセルまで広げる"""
+    match = _DIMENSION_RE.search(sheet_xml)
+    if not match:
+        return sheet_xml
+    refs = match.group(1).split(":")
+    try:
+        bounds = [split_coordinate(ref) for ref in refs]
+    except XmlPatchUnsupported:
+        return sheet_xml
+    bounds += [split_coordinate(coordinate) for coordinate in cells]
+    min_col = min(c for c, _ in bounds)
+    min_row = min(r for _, r in bounds)
+    max_col = max(c for c, _ in bounds)
+    max_row = max(r for _, r in bounds)
+    ref = f"{column_letters(min_col)}{min_row}:{column_letters(max_col)}{max_row}"
+    return sheet_xml[:match.start(1)] + ref + sheet_xml[match.end(1):]
+
+
+class _StylePatcher:
+    """styles.xmlにフォントサイズ変更用のフォントとセル書式を追加する"""
+
+    _FONTS_RE = re.compile(r"<fonts\b([^>]*)>(.*?)</fonts>", re.S)
+    _FONT_RE = re.compile(r"<font\b[^>]*?(?:/>|>.*?</font>)", re.S)
+    _XFS_RE = re.compile(r"<cellXfs\b([^>]*)>(.*?)</cellXfs>", re.S)
+    _XF_RE = re.compile(r"<xf\b([^>]*?)(/>|>.*?</xf>)", re.S)
+
+    def __init__(self, styles_xml, font_size):
+        self.styles_xml = styles_xml
+        self.font_size = font_size
+        fonts = self._FONTS_RE.search(styles_xml)
+        xfs = self._XFS_RE.search(styles_xml)
+        if not fonts or not xfs:
+            raise XmlPatchUnsupported("styles.xmlの形式に対応していません。")
+        self.font_count = len(self._FONT_RE.findall(fonts.group(2)))
+        self.xfs = self._XF_RE.findall(xfs.group(2))
+        self.new_xfs = []
+        self.font_id = None
+        self._styles = {}
+        self.changed = False
+
+    def with_font_size(self, style):
+        """既存の書式をフォントだけ差し替えた書式番号を返す"""
+        style = style or "0"
+        if style not in self._styles:
+            if self.font_id is None:
+                self.font_id = self.font_count
+            index = int(style)
+            if index >= len(self.xfs):
+                raise XmlPatchUnsupported(f"書式番号 {style} がstyles.xmlにありません。")
+            attrs, rest = self.xfs[index]
+            attrs = _without_attrs(attrs, "fontId", "applyFont")
+            self.new_xfs.append(f'<xf{attrs} fontId="{self.font_id}" applyFont="1"{rest}')
+            self._styles[style] = str(len(self.xfs) + len(self.new_xfs) - 1)
+            self.changed = True
+        return self._styles[style]
+
+    def render(self):
+        """追加分を反映したstyles.xml"""
+        xml = self.styles_xml
+        if self.font_id is not None:
+            match = self._FONTS_RE.search(xml)
+            attrs = re.sub(r'\bcount="\d+"', f'count="{self.font_count + 1}"', match.group(1))
+            fonts = f'<fonts{attrs}>{match.group(2)}<font><sz val="{self.font_size}"/></font></fonts>'
+            xml = xml[:match.start()] + fonts + xml[match.end():]
+        match = self._XFS_RE.search(xml)
+        attrs = re.sub(r'\bcount="\d+"', f'count="{len(self.xfs) + len(self.new_xfs)}"', match.group(1))
+        xfs = f'<cellXfs{attrs}>{match.group(2)}{"".join(self.new_xfs)}</cellXfs>'
+        return xml[:match.start()] + xfs + xml[match.end():]
@@ -0,0 +1,219 @@
+import os
+import sqlite3
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date, datetime
+from models import PatrolData, TimeRecord
+
+# 履歴で扱うポスト名とPatrolDataの項目
+POSTS = (
+    ('4ポスト', 'post4'),
+    ('5ポスト', 'post5'),
+    ('1ポスト', 'post1'),
+    ('設備担当', 'supervisor'),
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id INTEGER PRIMARY KEY,
+    report_date TEXT NOT NULL UNIQUE,
+    post4 TEXT NOT NULL,
+    post5 TEXT NOT NULL,
+    post1 TEXT NOT NULL,
+    supervisor TEXT NOT NULL,
+    patrol_start TEXT NOT NULL,
+    large_theater_used INTEGER NOT NULL,
+    medium_theater_used INTEGER NOT NULL,
+    small_theater_used INTEGER NOT NULL,
+    weather TEXT NOT NULL,
+    work_type TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS assignments (
+    report_id INTEGER NOT NULL REFERENCES reports(id) ON DELETE CASCADE,
+    report_date TEXT NOT NULL,
+    post TEXT NOT NULL,
+    staff TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS time_records (
+    report_id INTEGER NOT NULL REFERENCES reports(id) ON DELETE CASCADE,
+    post TEXT NOT NULL,
+    cell TEXT,
+    start_time TEXT NOT NULL,
+    end_time TEXT NOT NULL,
+    comment TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_assignments_staff ON assignments(staff, report_date);
+CREATE INDEX IF NOT EXISTS idx_assignments_post ON assignments(post, report_date);
+CREATE INDEX IF NOT EXISTS idx_assignments_report ON assignments(report_id);
+CREATE INDEX IF NOT EXISTS idx_time_records_report ON time_records(report_id);
+"""
+
+
+class ReportHistory:
+    """作成した日報の内容を保存するSQLiteデータベース
+
+    同じ日付の日報を作り直した場合は最新の内容で置き換える。
+    """
+
+    def __init__(self, db_path=None):
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        self.db_path = db_path or os.path.join(script_dir, "daily_report_history.sqlite3")
+        self._local = threading.local()
+        with self._transaction() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connection(self):
+        """スレッドごとの接続（WALモードで読み書きを並行させる）"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connection()
+        with conn:
+            yield conn
+
+    def record_plan(self, plan):
+        """書き込み内容の一覧（WritePlan）に含まれる全日分を保存"""
+        entries = [entry for entry in plan.reports.values() if entry.report_date is not None]
+        if entries:
+            self.record_reports(entries)
+
+    def record_reports(self, entries):
+        """(日付, PatrolData, 時間記録) の一覧を1トランザクションで保存"""
+        created_at = datetime.now().isoformat(timespec="seconds")
+        with self._transaction() as conn:
+            for report_date, patrol_data, records in entries:
+                day = _to_date(report_date).isoformat()
+                conn.execute("DELETE FROM reports WHERE report_date = ?", (day,))
+                report_id = conn.execute(
+                    """INSERT INTO reports (
+                        report_date, post4, post5, post1, supervisor, patrol_start,
+                        large_theater_used, medium_theater_used, small_theater_used,
+                        weather, work_type, created_at
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    (day, patrol_data.post4, patrol_data.post5, patrol_data.post1,
+                     patrol_data.supervisor, patrol_data.patrol_start,
+                     int(patrol_data.large_theater_used), int(patrol_data.medium_theater_used),
+                     int(patrol_data.small_theater_used), patrol_data.weather,
+                     patrol_data.work_type, created_at)
+                ).lastrowid
+                conn.executemany(
+                    "INSERT INTO assignments (report_id, report_date, post, staff) VALUES (?, ?, ?, ?)",
+                    [(report_id, day, post, getattr(patrol_data, field)) for post, field in POSTS]
+                )
+                conn.executemany(
+                    """INSERT INTO time_records (report_id, post, cell, start_time, end_time, comment)
+                    VALUES (?, ?, ?, ?, ?, ?)""",
+                    [(report_id, post, cell, record.start_time, record.end_time, record.comment)
+                     for post, cell, record in records]
+                )
+
+    def staff_on_post(self, post, start_date, end_date):
+        """期間内にそのポストを担当した人の一覧 [(日付, 担当者)]"""
+        rows = self._connection().execute(
+            """SELECT report_date, staff FROM assignments
+            WHERE post = ? AND report_date BETWEEN ? AND ?
+            ORDER BY report_date""",
+            (post, _to_date(start_date).isoformat(), _to_date(end_date).isoformat())
+        ).fetchall()
+        return [(date.fromisoformat(day), staff) for day, staff in rows]
+
+    def assignments_for_staff(self, staff, start_date, end_date):
+        """期間内のその人の担当 [(日付, ポスト)]"""
+        rows = self._connection().execute(
+            """SELECT report_date, post FROM assignments
+            WHERE staff = ? AND report_date BETWEEN ? AND ?
+            ORDER BY report_date""",
+            (staff, _to_date(start_date).isoformat(), _to_date(end_date).isoformat())
+        ).fetchall()
+        return [(date.fromisoformat(day), post) for day, post in rows]
+
+    def post_counts(self, start_date, end_date):
+        """期間内の担当者・ポストごとの回数 [(担当者, ポスト, 回数)]"""
+        return self._connection().execute(
+            """SELECT staff, post, COUNT(*) FROM assignments
+            WHERE report_date BETWEEN ? AND ?
+            GROUP BY staff, post ORDER BY staff, post""",
+            (_to_date(start_date).isoformat(), _to_date(end_date).isoformat())
+        ).fetchall()
+
+    def reports_between(self, start_date, end_date):
+        """期間内の日報 [(日付, PatrolData)]"""
+        rows = self._connection().execute(
+            """SELECT report_date, post4, post5, post1, supervisor, patrol_start,
+                large_theater_used, medium_theater_used, small_theater_used, weather, work_type
+            FROM reports WHERE report_date BETWEEN ? AND ? ORDER BY report_date""",
+            (_to_date(start_date).isoformat(), _to_date(end_date).isoformat())
+        ).fetchall()
+        return [(date.fromisoformat(row[0]), _patrol_data(row[1:])) for row in rows]
+
+    def reports_after(self, report_id=0):
+        """idがreport_idより後の日報 [(id, 日付, PatrolData, 時間記録)]（集計の差分読み込み用）
+
+        同じ日付を作り直した日報は新しいidで保存されるため、idの大きい方が最新の内容。
+        """
+        conn = self._connection()
+        rows = conn.execute(
+            """SELECT id, report_date, post4, post5, post1, supervisor, patrol_start,
+                large_theater_used, medium_theater_used, small_theater_used, weather, work_type
+            FROM reports WHERE id > ? ORDER BY id""",
+            (report_id,)
+        ).fetchall()
+        records = defaultdict(list)
+        for rid, post, cell, start, end, comment in conn.execute(
+            """SELECT report_id, post, cell, start_time, end_time, comment
+            FROM time_records WHERE report_id > ? ORDER BY rowid""",
+            (report_id,)
+        ):
+            records[rid].append((post, cell, TimeRecord.from_strings(start, end, comment)))
+        return [
+            (row[0], date.fromisoformat(row[1]), _patrol_data(row[2:]), records[row[0]])
+            for row in rows
+        ]
+
+    def time_records(self, report_date):
+        """その日に生成した時間記録 [(ポスト, セル, TimeRecord)]"""
+        rows = self._connection().execute(
+            """SELECT t.post, t.cell, t.start_time, t.end_time, t.comment
+            FROM time_records t JOIN reports r ON r.id = t.report_id
+            WHERE r.report_date = ? ORDER BY t.rowid""",
+            (_to_date(report_date).isoformat(),)
+        ).fetchall()
+        return [(post, cell, TimeRecord.from_strings(start, end, comment))
+                for post, cell, start, end, comment in rows]
+
+
+def _patrol_data(row):
+    """reportsテーブルの項目（post4〜work_type）からPatrolDataを作成"""
+    return PatrolData(
+        post4=row[0], post5=row[1], post1=row[2], supervisor=row[3],
+        patrol_start=row[4], large_theater_used=bool(row[5]),
+        medium_theater_used=bool(row[6]), small_theater_used=bool(row[7]),
+        weather=row[8], work_type=row[9]
+    )
+
+
+def _to_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+_shared_history = None
+_shared_history_lock = threading.Lock()
+
+
+def get_report_history():
+    """プロセス内で共有する履歴データベース"""
+    global _shared_history
+    with _shared_history_lock:
+        if _shared_history is None:
+            _shared_history = ReportHistory()
+    return _shared_history
@@ -0,0 +1,190 @@
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils import notify
+
+# 同時に日報を作成する数（交代時間に集中しても、超えた分は順番待ちにする）
+DEFAULT_MAX_WORKERS = 2
+MAX_WORKERS_ENV = "DAILY_REPORT_MAX_WORKERS"
+
+# 完了したジョブの結果を保持する時間[秒]
+DEFAULT_KEEP_SECONDS = 60 * 60
+# 完了したジョブの結果を保持する件数・合計サイズの上限（超えた分は古いものから破棄）
+DEFAULT_MAX_FINISHED_JOBS = 32
+DEFAULT_MAX_RESULT_BYTES = 256 * 1024 * 1024
+
+# ジョブの状態
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def max_workers_from_env(default=DEFAULT_MAX_WORKERS):
+    """環境変数 DAILY_REPORT_MAX_WORKERS から同時実行数を取得"""
+    value = os.environ.get(MAX_WORKERS_ENV)
+    if not value:
+        return default
+    try:
+        max_workers = int(value)
+    except ValueError:
+        notify.warning(f"{MAX_WORKERS_ENV} の値が不正です: {value}（{default}を使用します）")
+        return default
+    return max(1, max_workers)
+
+
+class Job:
+    """バックグラウンドで実行する日報作成ジョブ
+
+    画面側は status・stage・progress を読み取って進捗を表示し、
+    完了後に result（失敗時は error）を受け取る。
+    """
+
+    def __init__(self, job_id, description=""):
+        self.id = job_id
+        self.description = description
+        self.status = QUEUED
+        self.stage = "順番待ち"
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+    @property
+    def result_bytes(self):
+        """結果の大きさ（bytesまたはBatchResultの出力ファイル）"""
+        if self.result is None:
+            return 0
+        return len(getattr(self.result, 'output_bytes', self.result))
+
+    @property
+    def elapsed(self):
+        """実行開始からの経過時間[秒]"""
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def update(self, stage, progress=None):
+        """進捗を更新（ExcelWriterのprogressとして渡す）"""
+        self.stage = stage
+        if progress is not None:
+            self.progress = min(max(progress, 0.0), 1.0)
+
+
+class JobExecutor:
+    """サーバー内の全セッションで共有する日報作成用のスレッドプール
+
+    テンプレートのキャッシュや履歴をセッション間で共有するため、プロセスではなく
+    スレッドで実行する。同時実行数を超えたジョブは投入順に待たせる。
+    """
+
+    def __init__(self, max_workers=None, keep_seconds=DEFAULT_KEEP_SECONDS,
+                 max_finished_jobs=DEFAULT_MAX_FINISHED_JOBS, max_result_bytes=DEFAULT_MAX_RESULT_BYTES):
+        self.max_workers = max_workers or max_workers_from_env()
+        self.keep_seconds = keep_seconds
+        self.max_finished_jobs = max_finished_jobs
+        self.max_result_bytes = max_result_bytes
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="daily_report")
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def submit(self, fn, *args, description="", **kwargs):
+        """ジョブを投入する
+
+        fn は progress=Job.update を受け取り、結果を返す関数。
+        """
+        with self._lock:
+            self._prune()
+            job = Job(f"job-{next(self._ids)}", description)
+            self._jobs[job.id] = job
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        """ジョブを取得（保持期間を過ぎたものはNone）"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def queue_position(self, job):
+        """自分より前に待っているジョブの数"""
+        with self._lock:
+            return sum(
+                1 for other in self._jobs.values()
+                if other.status == QUEUED and other.submitted_at < job.submitted_at
+            )
+
+    def stats(self):
+        """状態ごとのジョブ数"""
+        with self._lock:
+            counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            counts["result_bytes"] = sum(job.result_bytes for job in self._jobs.values())
+        counts["max_workers"] = self.max_workers
+        return counts
+
+    def _run(self, job, fn, args, kwargs):
+        job.status = RUNNING
+        job.started_at = time.monotonic()
+        job.update("開始")
+        try:
+            job.result = fn(*args, progress=job.update, **kwargs)
+        except Exception as e:
+            job.error = e
+            # 画面側がstatusを見た時点で終了時刻が入っているよう、先に記録する
+            job.finished_at = time.monotonic()
+            job.status = FAILED
+            notify.warning(f"日報作成ジョブ {job.id} でエラー: {e}")
+        else:
+            job.update("完了", 1.0)
+            job.finished_at = time.monotonic()
+            job.status = DONE
+        with self._lock:
+            self._prune(keep=job)
+
+    def _prune(self, keep=None):
+        """保持期間・件数・合計サイズの上限を超えた完了済みジョブを古いものから削除（ロック内で呼ぶ）
+
+        keep: 上限を超えても残すジョブ（完了直後で、まだ結果を受け取っていないもの）
+        """
+        now = time.monotonic()
+        finished = sorted(
+            (job for job in self._jobs.values() if job.finished),
+            key=lambda job: job.finished_at
+        )
+        count = len(finished)
+        total_bytes = sum(job.result_bytes for job in finished)
+        for job in finished:
+            if job is keep:
+                continue
+            if (now - job.finished_at <= self.keep_seconds and count <= self.max_finished_jobs
+                    and total_bytes <= self.max_result_bytes):
+                break
+            del self._jobs[job.id]
+            count -= 1
+            total_bytes -= job.result_bytes
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+
+_job_executor = None
+_job_executor_lock = threading.Lock()
+
+
+def get_job_executor():
+    """プロセス内で共有するジョブ実行器"""
+    global _job_executor
+    with _job_executor_lock:
+        if _job_executor is None:
+            _job_executor = JobExecutor()
+        return _job_executor
@@ -1,9 +1,61 @@
-from dataclasses import dataclass
-from typing import List, Optional
+from dataclasses import dataclass, field, fields
+from datetime import date
+from typing import Dict, List, Optional
 
-@dataclass
+SKIPPED = -1  # 巡回しない枠（"-"で出力）
+
+# 0:00〜23:59の文字列（strftime('%H:%M')と同じ0埋め）
+_MINUTE_STRINGS = tuple(f"{m // 60:02d}:{m % 60:02d}" for m in range(24 * 60))
+
+# to_bytes()で文字列項目を区切る文字
+_SEPARATOR = "\x00"
+
+
+def to_minutes(time_str):
+    """'21:00' -> 1260"""
+    hour, minute = time_str.split(":")
+    return int(hour) * 60 + int(minute)
+
+
+def format_minutes(minutes):
+    """1260 -> '21:00'（日付をまたぐ場合は24時間で折り返す）"""
+    if minutes == SKIPPED:
+        return "-"
+    return _MINUTE_STRINGS[minutes % (24 * 60)]
+
+
+def _slotted(cls):
+    """frozenなdataclassを__slots__付きで作り直す（dataclassのslots=TrueはPython 3.10以降のため）"""
+    names = tuple(f.name for f in fields(cls))
+    namespace = {key: value for key, value in cls.__dict__.items()
+                 if key not in names and key not in ('__dict__', '__weakref__')}
+    namespace['__slots__'] = names
+
+    # frozenのためsetattrが使えないので、pickleの復元はobject.__setattr__で行う
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in names)
+
+    def __setstate__(self, state):
+        for name, value in zip(names, state):
+            object.__setattr__(self, name, value)
+
+    namespace['__getstate__'] = __getstate__
+    namespace['__setstate__'] = __setstate__
+    return type(cls)(cls.__name__, cls.__bases__, namespace)
+
+
+def _lastname(name):
+    return name.split()[0] if name else ""
+
+
+@_slotted
+@dataclass(frozen=True)
 class PatrolData:
-    """巡回データを格納するクラス"""
+    """巡回データを格納するクラス
+
+    担当者の姓は作成時に1度だけ求めて保持する。
+    to_tuple()/to_bytes() はキャッシュのキーやプロセス間の受け渡し用の小さな表現。
+    """
     post4: str
     post5: str
     post1: str
@@ -14,26 +66,86 @@ class PatrolData:
     small_theater_used: bool
     weather: str  # 天気を追加
     work_type: str  # 勤務区分（通常/早出/残業）を追加
-    
-    @property
-    def post4_lastname(self):
-        return self.post4.split()[0] if self.post4 else ""
-    
-    @property
-    def post5_lastname(self):
-        return self.post5.split()[0] if self.post5 else ""
-    
+    post4_lastname: str = field(init=False, repr=False, compare=False)
+    post5_lastname: str = field(init=False, repr=False, compare=False)
+    post1_lastname: str = field(init=False, repr=False, compare=False)
+    supervisor_lastname: str = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, 'post4_lastname', _lastname(self.post4))
+        object.__setattr__(self, 'post5_lastname', _lastname(self.post5))
+        object.__setattr__(self, 'post1_lastname', _lastname(self.post1))
+        object.__setattr__(self, 'supervisor_lastname', _lastname(self.supervisor))
+
+    def to_tuple(self):
+        """入力項目だけのタプル（姓は含めない）"""
+        return (self.post4, self.post5, self.post1, self.supervisor, self.patrol_start,
+                self.large_theater_used, self.medium_theater_used, self.small_theater_used,
+                self.weather, self.work_type)
+
+    @classmethod
+    def from_tuple(cls, values):
+        return cls(*values)
+
+    def to_bytes(self):
+        """劇場の使用を1バイトに、文字列項目を区切り文字でつないだUTF-8にまとめる"""
+        flags = (self.large_theater_used | self.medium_theater_used << 1
+                 | self.small_theater_used << 2)
+        text = _SEPARATOR.join((self.post4, self.post5, self.post1, self.supervisor,
+                                self.patrol_start, self.weather, self.work_type))
+        return bytes((flags,)) + text.encode("utf-8")
+
+    @classmethod
+    def from_bytes(cls, data):
+        flags = data[0]
+        post4, post5, post1, supervisor, patrol_start, weather, work_type = (
+            data[1:].decode("utf-8").split(_SEPARATOR))
+        return cls(post4, post5, post1, supervisor, patrol_start,
+                   bool(flags & 1), bool(flags & 2), bool(flags & 4), weather, work_type)
+
+@_slotted
+@dataclass(frozen=True)
+class TimeRecord:
+    """時間記録データ
+
+    時刻は0時からの分（整数）で持ち、巡回しない枠はSKIPPED、時刻がない場合はNone。
+    文字列が必要な場合は start_time / end_time を使う。
+    """
+    start: Optional[int]
+    end: Optional[int]
+    comment: str
+
     @property
-    def post1_lastname(self):
-        return self.post1.split()[0] if self.post1 else ""
-    
+    def start_time(self):
+        return "" if self.start is None else format_minutes(self.start)
+
     @property
-    def supervisor_lastname(self):
-        return self.supervisor.split()[0] if self.supervisor else ""
+    def end_time(self):
+        return "" if self.end is None else format_minutes(self.end)
+
+    @classmethod
+    def from_strings(cls, start_time, end_time, comment):
+        """'21:00'・'-'・'' の形式の時刻から作成（履歴の読み込み用）"""
+        return cls(_parse_time(start_time), _parse_time(end_time), comment)
+
+    def to_tuple(self):
+        return (self.start, self.end, self.comment)
+
+    @classmethod
+    def from_tuple(cls, values):
+        return cls(*values)
+
+
+def _parse_time(time_str):
+    if not time_str:
+        return None
+    if time_str == "-":
+        return SKIPPED
+    return to_minutes(time_str)
 
 @dataclass
-class TimeRecord:
-    """時間記録データ"""
-    start_time: str
-    end_time: str
-    comment: str
\ No newline at end of file
+class BatchResult:
+    """期間一括作成の結果"""
+    output_bytes: bytes
+    written_dates: List[date] = field(default_factory=list)
+    errors: Dict[date, str] = field(default_factory=dict)
@@ -0,0 +1,71 @@
+import csv
+import io
+import os
+
+# 一括登録・書き出しのファイルの列
+HEADER = ("区分", "名前")
+
+
+def read_staff_file(filename, data):
+    """CSV・Excel（xlsx）から (区分, 名前) の一覧を読み込む
+
+    1行目が見出し（区分, 名前）の場合は読み飛ばす。空行は除く。
+    """
+    if os.path.splitext(filename)[1].lower() == ".xlsx":
+        rows = _read_xlsx(data)
+    else:
+        rows = _read_csv(data)
+    entries = []
+    for index, row in enumerate(rows):
+        values = ["" if value is None else str(value).strip() for value in row[:2]]
+        values += [""] * (2 - len(values))
+        if index == 0 and tuple(values) == HEADER:
+            continue
+        if not any(values):
+            continue
+        entries.append(tuple(values))
+    return entries
+
+
+def _read_csv(data):
+    # Excelで保存したCSV（BOM付きUTF-8・Shift_JIS）も読めるようにする
+    for encoding in ("utf-8-sig", "cp932"):
+        try:
+            text = bytes(data).decode(encoding)
+            break
+        except UnicodeDecodeError:
+            continue
+    else:
+        raise ValueError("CSVの文字コードを判別できません（UTF-8またはShift_JISで保存してください）。")
+    return list(csv.reader(io.StringIO(text, newline="")))
+
+
+def _read_xlsx(data):
+    from openpyxl import load_workbook
+    wb = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    try:
+        return [row for row in wb.worksheets[0].iter_rows(max_col=2, values_only=True)]
+    finally:
+        wb.close()
+
+
+def staff_to_csv(entries):
+    """(区分, 名前) の一覧をExcelで開けるCSV（BOM付きUTF-8）に変換"""
+    output = io.StringIO(newline="")
+    writer = csv.writer(output)
+    writer.writerow(HEADER)
+    writer.writerows(entries)
+    return output.getvalue().encode("utf-8-sig")
+
+
+def staff_to_xlsx(entries):
+    """(区分, 名前) の一覧をxlsxに変換"""
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("スタッフ")
+    ws.append(HEADER)
+    for entry in entries:
+        ws.append(entry)
+    output = io.BytesIO()
+    wb.save(output)
+    return output.getvalue()
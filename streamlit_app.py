@@ -1,8 +1,13 @@
+import os
+import random
+import sqlite3
 import streamlit as st
-from datetime import datetime
+from datetime import datetime, timedelta
 from models import PatrolData
 from config import Config
-from excel.writer import ExcelWriter
+from history import POSTS, get_report_history
+from jobs import FAILED, QUEUED, get_job_executor
+from excel.output_profile import DEFAULT_OUTPUT_PROFILE, OUTPUT_PROFILES
 
 def main():
     st.set_page_config(
@@ -19,180 +24,657 @@ def main():
     
     config = st.session_state.config
     
-    tab1, tab2 = st.tabs(["📝 日報作成", "👥 スタッフ管理"])
+    # 巡回時間のseed（同じ内容で作り直した場合は作成済みの日報をそのまま返す）
+    if 'report_seed' not in st.session_state:
+        st.session_state.report_seed = random.getrandbits(32)
+    
+    tab1, tab2, tab3, tab4 = st.tabs(["📝 日報作成", "👥 スタッフ管理", "📚 履歴", "📊 集計"])
     
     with tab1:
-        st.header("日報作成")
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.subheader("担当者選択")
-            
-            post4_options = [""] + config.security_staff_list
-            post4 = st.selectbox("4ポスト担当", post4_options, key="post4")
-            
-            post5_options = [""] + config.security_staff_list
-            post5 = st.selectbox("5ポスト担当", post5_options, key="post5")
-            
-            post1_options = [""] + config.security_staff_list
-            post1 = st.selectbox("1ポスト担当", post1_options, key="post1")
-            
-            supervisor_options = [""] + config.facility_staff_list
-            supervisor = st.selectbox("設備担当者", supervisor_options, key="supervisor")
-
-            # 天気入力欄
-            st.subheader("天気")
-            weather_options = ["晴", "曇", "雨", "晴/曇", "曇/雨", "その他"]
-            weather_select = st.selectbox("天気を選択", weather_options, key="weather_select")
-            weather = ""
-            if weather_select == "その他":
-                weather = st.text_input("天気を自由入力（上の選択肢以外の場合）", key="weather_input")
-            else:
-                weather = weather_select
-            # 空の場合はデフォルト値
-            if not weather:
-                weather = "未記入"
-
-            st.subheader("巡回設定")
-            patrol_start = st.selectbox(
-                "巡回開始時刻", 
-                ["21:00頃", "22:00頃"], 
-                key="patrol_start"
-            )
+        render_report_tab(config)
+    
+    with tab2:
+        render_staff_tab(config)
+    
+    with tab3:
+        render_history_tab()
+    
+    with tab4:
+        render_analytics_tab()
+
+
+@st.fragment
+def render_report_tab(config):
+    """日報作成タブ（操作時はこのタブだけを再実行）"""
+    st.header("日報作成")
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.subheader("担当者選択")
+
+        # 選択肢（先頭は未選択）は名簿の更新時だけ作り直したものを使う
+        security_options = config.security_staff_options
+        post4 = st.selectbox("4ポスト担当", security_options, key="post4")
+        post5 = st.selectbox("5ポスト担当", security_options, key="post5")
+        post1 = st.selectbox("1ポスト担当", security_options, key="post1")
+        supervisor = st.selectbox("設備担当者", config.facility_staff_options, key="supervisor")
+
+        # 天気入力欄
+        st.subheader("天気")
+        weather_options = ["晴", "曇", "雨", "晴/曇", "曇/雨", "その他"]
+        weather_select = st.selectbox("天気を選択", weather_options, key="weather_select")
+        weather = ""
+        if weather_select == "その他":
+            weather = st.text_input("天気を自由入力（上の選択肢以外の場合）", key="weather_input")
+        else:
+            weather = weather_select
+        # 空の場合はデフォルト値
+        if not weather:
+            weather = "未記入"
+
+        st.subheader("巡回設定")
+        patrol_start = st.selectbox(
+            "巡回開始時刻", 
+            ["21:00頃", "22:00頃"], 
+            key="patrol_start"
+        )
 
-            st.subheader("勤務区分")
-            work_type = st.selectbox(
-                "勤務区分を選択",
-                ["通常", "早出", "残業"],
-                key="work_type"
+        st.subheader("勤務区分")
+        work_type = st.selectbox(
+            "勤務区分を選択",
+            ["通常", "早出", "残業"],
+            key="work_type"
+        )
+
+        st.subheader("作成モード")
+        report_mode = st.radio(
+            "作成モードを選択",
+            ["単日（本日）", "期間一括", "作成済みの日報を修正"],
+            key="report_mode",
+            horizontal=True
+        )
+        date_range = None
+        if report_mode == "期間一括":
+            date_range = st.date_input(
+                "対象期間",
+                value=(datetime.today().date(), datetime.today().date()),
+                key="date_range",
+                help="休み明けなどに、期間内の各日のシートへまとめて書き込みます"
+            )
+        update_date = None
+        if report_mode == "作成済みの日報を修正":
+            update_date = st.date_input(
+                "修正する日付",
+                value=datetime.today().date(),
+                key="update_date",
+                help="作成済みの日報をアップロードすると、変更した項目のセルだけを書き換えます（巡回時間はそのまま残ります）"
             )
-        
-        with col2:
-            st.subheader("劇場使用状況")
-            large_theater = st.checkbox("大劇場使用", key="large_theater")
-            medium_theater = st.checkbox("中劇場（楽屋）使用", key="medium_theater")
-            small_theater = st.checkbox("小劇場使用", key="small_theater")
-            
-            st.subheader("Excelファイル")
-            uploaded_file = st.file_uploader(
-                "日報テンプレートファイルをアップロード",
+
+    with col2:
+        st.subheader("劇場使用状況")
+        large_theater = st.checkbox("大劇場使用", key="large_theater")
+        medium_theater = st.checkbox("中劇場（楽屋）使用", key="medium_theater")
+        small_theater = st.checkbox("小劇場使用", key="small_theater")
+
+        st.subheader("Excelファイル")
+        uploaded_file = st.file_uploader(
+            "日報テンプレートファイルをアップロード",
+            type=['xlsx'],
+            help="日報のテンプレートExcelファイルを選択してください（最大10MB）"
+        )
+        original_template = None
+        if report_mode == "作成済みの日報を修正":
+            original_template = st.file_uploader(
+                "作成に使ったテンプレート（勤務区分を変更する場合）",
                 type=['xlsx'],
-                help="日報のテンプレートExcelファイルを選択してください（最大10MB）"
+                key="original_template",
+                help="勤務区分の変更で書き込まなくなるセル（K4・D10など）を、このテンプレートの内容に戻します。"
             )
-            
-            # ファイル検証
-            if uploaded_file is not None:
-                # ファイルサイズチェック（10MB制限）
-                if uploaded_file.size > 10 * 1024 * 1024:
-                    st.error("ファイルサイズが大きすぎます。10MB以下のファイルを選択してください。")
-                    st.stop()  # 処理を停止
-                else:
-                    st.success(f"ファイル '{uploaded_file.name}' が正常にアップロードされました")
-                    st.info(f"ファイルサイズ: {uploaded_file.size / 1024:.1f} KB")
-        
-        st.markdown("---")
-        
-        if st.button("📋 日報作成", type="primary", use_container_width=True):
-            if not all([post4, post5, post1, supervisor]):
-                st.error("すべての担当者を選択してください。")
-            elif not uploaded_file:
-                st.error("Excelファイルをアップロードしてください。")
+        fast_engine = st.checkbox(
+            "高速モード（対象シートのみ書き換え）",
+            key="fast_engine",
+            help="対象日のシートのXMLだけを書き換えます。対応していないテンプレートの場合は通常処理で作成します。"
+        )
+        output_profile = st.selectbox(
+            "出力形式",
+            list(OUTPUT_PROFILES),
+            index=list(OUTPUT_PROFILES).index(DEFAULT_OUTPUT_PROFILE),
+            format_func=lambda name: OUTPUT_PROFILES[name].label,
+            key="output_profile",
+            help="高速: 圧縮を弱くして早く作成します。小さく: 作成に時間をかけてファイルを小さくします（通信の遅い環境向け）。"
+        )
+        show_debug = st.checkbox(
+            "処理時間の内訳を表示（デバッグ）",
+            key="show_debug",
+            help="作成後に段階ごとの処理時間と書き込み件数を表示します。"
+        )
+
+        # ファイル検証
+        if uploaded_file is not None:
+            # ファイルサイズチェック（10MB制限）
+            if uploaded_file.size > 10 * 1024 * 1024:
+                st.error("ファイルサイズが大きすぎます。10MB以下のファイルを選択してください。")
+                st.stop()  # 処理を停止
             else:
-                # 担当者の重複チェック
-                staff_list = [post4, post5, post1, supervisor]
-                if len(set(staff_list)) != len(staff_list):
-                    st.error("同じ担当者が複数のポストに割り当てられています。担当者を変更してください。")
-                else:
-                    try:
-                        patrol_data = PatrolData(
-                            post4=post4,
-                            post5=post5,
-                            post1=post1,
-                            supervisor=supervisor,
-                            patrol_start=patrol_start,
-                            large_theater_used=large_theater,
-                            medium_theater_used=medium_theater,
-                            small_theater_used=small_theater,
-                            weather=weather,
-                            work_type=work_type
+                # 書き込み先のシートと配置をzip内のXMLだけで確認する（全体の読み込みは行わない）
+                validation = _validate_upload(
+                    uploaded_file,
+                    _target_dates(report_mode, date_range, update_date),
+                    allow_missing=report_mode == "期間一括"
+                )
+                if validation.errors:
+                    st.error("このファイルには日報を書き込めません:\n\n" + "\n".join(
+                        f"- {message}" for message in validation.errors
+                    ))
+                    st.stop()
+                st.success(f"ファイル '{uploaded_file.name}' が正常にアップロードされました")
+                st.info(f"ファイルサイズ: {uploaded_file.size / 1024:.1f} KB")
+                for message in validation.warnings:
+                    st.warning(message)
+
+    st.markdown("---")
+
+    if st.button("📋 日報作成", type="primary", use_container_width=True):
+        if not all([post4, post5, post1, supervisor]):
+            st.error("すべての担当者を選択してください。")
+        elif not uploaded_file:
+            st.error("Excelファイルをアップロードしてください。")
+        else:
+            # 担当者の重複チェック
+            staff_list = [post4, post5, post1, supervisor]
+            if len(set(staff_list)) != len(staff_list):
+                st.error("同じ担当者が複数のポストに割り当てられています。担当者を変更してください。")
+            else:
+                try:
+                    patrol_data = PatrolData(
+                        post4=post4,
+                        post5=post5,
+                        post1=post1,
+                        supervisor=supervisor,
+                        patrol_start=patrol_start,
+                        large_theater_used=large_theater,
+                        medium_theater_used=medium_theater,
+                        small_theater_used=small_theater,
+                        weather=weather,
+                        work_type=work_type
+                    )
+
+                    # アップロードされたファイルはコピーせずに参照する（大きい場合は一時ファイルへ）
+                    file_bytes = uploaded_file
+                    executor = get_job_executor()
+                    instrumentation = _create_instrumentation() if show_debug else None
+                    seed = st.session_state.report_seed
+
+                    # 作成はサーバー共有のジョブ実行器で行い、画面は進捗を表示する
+                    if report_mode == "期間一括":
+                        if not date_range or len(date_range) != 2:
+                            raise ValueError("対象期間の開始日と終了日を選択してください。")
+                        start_date, end_date = date_range
+                        patrol_data_by_date = {
+                            start_date + timedelta(days=offset): patrol_data
+                            for offset in range((end_date - start_date).days + 1)
+                        }
+                        filename = f"日報_{start_date.strftime('%Y%m%d')}-{end_date.strftime('%Y%m%d')}.xlsx"
+                        job = executor.submit(
+                            _write_reports_job, file_bytes, patrol_data_by_date, fast_engine, seed,
+                            instrumentation=instrumentation, output_profile=output_profile,
+                            description=f"{len(patrol_data_by_date)}日分"
+                        )
+                    elif report_mode == "作成済みの日報を修正":
+                        # 作成時の入力内容は履歴から取得する
+                        previous = get_report_history().reports_between(update_date, update_date)
+                        if not previous:
+                            raise ValueError(f"{update_date.strftime('%m/%d')}の作成履歴がありません。")
+                        filename = f"日報_{update_date.strftime('%Y%m%d')}.xlsx"
+                        job = executor.submit(
+                            _update_report_job, file_bytes, previous[0][1], patrol_data, update_date,
+                            fast_engine, instrumentation=instrumentation, output_profile=output_profile,
+                            template_bytes=original_template, description="修正"
                         )
-                        
-                        writer = ExcelWriter()
-                        file_bytes = uploaded_file.read()
-                        
-                        with st.spinner("日報を作成中..."):
-                            output_bytes = writer.write_report(file_bytes, patrol_data)
-                        
+                    else:
                         today = datetime.today()
                         filename = f"日報_{today.strftime('%Y%m%d')}.xlsx"
-                        
-                        st.success("日報が正常に作成されました！")
-                        st.download_button(
-                            label="📥 日報をダウンロード",
-                            data=output_bytes,
-                            file_name=filename,
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                            type="primary"
+                        job = executor.submit(
+                            _write_report_job, file_bytes, patrol_data, fast_engine, seed,
+                            instrumentation=instrumentation, output_profile=output_profile,
+                            description="本日分"
                         )
-                        
-                    except Exception as e:
-                        st.error(f"エラーが発生しました: {e}")
+
+                    st.session_state.report_job = {
+                        "id": job.id,
+                        "filename": filename,
+                        "batch": report_mode == "期間一括",
+                        "instrumentation": instrumentation,
+                        "output_profile": output_profile,
+                    }
+
+                except Exception as e:
+                    st.error(f"エラーが発生しました: {e}")
+
+    report_job = st.session_state.get("report_job")
+    if report_job:
+        render_report_job(report_job)
+
+
+def _target_dates(report_mode, date_range, update_date):
+    """作成モードに応じた書き込み先の日付"""
+    if report_mode == "期間一括":
+        if not date_range or len(date_range) != 2:
+            return []
+        start_date, end_date = date_range
+        return [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+    if report_mode == "作成済みの日報を修正":
+        return [update_date]
+    return [datetime.today().date()]
+
+
+def _validate_upload(uploaded_file, report_dates, allow_missing=False):
+    from excel.source import TemplateSource
+    from excel.validator import validate_template
+    with TemplateSource.wrap(uploaded_file) as source:
+        return validate_template(source, report_dates, allow_missing)
+
+
+def _create_writer(fast_engine, seed, progress, instrumentation=None,
+                   output_profile=DEFAULT_OUTPUT_PROFILE):
+    # openpyxl等の重い読み込みは日報作成時まで遅らせる（初回表示を速くするため）
+    from excel.output_cache import get_output_cache
+    from excel.writer import ExcelWriter
+    return ExcelWriter(
+        engine='xml' if fast_engine else 'openpyxl',
+        seed=seed,
+        history=get_report_history(),
+        progress=progress,
+        instrumentation=instrumentation,
+        output_cache=get_output_cache(),
+        output_profile=output_profile
+    )
+
+
+def _create_instrumentation():
+    from utils.instrumentation import Instrumentation
+    return Instrumentation()
+
+
+def _write_report_job(file_bytes, patrol_data, fast_engine, seed, progress, instrumentation=None,
+                      output_profile=DEFAULT_OUTPUT_PROFILE):
+    """本日分の日報を作成（ジョブ実行器のスレッドで実行）"""
+    writer = _create_writer(fast_engine, seed, progress, instrumentation, output_profile)
+    return writer.write_report(file_bytes, patrol_data)
+
+
+def _write_reports_job(file_bytes, patrol_data_by_date, fast_engine, seed, progress,
+                       instrumentation=None, output_profile=DEFAULT_OUTPUT_PROFILE):
+    """期間内の日報をまとめて作成（ジョブ実行器のスレッドで実行）"""
+    writer = _create_writer(fast_engine, seed, progress, instrumentation, output_profile)
+    return writer.write_reports(file_bytes, patrol_data_by_date)
+
+
+def _update_report_job(report_bytes, old_patrol_data, new_patrol_data, report_date, fast_engine,
+                       progress, instrumentation=None, output_profile=DEFAULT_OUTPUT_PROFILE,
+                       template_bytes=None):
+    """作成済みの日報の変更箇所だけを書き換える（ジョブ実行器のスレッドで実行）"""
+    writer = _create_writer(fast_engine, None, progress, instrumentation, output_profile)
+    return writer.update_report(report_bytes, old_patrol_data, new_patrol_data, report_date,
+                                template_bytes=template_bytes)
+
+
+def render_report_job(report_job):
+    """作成ジョブの進捗・結果"""
+    job = get_job_executor().get(report_job["id"])
+    if job is None:
+        st.info("作成結果の保持期間が過ぎたか、保持できる件数を超えました。もう一度作成してください。")
+        return
+
+    if not job.finished:
+        render_job_progress(job.id)
+        return
+
+    if job.status == FAILED:
+        st.error(f"エラーが発生しました: {job.error}")
+        return
+
+    if report_job["batch"]:
+        result = job.result
+        output_bytes = result.output_bytes
+        st.success(f"{len(result.written_dates)}日分の日報が正常に作成されました！")
+        if result.errors:
+            st.warning("以下の日付は書き込めませんでした:\n\n" + "\n".join(
+                f"- {d.strftime('%m/%d')}: {message}"
+                for d, message in sorted(result.errors.items())
+            ))
+    else:
+        output_bytes = job.result
+        st.success("日報が正常に作成されました！")
+
+    st.download_button(
+        label="📥 日報をダウンロード",
+        data=output_bytes,
+        file_name=report_job["filename"],
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        type="primary"
+    )
+    profile = OUTPUT_PROFILES[report_job.get("output_profile", DEFAULT_OUTPUT_PROFILE)]
+    st.caption(f"出力形式: {profile.label} ・ {len(output_bytes) / 1024:.1f} KB ・ 作成時間 {job.elapsed:.2f}秒")
+    if st.button("🎲 巡回時間を変更", help="次に作成するときは別の巡回時間で作成します"):
+        st.session_state.report_seed = random.getrandbits(32)
+        st.info("もう一度「日報作成」を押すと、別の巡回時間で作成します。")
+
+    instrumentation = report_job.get("instrumentation")
+    if instrumentation is not None and instrumentation.last_report:
+        render_debug_panel(instrumentation.last_report)
+
+
+def render_debug_panel(report):
+    """段階ごとの処理時間と書き込み件数（デバッグ用）"""
+    with st.expander(f"🔧 処理時間の内訳（合計 {report['total_ms']:.1f} ms）"):
+        st.dataframe(
+            [{"段階": name, "時間(ms)": ms} for name, ms in report["stages_ms"].items()],
+            hide_index=True,
+            use_container_width=True
+        )
+        st.dataframe(
+            [{"項目": name, "値": value} for name, value in report["counters"].items()],
+            hide_index=True,
+            use_container_width=True
+        )
+
+
+@st.fragment(run_every=1)
+def render_job_progress(job_id):
+    """作成中の進捗（完了するまで1秒ごとにこの部分だけを更新）"""
+    executor = get_job_executor()
+    job = executor.get(job_id)
+    if job is None or job.finished:
+        # 結果の表示に切り替える
+        st.rerun()
+    if job.status == QUEUED:
+        st.progress(0.0, text=f"順番待ち中...（前に{executor.queue_position(job)}件）")
+    else:
+        st.progress(job.progress, text=f"日報を作成中（{job.description}）: {job.stage}...")
+
+
+def render_staff_tab(config):
+    """スタッフ管理タブ"""
+    st.header("スタッフ管理")
     
-    with tab2:
-        st.header("スタッフ管理")
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.subheader("警備担当者")
-            
-            new_security = st.text_input("新しい警備担当者を追加", key="new_security")
-            if st.button("追加", key="add_security"):
-                if new_security:
-                    if config.add_security_staff(new_security):
-                        st.success(f"'{new_security}' を追加しました。")
-                        st.rerun()  # リフレッシュして入力をクリア
-                    else:
-                        st.warning("既に登録されているか、無効な名前です。")
-                else:
-                    st.warning("名前を入力してください。")
-            
-            st.markdown("**登録済み警備担当者:**")
-            for staff in config.security_staff_list:
-                col_name, col_delete = st.columns([3, 1])
-                with col_name:
-                    st.text(staff)
-                with col_delete:
-                    if st.button("削除", key=f"del_sec_{staff}"):
-                        config.remove_security_staff(staff)
-                        st.success(f"'{staff}' を削除しました。")
-                        st.rerun()  # リスト更新のため必要
-        
-        with col2:
-            st.subheader("設備担当者")
-            
-            new_facility = st.text_input("新しい設備担当者を追加", key="new_facility")
-            if st.button("追加", key="add_facility"):
-                if new_facility:
-                    if config.add_facility_staff(new_facility):
-                        st.success(f"'{new_facility}' を追加しました。")
-                        st.rerun()  # リフレッシュして入力をクリア
-                    else:
-                        st.warning("既に登録されているか、無効な名前です。")
-                else:
-                    st.warning("名前を入力してください。")
-            
-            st.markdown("**登録済み設備担当者:**")
-            for staff in config.facility_staff_list:
-                col_name, col_delete = st.columns([3, 1])
-                with col_name:
-                    st.text(staff)
-                with col_delete:
-                    if st.button("削除", key=f"del_fac_{staff}"):
-                        config.remove_facility_staff(staff)
-                        st.success(f"'{staff}' を削除しました。")
-                        st.rerun()  # リスト更新のため必要
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        render_staff_column(config, "security")
+    
+    with col2:
+        render_staff_column(config, "facility")
+    
+    st.markdown("---")
+    render_staff_bulk(config)
+
+
+def render_staff_bulk(config):
+    """担当者の一括登録・書き出し（CSV/Excel）"""
+    from staff_io import read_staff_file, staff_to_csv
+
+    st.subheader("一括登録・書き出し")
+    for level, text in st.session_state.pop("staff_import_messages", []):
+        getattr(st, level)(text)
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        staff_file = st.file_uploader(
+            "担当者の一覧（CSV/Excel）",
+            type=["csv", "xlsx"],
+            key="staff_file",
+            help="1列目に区分（警備/設備）、2列目に名前を入力したファイルを選択してください"
+        )
+        replace_all = st.checkbox("ファイルに含まれる区分の名簿を置き換える", key="staff_replace")
+        if st.button("一括登録", key="staff_import", disabled=staff_file is None):
+            try:
+                entries = read_staff_file(staff_file.name, staff_file.getvalue())
+            except Exception as e:
+                st.error(f"ファイルを読み込めません: {e}")
+            else:
+                st.session_state.staff_import_messages = _import_messages(
+                    config.import_staff(entries, replace=replace_all))
+                # 各列と日報作成タブの選択肢に反映するため全体を再実行する
+                st.rerun()
+
+    with col2:
+        st.download_button(
+            "📤 CSVで書き出し",
+            data=staff_to_csv(config.export_staff()),
+            file_name="スタッフ一覧.csv",
+            mime="text/csv",
+            key="staff_export_csv"
+        )
+        # xlsxの作成にはopenpyxlが必要なため、押されたときだけ作成する
+        if st.button("📤 Excelで書き出し", key="staff_export_xlsx"):
+            from staff_io import staff_to_xlsx
+            st.download_button(
+                "📥 スタッフ一覧.xlsx をダウンロード",
+                data=staff_to_xlsx(config.export_staff()),
+                file_name="スタッフ一覧.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                key="staff_download_xlsx"
+            )
+
+
+def _import_messages(result):
+    """一括登録の結果の表示内容 [(レベル, メッセージ)]"""
+    added = sum(len(names) for names in result.added.values())
+    messages = [("success", f"{added}名を登録しました。")]
+    if result.duplicates:
+        messages.append(("info", f"登録済み・重複のため{len(result.duplicates)}名を除きました: "
+                         + "、".join(result.duplicates)))
+    if result.invalid:
+        messages.append(("warning", "以下の行は登録できませんでした:\n\n" + "\n".join(
+            f"- {number}件目: {reason}" for number, reason in result.invalid
+        )))
+    return messages
+
+
+# スタッフ種別ごとの表示名・ウィジェットのキー
+STAFF_KINDS = {
+    "security": {"title": "警備担当者", "key": "sec"},
+    "facility": {"title": "設備担当者", "key": "fac"},
+}
+
+
+def _staff_methods(config, kind):
+    """種別に対応する (一覧, 追加, 削除)"""
+    if kind == "security":
+        return config.security_staff_list, config.add_security_staff, config.remove_security_staff
+    return config.facility_staff_list, config.add_facility_staff, config.remove_facility_staff
+
+
+def _add_staff(config, kind):
+    """追加ボタンのコールバック（入力欄のクリアもここで行う）"""
+    input_key = f"new_{kind}"
+    name = st.session_state.get(input_key, "")
+    _, add, _ = _staff_methods(config, kind)
+    if not name:
+        st.session_state[f"{kind}_message"] = ("warning", "名前を入力してください。")
+    elif add(name):
+        st.session_state[f"{kind}_message"] = ("success", f"'{name}' を追加しました。")
+        st.session_state[input_key] = ""
+    else:
+        st.session_state[f"{kind}_message"] = ("warning", "既に登録されているか、無効な名前です。")
+
+
+def _remove_staff(config, kind, name):
+    """削除ボタンのコールバック"""
+    _, _, remove = _staff_methods(config, kind)
+    remove(name)
+    st.session_state[f"{kind}_message"] = ("success", f"'{name}' を削除しました。")
+
+
+@st.fragment
+def render_staff_column(config, kind):
+    """担当者の追加・一覧（操作時はこの列だけを再実行）"""
+    labels = STAFF_KINDS[kind]
+    st.subheader(labels["title"])
+    
+    st.text_input(f"新しい{labels['title']}を追加", key=f"new_{kind}")
+    st.button("追加", key=f"add_{kind}", on_click=_add_staff, args=(config, kind))
+    
+    message = st.session_state.pop(f"{kind}_message", None)
+    if message:
+        level, text = message
+        getattr(st, level)(text)
+    
+    staff_list, _, _ = _staff_methods(config, kind)
+    st.markdown(f"**登録済み{labels['title']}:**")
+    for staff in staff_list:
+        col_name, col_delete = st.columns([3, 1])
+        with col_name:
+            st.text(staff)
+        with col_delete:
+            st.button("削除", key=f"del_{labels['key']}_{staff}",
+                      on_click=_remove_staff, args=(config, kind, staff))
+
+@st.fragment
+def render_history_tab():
+    """履歴タブ"""
+    st.header("作成履歴")
+
+    # タブは表示していなくても毎回実行されるため、履歴のデータベースは開いたときだけ読み込む
+    if not st.toggle("履歴を表示", key="history_open",
+                     help="作成履歴のデータベースを読み込みます（この操作の間だけこのタブを再実行）"):
+        return
+
+    today = datetime.today().date()
+    last_month_end = today.replace(day=1) - timedelta(days=1)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        post = st.selectbox("ポスト", [post for post, _ in POSTS], key="history_post")
+    with col2:
+        period = st.date_input(
+            "期間",
+            value=(last_month_end.replace(day=1), last_month_end),
+            key="history_period"
+        )
+
+    if not period or len(period) != 2:
+        return
+    start_date, end_date = period
+    try:
+        history = get_report_history()
+        rows = history.staff_on_post(post, start_date, end_date)
+        counts = history.post_counts(start_date, end_date) if rows else []
+    except sqlite3.Error as e:
+        st.error(f"作成履歴を読み込めません: {e}")
+        return
+    if rows:
+        st.markdown(f"**{post}の担当者（{len(rows)}件）**")
+        st.dataframe(
+            [{"日付": d.strftime('%Y/%m/%d'), "担当者": staff} for d, staff in rows],
+            use_container_width=True,
+            hide_index=True
+        )
+        st.markdown("**担当者・ポスト別の回数**")
+        st.dataframe(
+            [{"担当者": staff, "ポスト": p, "回数": count} for staff, p, count in counts],
+            use_container_width=True,
+            hide_index=True
+        )
+    else:
+        st.info("この期間の履歴はありません。")
+
+
+@st.fragment
+def render_analytics_tab():
+    """集計タブ（巡回開始時刻の分布・劇場の使用と巡回の省略・担当者ごとの回数）"""
+    st.header("集計")
+
+    # タブは表示していなくても毎回実行されるため、集計は開いたときだけ行う
+    if not st.toggle("集計を表示", key="analytics_open",
+                     help="作成した日報を読み込んで集計します（この操作の間だけこのタブを再実行）"):
+        return
+    from analytics import THEATER_LABELS, get_folder_analytics, get_report_analytics
+
+    today = datetime.today().date()
+    last_month_end = today.replace(day=1) - timedelta(days=1)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        source = st.radio("集計する日報", ["作成履歴", "フォルダ内の日報ファイル"],
+                          key="analytics_source", horizontal=True)
+        folder = ""
+        if source == "フォルダ内の日報ファイル":
+            folder = st.text_input("フォルダのパス（サーバー上）", key="analytics_folder")
+    with col2:
+        period = st.date_input(
+            "期間",
+            value=(last_month_end.replace(day=1), last_month_end),
+            key="analytics_period"
+        )
+
+    # 前回から追加された日報だけを読み込む
+    if source == "作成履歴":
+        analytics = get_report_analytics()
+        try:
+            analytics.refresh_from_history(get_report_history())
+        except sqlite3.Error as e:
+            st.error(f"作成履歴を読み込めません: {e}")
+            return
+    else:
+        if not folder:
+            st.info("日報ファイル（.xlsx）が保存されているフォルダを指定してください。")
+            return
+        if not os.path.isdir(folder):
+            st.error(f"フォルダが見つかりません: {folder}")
+            return
+        analytics = get_folder_analytics(folder)
+        with st.spinner("日報ファイルを読み込んでいます..."):
+            analytics.scan_folder(folder)
+
+    if not period or len(period) != 2:
+        return
+    start_date, end_date = period
+    summary = analytics.summary(start_date, end_date)
+    if not summary["reports"]:
+        st.info("この期間の日報はありません。")
+        return
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("日報数", summary["reports"])
+    col2.metric("平均巡回開始", summary["average_start"] or "-")
+    col3.metric("楽屋使用日数", summary["theater_days"]["medium"])
+    col4.metric("巡回を省略した日数", summary["days_with_skips"])
+
+    st.markdown("**4ポストの巡回開始時刻の分布**")
+    st.bar_chart(
+        [{"開始時刻": start, "日数": count} for start, count in summary["start_distribution"]],
+        x="開始時刻",
+        y="日数"
+    )
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("**劇場の使用日数**")
+        st.dataframe(
+            [{"劇場": THEATER_LABELS[name], "日数": days} for name, days in summary["theater_days"].items()]
+            + [{"劇場": "巡回を省略した枠（合計）", "日数": summary["skipped_patrols"]}],
+            use_container_width=True,
+            hide_index=True
+        )
+    with col2:
+        st.markdown("**勤務区分**")
+        st.dataframe(
+            [{"勤務区分": work_type, "日数": days} for work_type, days in summary["work_types"].items()],
+            use_container_width=True,
+            hide_index=True
+        )
+
+    st.markdown("**担当者・ポスト別の回数**")
+    st.dataframe(
+        [{"担当者": staff, "ポスト": post, "回数": count} for staff, post, count in summary["post_counts"]],
+        use_container_width=True,
+        hide_index=True
+    )
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,162 @@
+"""XMLエンジン（XmlPatchEngine）とopenpyxlエンジンの出力の一致・通常処理への切り替えのテスト
+
+テンプレートは benchmarks/templates.py の合成テンプレート（実際のテンプレートと同じ
+「M.D」形式の日付シートと結合セル）を使う。
+"""
+import io
+import zipfile
+from dataclasses import replace
+from datetime import date
+
+import pytest
+
+openpyxl = pytest.importorskip("openpyxl")
+
+from benchmarks.templates import TEMPLATE_SPECS, make_template
+from excel.write_plan import WritePlan
+from excel.writer import FONT_SIZE_CELLS, ExcelWriter
+from excel.xml_writer import XmlPatchEngine, XmlPatchUnsupported
+from models import PatrolData
+
+MONTH = 10
+REPORT_DATE = date(2026, MONTH, 3)
+SHEET = f"{MONTH}.{REPORT_DATE.day}"
+SEEDS = range(5)
+
+PATROL_DATA = PatrolData(
+    post4="山田 太郎",
+    post5="佐藤 次郎",
+    post1="鈴木 三郎",
+    supervisor="田中 四郎",
+    patrol_start="21:00頃",
+    large_theater_used=True,
+    medium_theater_used=False,
+    small_theater_used=True,
+    weather="晴",
+    work_type="通常"
+)
+VARIANTS = [
+    PATROL_DATA,
+    replace(PATROL_DATA, patrol_start="22:00頃", medium_theater_used=True, work_type="早出"),
+    replace(PATROL_DATA, large_theater_used=False, small_theater_used=False, work_type="残業"),
+]
+
+
+@pytest.fixture(scope="module")
+def template():
+    return make_template(TEMPLATE_SPECS[0], month=MONTH)
+
+
+def sheet_contents(output_bytes):
+    """全ワークシートの {シート名: {セル番地: (値, フォントサイズ)}}"""
+    wb = openpyxl.load_workbook(io.BytesIO(output_bytes))
+    return {
+        ws.title: {
+            cell.coordinate: (cell.value, cell.font.sz)
+            for row in ws.iter_rows() for cell in row
+            if cell.value is not None or cell.coordinate in FONT_SIZE_CELLS
+        }
+        for ws in wb.worksheets
+    }
+
+
+def write_with(engine, template, patrol_data, seed):
+    return ExcelWriter(engine=engine, seed=seed).write_report(template, patrol_data, REPORT_DATE)
+
+
+def rewrite_member(template, path, rewrite):
+    """zip内のメンバーpathをrewrite(文字列)の結果に置き換えたxlsxを返す"""
+    output = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(template)) as zin, zipfile.ZipFile(output, "w") as zout:
+        for info in zin.infolist():
+            data = zin.read(info)
+            if info.filename == path:
+                data = rewrite(data.decode("utf-8")).encode("utf-8")
+            zout.writestr(info, data)
+    return output.getvalue()
+
+
+def sheet_path(template, sheet_name):
+    with zipfile.ZipFile(io.BytesIO(template)) as zin:
+        return XmlPatchEngine().read_sheet_paths(zin)[sheet_name]
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("patrol_data", VARIANTS, ids=[p.work_type for p in VARIANTS])
+def test_engines_write_same_values_and_fonts(template, patrol_data, seed):
+    expected = sheet_contents(write_with("openpyxl", template, patrol_data, seed))
+    actual = sheet_contents(write_with("xml", template, patrol_data, seed))
+    assert actual == expected
+
+
+def test_batch_matches_openpyxl(template):
+    data = {date(2026, MONTH, day): PATROL_DATA for day in (1, 2, 5)}
+    results = {
+        engine: ExcelWriter(engine=engine, seed=7).write_reports(template, data)
+        for engine in ("openpyxl", "xml")
+    }
+    assert results["xml"].written_dates == results["openpyxl"].written_dates
+    assert sheet_contents(results["xml"].output_bytes) == sheet_contents(results["openpyxl"].output_bytes)
+
+
+def test_other_members_are_copied_unchanged(template):
+    output = write_with("xml", template, PATROL_DATA, 0)
+    patched = {sheet_path(template, SHEET), "xl/styles.xml"}
+    with zipfile.ZipFile(io.BytesIO(template)) as zin, zipfile.ZipFile(io.BytesIO(output)) as zout:
+        assert zout.namelist() == zin.namelist()
+        for name in zin.namelist():
+            if name not in patched and "/worksheets/" not in name:
+                assert zout.read(name) == zin.read(name), name
+
+
+def template_with(**cells):
+    """合成テンプレートの対象シートにセルの値を追加したxlsx"""
+    wb = openpyxl.load_workbook(io.BytesIO(make_template(TEMPLATE_SPECS[0], month=MONTH)))
+    for coordinate, value in cells.items():
+        wb[SHEET][coordinate] = value
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def test_cell_without_reference_falls_back_to_openpyxl():
+    # 書き込み先の行（4行目）のセルからr属性を取り除く
+    template = template_with(A4="見出し")
+    broken = rewrite_member(
+        template, sheet_path(template, SHEET),
+        lambda xml: xml.replace('<c r="A4"', "<c", 1)
+    )
+    assert broken != template
+    plan = WritePlan([(SHEET, "I4", "晴")])
+    with pytest.raises(XmlPatchUnsupported):
+        XmlPatchEngine().patch(broken, plan)
+
+    expected = sheet_contents(write_with("openpyxl", broken, PATROL_DATA, 3))
+    assert sheet_contents(write_with("xml", broken, PATROL_DATA, 3)) == expected
+
+
+def test_formula_target_falls_back_to_openpyxl():
+    template = template_with(E10="=A1")
+
+    plan = WritePlan([(SHEET, "E10", "山田 太郎")])
+    with pytest.raises(XmlPatchUnsupported):
+        XmlPatchEngine().patch(template, plan)
+
+    output = write_with("xml", template, PATROL_DATA, 1)
+    assert sheet_contents(output) == sheet_contents(write_with("openpyxl", template, PATROL_DATA, 1))
+    assert openpyxl.load_workbook(io.BytesIO(output))[SHEET]["E10"].value == PATROL_DATA.post1
+
+
+def test_formula_value_falls_back_to_openpyxl(template):
+    plan = WritePlan([(SHEET, "I34", "=H34")])
+    with pytest.raises(XmlPatchUnsupported):
+        XmlPatchEngine().patch(template, plan)
+
+
+def test_unknown_sheet(template):
+    plan = WritePlan([("12.31", "I4", "晴")])
+    with pytest.raises(ValueError, match="12.31"):
+        XmlPatchEngine().patch(template, plan)
+    for engine in ("openpyxl", "xml"):
+        with pytest.raises(ValueError, match="12.31"):
+            ExcelWriter(engine=engine, seed=0).write_report(template, PATROL_DATA, date(2026, 12, 31))
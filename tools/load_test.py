@@ -0,0 +1,298 @@
+"""同時セッション数ごとの負荷試験
+
+streamlit_app.py を1プロセス内で複数のセッション（StreamlitのAppTest）として動かし、
+各セッションで入力欄の選択・テンプレートのアップロード・「日報作成」を同時に行う。
+再実行（rerun）と日報作成の待ち時間のp50/p95/p99、スループット、セッションあたりの
+メモリ（RSS）増加量を表示する。
+
+    python tools/load_test.py
+    python tools/load_test.py --sessions 1 4 8 16 --workers 2 --json load.json
+
+AppTestはファイルのアップロードに対応していないため、st.file_uploader だけを
+合成したテンプレートを返す関数に差し替えて実行する（それ以外の画面の処理はそのまま）。
+また、AppTestは実行のたびにStreamlitのRuntimeを差し替えるため、同じプロセスで同時に
+スクリプトを実行できない。スクリプトの実行はロックで1つずつ行い、待ち時間も再実行の時間に
+含める（日報の作成はアプリのジョブ実行器で並行して進む）。
+担当者名簿・作成履歴は一時フォルダに作成し、実際の設定ファイル・履歴には書き込まない。
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+CREATE_BUTTON = "📋 日報作成"
+SECURITY_STAFF = ("山田 太郎", "佐藤 次郎", "鈴木 三郎")
+FACILITY_STAFF = ("高橋 四郎",)
+# 作成の完了を確認する間隔[秒]
+POLL_INTERVAL = 0.01
+
+# AppTestのスクリプト実行は同時に1つだけ
+_RUN_LOCK = threading.Lock()
+
+
+def _app_with_upload(template_path):
+    """st.file_uploaderをテンプレートを返す関数に差し替えてアプリを実行（AppTest用）"""
+    import io
+    import os
+    import streamlit as st
+    import streamlit_app
+
+    class _UploadedTemplate(io.BytesIO):
+        # UploadedFileと同じく name・size を持ち、getbuffer()で内容を参照できる
+        def __init__(self, data, name):
+            super().__init__(data)
+            self.name = name
+            self.size = len(data)
+
+    with open(template_path, "rb") as f:
+        data = f.read()
+    st.file_uploader = lambda *args, **kwargs: _UploadedTemplate(data, os.path.basename(template_path))
+    streamlit_app.main()
+
+
+def percentile(values, percent):
+    """最近傍順位法の百分位数"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, -(-len(ordered) * percent // 100) - 1))
+    return ordered[int(index)]
+
+
+def latency_summary(seconds):
+    """待ち時間[秒]の一覧をms単位のp50/p95/p99にまとめる"""
+    if not seconds:
+        return {"count": 0}
+    return {
+        "count": len(seconds),
+        "p50_ms": percentile(seconds, 50) * 1000,
+        "p95_ms": percentile(seconds, 95) * 1000,
+        "p99_ms": percentile(seconds, 99) * 1000,
+        "mean_ms": statistics.fmean(seconds) * 1000,
+        "max_ms": max(seconds) * 1000,
+    }
+
+
+def rss_bytes():
+    """現在のプロセスの常駐メモリ（取得できない環境ではピーク値）"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linuxは KB、macOSは バイト
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class LoadSession:
+    """1ユーザー分のセッション（入力・アップロード・日報作成）"""
+
+    def __init__(self, template_path, config, timeout, fast_engine=False, output_profile=None):
+        from streamlit.testing.v1 import AppTest
+        self.app = AppTest.from_function(
+            _app_with_upload, kwargs={"template_path": template_path}, default_timeout=timeout
+        )
+        self.app.session_state["config"] = config
+        self.timeout = timeout
+        self.fast_engine = fast_engine
+        self.output_profile = output_profile
+        self.rerun_seconds = []  # 順番待ちを含む再実行の時間
+        self.script_seconds = []  # スクリプトの実行だけの時間
+        self.generation_seconds = None
+        self.error = None
+
+    def _check_errors(self, stage):
+        """画面にエラーが表示されていれば、その内容で失敗にする"""
+        if self.app.error:
+            raise RuntimeError(f"{stage}: {self.app.error[0].value}")
+
+    def _run(self):
+        started = time.perf_counter()
+        with _RUN_LOCK:
+            script_started = time.perf_counter()
+            self.app.run()
+            finished = time.perf_counter()
+        self.rerun_seconds.append(finished - started)
+        self.script_seconds.append(finished - script_started)
+        if self.app.exception:
+            raise RuntimeError(self.app.exception[0].value)
+
+    def open(self):
+        """初回表示と入力欄の選択（日報作成の前まで）"""
+        self._run()
+        for key, name in zip(("post4", "post5", "post1"), SECURITY_STAFF):
+            self.app.selectbox(key=key).set_value(name)
+        self.app.selectbox(key="supervisor").set_value(FACILITY_STAFF[0])
+        self.app.checkbox(key="fast_engine").set_value(self.fast_engine)
+        if self.output_profile:
+            self.app.selectbox(key="output_profile").set_value(self.output_profile)
+        self._run()
+        # テンプレートの確認でエラーになった場合は作成ボタンが表示されない
+        self._check_errors("入力")
+
+    def create_report(self):
+        """「日報作成」を押して、作成完了後の結果表示までの時間を計測"""
+        from jobs import get_job_executor
+        started = time.perf_counter()
+        button = next((b for b in self.app.button if b.label == CREATE_BUTTON), None)
+        if button is None:
+            raise RuntimeError(f"「{CREATE_BUTTON}」ボタンが表示されていません。")
+        button.click()
+        self._run()
+        self._check_errors("日報作成")
+        job_id = self.app.session_state["report_job"]["id"]
+        executor = get_job_executor()
+        deadline = started + self.timeout
+        while True:
+            job = executor.get(job_id)
+            if job is None or job.finished:
+                break
+            if time.perf_counter() > deadline:
+                raise TimeoutError(f"{self.timeout}秒以内に作成が完了しませんでした。")
+            time.sleep(POLL_INTERVAL)
+        self.generation_seconds = time.perf_counter() - started
+        # 作成結果（ダウンロードボタン）の表示
+        self._run()
+        self._check_errors("作成結果")
+
+
+def run_level(sessions, template_path, config, timeout, fast_engine=False, output_profile=None):
+    """同時セッション数1段階分を実行して結果を返す"""
+    rss_before = rss_bytes()
+    clients = [LoadSession(template_path, config, timeout, fast_engine, output_profile)
+               for _ in range(sessions)]
+    # 全セッションが入力を終えてから同時に「日報作成」を押す
+    ready = threading.Barrier(sessions + 1)
+
+    def drive(client):
+        try:
+            client.open()
+        except Exception as e:
+            client.error = f"{type(e).__name__}: {e}"
+        ready.wait()
+        if client.error is None:
+            try:
+                client.create_report()
+            except Exception as e:
+                client.error = f"{type(e).__name__}: {e}"
+
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        futures = [pool.submit(drive, client) for client in clients]
+        ready.wait()
+        started = time.perf_counter()
+        for future in futures:
+            future.result()
+        elapsed = time.perf_counter() - started
+    rss_after = rss_bytes()
+
+    completed = [client for client in clients if client.error is None]
+    return {
+        "sessions": sessions,
+        "completed": len(completed),
+        "errors": [client.error for client in clients if client.error is not None],
+        "seconds": elapsed,
+        "throughput_per_s": len(completed) / elapsed if elapsed else None,
+        "rerun": latency_summary([s for client in clients for s in client.rerun_seconds]),
+        "script": latency_summary([s for client in clients for s in client.script_seconds]),
+        "generation": latency_summary([client.generation_seconds for client in completed]),
+        "rss_before_mb": rss_before / (1024 * 1024),
+        "rss_after_mb": rss_after / (1024 * 1024),
+        "rss_per_session_mb": (rss_after - rss_before) / sessions / (1024 * 1024),
+    }
+
+
+def _prepare(workdir, template_spec):
+    """合成テンプレート・担当者名簿・作成履歴を一時フォルダに用意"""
+    import history
+    from benchmarks.templates import TEMPLATE_SPECS, make_template
+    from config import Config
+
+    spec = next(spec for spec in TEMPLATE_SPECS if spec.name == template_spec)
+    template_path = os.path.join(workdir, "template.xlsx")
+    today = datetime.today().date()
+    with open(template_path, "wb") as f:
+        # 単日モードは本日のシートに書き込むため、本日までのspec.sheets日分のシートにする
+        f.write(make_template(spec, month=today.month, first_day=max(1, today.day - spec.sheets + 1)))
+
+    config = Config(os.path.join(workdir, "daily_report_config.json"))
+    config.import_staff([("警備", name) for name in SECURITY_STAFF]
+                        + [("設備", name) for name in FACILITY_STAFF])
+    # アプリが共有する履歴を一時フォルダのデータベースに差し替える
+    history._shared_history = history.ReportHistory(os.path.join(workdir, "history.sqlite3"))
+    return template_path, config
+
+
+def _print_level(result):
+    rerun, generation = result["rerun"], result["generation"]
+    line = (f"{result['sessions']:4d}  {result['completed']:4d}  "
+            f"{result['throughput_per_s'] or 0:8.2f}/s  ")
+    for summary in (rerun, generation):
+        if summary["count"]:
+            line += f"{summary['p50_ms']:8.0f} {summary['p95_ms']:8.0f} {summary['p99_ms']:8.0f}  "
+        else:
+            line += f"{'-':>8} {'-':>8} {'-':>8}  "
+    line += f"{result['rss_per_session_mb']:8.2f} MB"
+    print(line)
+    for error in result["errors"]:
+        print(f"      エラー: {error}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="同時セッション数ごとの負荷試験")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 8],
+                        help="同時に操作するセッション数（複数指定で段階的に増やす）")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="同時に日報を作成する数（DAILY_REPORT_MAX_WORKERS、省略時はアプリの既定値）")
+    parser.add_argument("--template", default="monthly",
+                        choices=("small", "monthly", "many_merges", "large"),
+                        help="合成テンプレートの種類（benchmarks/templates.py）")
+    parser.add_argument("--fast-engine", action="store_true", help="高速モード（XMLエンジン）で作成")
+    parser.add_argument("--output-profile", default=None, help="出力形式（default/fast/small）")
+    parser.add_argument("--timeout", type=float, default=120, help="1回の操作の待ち時間の上限[秒]")
+    parser.add_argument("--json", dest="json_path", help="結果をJSONで保存するパス")
+    args = parser.parse_args(argv)
+
+    if args.workers is not None:
+        # ジョブ実行器の作成前に設定する
+        os.environ["DAILY_REPORT_MAX_WORKERS"] = str(args.workers)
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="daily_report_load_") as workdir:
+        template_path, config = _prepare(workdir, args.template)
+        # 読み込み・テンプレート解析の初回分を計測から除く
+        run_level(1, template_path, config, args.timeout, args.fast_engine, args.output_profile)
+
+        print(f"{'同時':>4}  {'完了':>4}  {'スループット':>9}  "
+              f"{'再実行 p50':>8} {'p95':>8} {'p99':>8}  "
+              f"{'作成 p50':>8} {'p95':>8} {'p99':>8}  {'RSS/セッション':>8}")
+        for sessions in args.sessions:
+            result = run_level(sessions, template_path, config, args.timeout,
+                               args.fast_engine, args.output_profile)
+            results.append(result)
+            _print_level(result)
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "template": args.template,
+                "workers": args.workers,
+                "fast_engine": args.fast_engine,
+                "output_profile": args.output_profile,
+                "levels": results,
+            }, f, ensure_ascii=False, indent=2)
+    return 1 if any(result["errors"] for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
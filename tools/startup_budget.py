@@ -0,0 +1,116 @@
+"""起動時間の計測スクリプト
+
+モジュールごとの読み込み時間（python -X importtime）と、新しいプロセスで
+streamlit_app.pyを初回表示するまでの時間を計測する。
+
+    python tools/startup_budget.py
+    python tools/startup_budget.py --budget-ms 1500 --json startup.json
+
+予算を超えた場合、または日報作成時まで遅らせている重いモジュールが
+初回表示で読み込まれていた場合は終了コード1を返す。
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT_DIR, "streamlit_app.py")
+
+# 初回表示では読み込まれないはずのモジュール
+DEFERRED_MODULES = ("openpyxl", "excel.writer", "excel.template_cache", "numpy")
+
+_FIRST_RENDER_CODE = """
+import json, sys, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+at = AppTest.from_file({app_path!r}, default_timeout=60).run()
+rendered = time.perf_counter()
+print(json.dumps({{
+    "apptest_import_ms": (imported - started) * 1000,
+    "first_render_ms": (rendered - imported) * 1000,
+    "exceptions": [str(e.value) for e in at.exception],
+    "deferred_loaded": [m for m in {deferred!r} if m in sys.modules],
+}}))
+"""
+
+
+def measure_import_times(module="streamlit_app"):
+    """python -X importtimeの結果を {モジュール: (自身[ms], 累積[ms], 階層)} で返す"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT_DIR, capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        times[name.strip()] = (int(self_us) / 1000, int(cumulative_us) / 1000, depth)
+    return times
+
+
+def measure_first_render():
+    """新しいプロセスで初回表示までの時間を計測"""
+    started = time.perf_counter()
+    code = _FIRST_RENDER_CODE.format(app_path=APP_PATH, deferred=DEFERRED_MODULES)
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT_DIR, capture_output=True, text=True, check=True
+    )
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    report["process_ms"] = (time.perf_counter() - started) * 1000
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="起動時間の計測")
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="初回表示（スクリプト実行）の予算[ms]")
+    parser.add_argument("--top", type=int, default=15, help="表示するモジュール数")
+    parser.add_argument("--json", dest="json_path", help="結果をJSONで保存するパス")
+    args = parser.parse_args(argv)
+
+    import_times = measure_import_times()
+    first_render = measure_first_render()
+
+    # streamlit_appが直接読み込むモジュール（インタープリタ起動時の読み込みは除く）
+    direct = sorted(
+        ((name, cumulative) for name, (_, cumulative, depth) in import_times.items() if depth == 1),
+        key=lambda item: item[1], reverse=True
+    )
+    print(f"== streamlit_app の読み込み時間: {import_times['streamlit_app'][1]:.1f} ms ==")
+    print(f"-- 直接読み込むモジュール（上位{args.top}件、累積） --")
+    for name, cumulative in direct[:args.top]:
+        print(f"{cumulative:10.1f} ms  {name}")
+    print()
+    print("== 初回表示 ==")
+    print(f"プロセス全体:         {first_render['process_ms']:10.1f} ms")
+    print(f"AppTestの読み込み:    {first_render['apptest_import_ms']:10.1f} ms")
+    print(f"スクリプト実行:       {first_render['first_render_ms']:10.1f} ms")
+    if first_render["deferred_loaded"]:
+        print(f"初回表示で読み込まれた重いモジュール: {', '.join(first_render['deferred_loaded'])}")
+    if first_render["exceptions"]:
+        print(f"例外: {first_render['exceptions']}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "import_ms": {name: cumulative for name, cumulative in direct},
+                "first_render": first_render,
+                "budget_ms": args.budget_ms,
+            }, f, ensure_ascii=False, indent=2)
+
+    failed = bool(first_render["deferred_loaded"] or first_render["exceptions"])
+    if args.budget_ms is not None and first_render["first_render_ms"] > args.budget_ms:
+        print(f"予算超過: {first_render['first_render_ms']:.1f} ms > {args.budget_ms:.1f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
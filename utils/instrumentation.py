@@ -0,0 +1,95 @@
+import json
+import logging
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+logger = logging.getLogger("daily_report.instrumentation")
+
+# 1を指定すると日報作成ごとに段階別の時間をログに出す
+INSTRUMENT_ENV = "DAILY_REPORT_INSTRUMENT"
+
+_NULL_STAGE = nullcontext()
+
+
+class Instrumentation:
+    """日報作成の段階ごとの処理時間と件数を記録する
+
+    stage() で囲んだ区間の時間を段階名ごとに合計し、count() でセルの書き込み数・
+    結合範囲の走査数・入出力のバイト数などを数える。finish() で1回分の結果を
+    構造化したログとして出力し、last_report に残す（画面のデバッグ表示用）。
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = Counter()
+        self.last_report = None
+        self._started_at = None
+
+    def start(self):
+        """1回分の計測を開始（前回の値は捨てる）"""
+        self.stages = {}
+        self.counters = Counter()
+        self._started_at = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        """withで囲んだ区間の時間を段階名ごとに合計"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - started
+
+    def count(self, name, value=1):
+        self.counters[name] += value
+
+    def snapshot(self, operation):
+        """計測結果を辞書で返す（時間はミリ秒）"""
+        total = time.perf_counter() - self._started_at if self._started_at is not None else None
+        return {
+            "operation": operation,
+            "total_ms": round(total * 1000, 3) if total is not None else None,
+            "stages_ms": {name: round(seconds * 1000, 3) for name, seconds in self.stages.items()},
+            "counters": dict(self.counters),
+        }
+
+    def finish(self, operation):
+        """1回分の計測を終えてログに出力し、結果を返す"""
+        report = self.snapshot(operation)
+        self.last_report = report
+        logger.info("%s %s", operation, json.dumps(report, ensure_ascii=False),
+                    extra={"instrumentation": report})
+        return report
+
+
+class NullInstrumentation:
+    """計測しない場合の代わり（何もしない）"""
+
+    enabled = False
+    last_report = None
+
+    def start(self):
+        pass
+
+    def stage(self, name):
+        return _NULL_STAGE
+
+    def count(self, name, value=1):
+        pass
+
+    def finish(self, operation):
+        return None
+
+
+NULL_INSTRUMENTATION = NullInstrumentation()
+
+
+def instrumentation_from_env():
+    """環境変数 DAILY_REPORT_INSTRUMENT が指定されていれば計測を有効にする"""
+    if os.environ.get(INSTRUMENT_ENV, "") not in ("", "0"):
+        return Instrumentation()
+    return NULL_INSTRUMENTATION
@@ -0,0 +1,43 @@
+import logging
+import sys
+
+logger = logging.getLogger("daily_report")
+
+
+def _active_streamlit():
+    """Streamlitのスクリプト実行中であればstreamlitモジュールを返す
+
+    streamlitが読み込まれていない場合は読み込まない（起動時間と画面外での利用のため）。
+    """
+    st = sys.modules.get("streamlit")
+    if st is None:
+        return None
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+    except ImportError:
+        return None
+    if get_script_run_ctx(suppress_warning=True) is None:
+        return None
+    return st
+
+
+def _notify(level, log_level, message):
+    logger.log(log_level, message)
+    st = _active_streamlit()
+    if st is not None:
+        getattr(st, level)(message)
+
+
+def info(message):
+    """情報メッセージ（ログと画面）"""
+    _notify("info", logging.INFO, message)
+
+
+def warning(message):
+    """警告メッセージ（ログと画面）"""
+    _notify("warning", logging.WARNING, message)
+
+
+def error(message):
+    """エラーメッセージ（ログと画面）"""
+    _notify("error", logging.ERROR, message)
@@ -1,235 +1,219 @@
-from datetime import datetime, timedelta
 import random
-from models import TimeRecord
+from collections import namedtuple
+from models import SKIPPED, TimeRecord, format_minutes, to_minutes
+
+# ---- 巡回ルールの定義（データ） ----
+# 会場を追加する場合はTHEATERSと各ルールに、開始時刻を追加する場合はSTART_SLOTSに追記する。
+
+# 劇場（ビットマスクのビット）
+THEATERS = (
+    ('large', 1),   # 大劇場
+    ('medium', 2),  # 中劇場（楽屋）
+    ('small', 4),   # 小劇場
+)
+
+COMMENT_OK = "異常なし"
+COMMENT_PARTIAL = "異常なし(楽屋使用中の為その周辺は巡回実施せず)"
+COMMENT_SKIPPED = "楽屋使用中の為巡回実施せず"
+COMMENT_LATE = "異常なし(開始が遅いためトイレを重点的に巡回)"
+COMMENT_LATE_PARTIAL = "異常なし(開始が遅いためトイレを重点的に巡回、楽屋周りは除く)"
+
+# 4ポストの巡回順序（開始セル, 終了セル）
+ROUTE_4POST = (
+    ('C17', 'E17'),
+    ('C18', 'E18'),
+    ('C23', 'E23'),
+    ('C22', 'E22'),
+    ('C16', 'E16'),
+    ('C21', 'E21'),
+    ('C15', 'E15'),
+)
+
+StartSlot = namedtuple('StartSlot', ['base', 'spread', 'duration', 'default_comment', 'partial_comment'])
+
+# 巡回開始時刻ごとの設定（基準時刻[分], ランダム幅[分], 1か所の所要時間[分], コメント）
+START_SLOTS = {
+    "21:00頃": StartSlot(21 * 60, 3, 10, COMMENT_OK, COMMENT_PARTIAL),
+    "22:00頃": StartSlot(22 * 60, 10, 5, COMMENT_LATE, COMMENT_LATE_PARTIAL),
+}
+DEFAULT_START_SLOT = "21:00頃"
+
+# 劇場使用時の4ポストの例外（順番 -> 'partial': 周辺を除いて巡回 / 'skip': 巡回しない）
+RULES_4POST = {
+    'large': {4: 'partial', 6: 'partial'},
+    'medium': {3: 'partial', 5: 'skip'},
+    'small': {},
+}
+
+# 5ポストの巡回（開始セル, 終了セル, 所要時間[分]）
+ROUTE_5POST = (
+    ('C26', 'E26', 15),
+    ('C27', 'E27', 15),
+)
+POST5_BASE, POST5_SPREAD = 22 * 60, 5
+# 劇場使用時の5ポストの例外（順番 -> 'partial'）
+RULES_5POST = {
+    'large': {0: 'partial'},
+    'medium': {},
+    'small': {1: 'partial'},
+}
+
+# その他の時間（基準時刻[分], ランダム幅[分]）
+OTHER_TIMES = (
+    ('morning_4post', 7 * 60, 20),
+    ('morning_5post', 7 * 60 + 15, 15),
+    ('morning_1post', 8 * 60 + 48, 8),
+    ('morning_4post_2', 7 * 60 + 30, 20),
+    ('night_4post', 22 * 60, 10),
+    ('patrol_4post', 21 * 60 + 30, 3),
+    ('patrol_4post_end', 22 * 60 + 50, 5),
+)
+
+# ---- 読み込み時に作成する参照表 ----
+
+# 1か所分の巡回: 開始セル, 終了セル, 開始からの経過[分]（開始, 終了）, コメント
+PatrolStep = namedtuple('PatrolStep', ['start_cell', 'end_cell', 'begin', 'end', 'comment'])
+
+
+def theater_mask(large, medium, small):
+    """劇場の使用状況をビットマスクに変換"""
+    used = {'large': large, 'medium': medium, 'small': small}
+    return sum(bit for name, bit in THEATERS if used[name])
+
+
+def _theaters_in(mask):
+    return [name for name, bit in THEATERS if mask & bit]
+
+
+def _compile_4post(slot):
+    """開始時刻1つ分の参照表（ビットマスク -> 巡回手順）"""
+    table = {}
+    for mask in range(1 << len(THEATERS)):
+        exceptions = {}
+        for name in _theaters_in(mask):
+            exceptions.update(RULES_4POST[name])
+        steps = []
+        elapsed = 0
+        for i, (start_cell, end_cell) in enumerate(ROUTE_4POST):
+            rule = exceptions.get(i)
+            if rule == 'skip':
+                steps.append(PatrolStep(start_cell, end_cell, SKIPPED, SKIPPED, COMMENT_SKIPPED))
+                continue
+            comment = slot.partial_comment if rule == 'partial' else slot.default_comment
+            steps.append(PatrolStep(start_cell, end_cell, elapsed, elapsed + slot.duration, comment))
+            elapsed += slot.duration
+        table[mask] = tuple(steps)
+    return table
+
+
+def _compile_5post():
+    """5ポストの参照表（ビットマスク -> 巡回手順）"""
+    table = {}
+    for mask in range(1 << len(THEATERS)):
+        exceptions = {}
+        for name in _theaters_in(mask):
+            exceptions.update(RULES_5POST[name])
+        steps = []
+        elapsed = 0
+        for i, (start_cell, end_cell, duration) in enumerate(ROUTE_5POST):
+            comment = COMMENT_PARTIAL if exceptions.get(i) == 'partial' else COMMENT_OK
+            steps.append(PatrolStep(start_cell, end_cell, elapsed, elapsed + duration, comment))
+            elapsed += duration
+        table[mask] = tuple(steps)
+    return table
+
+
+# (開始時刻, ビットマスク) -> 巡回手順
+TABLE_4POST = {
+    (slot_name, mask): steps
+    for slot_name, slot in START_SLOTS.items()
+    for mask, steps in _compile_4post(slot).items()
+}
+# ビットマスク -> 巡回手順
+TABLE_5POST = _compile_5post()
+
+
+def start_slot(patrol_start):
+    """巡回開始時刻の設定（未定義の値は21:00頃として扱う）"""
+    if patrol_start not in START_SLOTS:
+        patrol_start = DEFAULT_START_SLOT
+    return patrol_start, START_SLOTS[patrol_start]
+
+
+def steps_to_records(steps, start):
+    """巡回手順と開始時刻[分]から(開始セル, 終了セル, TimeRecord)の一覧を作成"""
+    return [
+        (step.start_cell, step.end_cell, TimeRecord(
+            SKIPPED if step.begin == SKIPPED else (start + step.begin) % 1440,
+            SKIPPED if step.end == SKIPPED else (start + step.end) % 1440,
+            step.comment
+        ))
+        for step in steps
+    ]
+
 
 class PatrolTimeGenerator:
-    """巡回時間を生成するクラス"""
-    
+    """巡回時間を生成するクラス
+
+    巡回順序・コメントは読み込み時に作成した参照表から引き、
+    時刻は0時からの分（整数）で計算して出力時だけ文字列にする。
+    seedを指定すると同じ結果を再現できる。
+    """
+
+    def __init__(self, seed=None):
+        self.seed = seed
+        self.random = random.Random(seed)
+
+    def reset(self):
+        """seedから乱数を初期化し直す（同じ入力から同じ時間を生成するため）"""
+        self.random.seed(self.seed)
+
     def generate_4post_times(self, patrol_start, large, medium, small):
         """4ポストの巡回時間を生成"""
-        if patrol_start == "22:00頃":
-            return self._generate_4post_22(large, medium, small)
-        else:  # 21:00頃 or その他
-            return self._generate_4post_21(large, medium, small)
-    
-    def _generate_4post_21(self, large, medium, small):
-        """21:00頃開始の4ポスト巡回時間"""
-        start_time = datetime.strptime("21:00", "%H:%M") + timedelta(minutes=random.randint(0, 3))
-        records = []
-        
-        # 巡回順序とコメントの設定
-        patrol_order = [
-            ('C17', 'E17', 10),
-            ('C18', 'E18', 10),
-            ('C23', 'E23', 10),
-            ('C22', 'E22', 10),
-            ('C16', 'E16', 10),
-            ('C21', 'E21', 10),
-            ('C15', 'E15', 10),
-        ]
-        
-        comments = self._get_comments_21(large, medium, small)
-        
-        current_time = start_time
-        for i, (start_cell, end_cell, duration) in enumerate(patrol_order):
-            if i == 5 and medium and not large and not small:  # 中劇場のみ使用時
-                records.append((start_cell, end_cell, 
-                              TimeRecord("-", "-", comments[i])))
-            elif i == 5 and medium:  # 中劇場使用時
-                records.append((start_cell, end_cell, 
-                              TimeRecord("-", "-", comments[i])))
-            else:
-                end_time = current_time + timedelta(minutes=duration)
-                records.append((start_cell, end_cell, 
-                              TimeRecord(current_time.strftime("%H:%M"), 
-                                       end_time.strftime("%H:%M"), 
-                                       comments[i])))
-                current_time = end_time
-        
-        # 時間の調整（楽屋使用時）
-        if medium:
-            records[6] = ('C15', 'E15', 
-                         TimeRecord(records[4][2].end_time, 
-                                   (datetime.strptime(records[4][2].end_time, "%H:%M") + 
-                                    timedelta(minutes=10)).strftime("%H:%M"), 
-                                   comments[6]))
-        
-        return records
-    
-    def _generate_4post_22(self, large, medium, small):
-        """22:00頃開始の4ポスト巡回時間"""
-        start_time = datetime.strptime("22:00", "%H:%M") + timedelta(minutes=random.randint(0, 10))
-        records = []
-        
-        patrol_order = [
-            ('C17', 'E17', 5),
-            ('C18', 'E18', 5),
-            ('C23', 'E23', 5),
-            ('C22', 'E22', 5),
-            ('C16', 'E16', 5),
-            ('C21', 'E21', 5),
-            ('C15', 'E15', 5),
-        ]
-        
-        comments = self._get_comments_22(large, medium, small)
-        
-        current_time = start_time
-        for i, (start_cell, end_cell, duration) in enumerate(patrol_order):
-            if i == 5 and medium:  # 中劇場使用時
-                records.append((start_cell, end_cell, 
-                              TimeRecord("-", "-", comments[i])))
-            else:
-                end_time = current_time + timedelta(minutes=duration)
-                records.append((start_cell, end_cell, 
-                              TimeRecord(current_time.strftime("%H:%M"), 
-                                       end_time.strftime("%H:%M"), 
-                                       comments[i])))
-                current_time = end_time
-        
-        # 時間の調整（楽屋使用時）
-        if medium:
-            records[6] = ('C15', 'E15', 
-                         TimeRecord(records[4][2].end_time, 
-                                   (datetime.strptime(records[4][2].end_time, "%H:%M") + 
-                                    timedelta(minutes=5)).strftime("%H:%M"), 
-                                   comments[6]))
-        
-        return records
-    
-    def _get_comments_21(self, large, medium, small):
-        """21:00頃開始時のコメント取得"""
-        if large and medium and small:
-            return [
-                "異常なし",
-                "異常なし",
-                "異常なし",
-                "異常なし(楽屋使用中の為その周辺は巡回実施せず)",
-                "異常なし(楽屋使用中の為その周辺は巡回実施せず)",
-                "楽屋使用中の為巡回実施せず",
-                "異常なし(楽屋使用中の為その周辺は巡回実施せず)"
-            ]
-        elif large and medium:
-            return [
-                "異常なし",
-                "異常なし",
-                "異常なし",
-                "異常なし(楽屋使用中の為その周辺は巡回実施せず)",
-                "異常なし(楽屋使用中の為その周辺は巡回実施せず)",
-                "楽屋使用中の為巡回実施せず",
-                "異常なし(楽屋使用中の為その周辺は巡回実施せず)"
-            ]
-        elif large:
-            return [
-                "異常なし",
-                "異常なし",
-                "異常なし",
-                "異常なし",
-                "異常なし(楽屋使用中の為その周辺は巡回実施せず)",
-                "異常なし",
-                "異常なし(楽屋使用中の為その周辺は巡回実施せず)"
-            ]
-        elif medium:
-            return [
-                "異常なし",
-                "異常なし",
-                "異常なし",
-                "異常なし(楽屋使用中の為その周辺は巡回実施せず)",
-                "異常なし",
-                "楽屋使用中の為巡回実施せず",
-                "異常なし"
-            ]
-        else:
-            return ["異常なし"] * 7
-    
-    def _get_comments_22(self, large, medium, small):
-        """22:00頃開始時のコメント取得"""
-        base = "異常なし(開始が遅いためトイレを重点的に巡回"
-        if large and medium:
-            return [
-                base + ")",
-                base + ")",
-                base + ")",
-                base + "、楽屋周りは除く)",
-                base + "、楽屋周りは除く)",
-                "楽屋使用中の為巡回実施せず",
-                base + "、楽屋周りは除く)"
-            ]
-        elif large:
-            return [
-                base + ")",
-                base + ")",
-                base + ")",
-                base + ")",
-                base + "、楽屋周りは除く)",
-                base + ")",
-                base + "、楽屋周りは除く)"
-            ]
-        elif medium:
-            return [
-                base + ")",
-                base + ")",
-                base + ")",
-                base + "、楽屋周りは除く)",
-                base + ")",
-                "楽屋使用中の為巡回実施せず",
-                base + ")"
-            ]
-        else:
-            return [base + ")"] * 7
-    
+        slot_name, slot = start_slot(patrol_start)
+        start = slot.base + self.random.randint(0, slot.spread)
+        return steps_to_records(TABLE_4POST[slot_name, theater_mask(large, medium, small)], start)
+
     def generate_5post_times(self, large, medium, small):
         """5ポストの巡回時間を生成"""
-        start_time = datetime.strptime("22:00", "%H:%M") + timedelta(minutes=random.randint(0, 5))
-        
-        records = []
-        # 1回目の巡回
-        end_time = start_time + timedelta(minutes=15)
-        comment1 = self._get_5post_comment_1(large, medium, small)
-        records.append(('C26', 'E26', 
-                       TimeRecord(start_time.strftime("%H:%M"), 
-                                 end_time.strftime("%H:%M"), 
-                                 comment1)))
-        
-        # 2回目の巡回
-        start_time2 = end_time
-        end_time2 = start_time2 + timedelta(minutes=15)
-        comment2 = self._get_5post_comment_2(large, medium, small)
-        records.append(('C27', 'E27', 
-                       TimeRecord(start_time2.strftime("%H:%M"), 
-                                 end_time2.strftime("%H:%M"), 
-                                 comment2)))
-        
-        return records
-    
-    def _get_5post_comment_1(self, large, medium, small):
-        """5ポスト1回目のコメント"""
-        if large:
-            return "異常なし(楽屋使用中の為その周辺は巡回実施せず)"
-        else:
-            return "異常なし"
-    
-    def _get_5post_comment_2(self, large, medium, small):
-        """5ポスト2回目のコメント"""
-        if small or (large and medium and small):
-            return "異常なし(楽屋使用中の為その周辺は巡回実施せず)"
-        else:
-            return "異常なし"
-    
+        start = POST5_BASE + self.random.randint(0, POST5_SPREAD)
+        return steps_to_records(TABLE_5POST[theater_mask(large, medium, small)], start)
+
     def generate_other_times(self):
         """その他の時間を生成"""
         return {
-            'morning_4post': (datetime.strptime("7:00", "%H:%M") + 
-                            timedelta(minutes=random.randint(0, 20))).strftime("%H:%M").lstrip("0"),
-            'morning_5post': (datetime.strptime("7:15", "%H:%M") + 
-                            timedelta(minutes=random.randint(0, 15))).strftime("%H:%M").lstrip("0"),
-            'morning_1post': (datetime.strptime("8:48", "%H:%M") + 
-                            timedelta(minutes=random.randint(0, 8))).strftime("%H:%M").lstrip("0"),
-            'morning_4post_2': (datetime.strptime("7:30", "%H:%M") + 
-                              timedelta(minutes=random.randint(0, 20))).strftime("%H:%M").lstrip("0"),
-            'night_4post': (datetime.strptime("22:00", "%H:%M") + 
-                          timedelta(minutes=random.randint(0, 10))).strftime("%H:%M").lstrip("0"),
-            'patrol_4post': (datetime.strptime("21:30", "%H:%M") + 
-                           timedelta(minutes=random.randint(0, 3))).strftime("%H:%M").lstrip("0"),
-            'patrol_4post_end': (datetime.strptime("22:50", "%H:%M") + 
-                               timedelta(minutes=random.randint(0, 5))).strftime("%H:%M").lstrip("0")
-        }
\ No newline at end of file
+            key: format_minutes(base + self.random.randint(0, spread)).lstrip("0")
+            for key, base, spread in OTHER_TIMES
+        }
+
+
+# 作成済みの日報で乱数により決まった時刻[分]（other: {キー: 時刻}）
+RecordedTimes = namedtuple('RecordedTimes', ['post4_start', 'post5_start', 'other'])
+
+
+class RecordedTimeGenerator(PatrolTimeGenerator):
+    """作成済みの日報の時刻を使い回す生成器（日報の修正用）
+
+    劇場の使用・勤務区分を変えても巡回開始時刻は変えず、手順の時刻だけを作り直す。
+    巡回開始時刻の区分を変えた場合など、記録した時刻が範囲外のものだけを乱数で作り直す。
+    """
+
+    def __init__(self, recorded, seed=None):
+        super().__init__(seed)
+        self.recorded = recorded
+
+    def generate_4post_times(self, patrol_start, large, medium, small):
+        slot_name, slot = start_slot(patrol_start)
+        start = self.recorded.post4_start
+        if not slot.base <= start <= slot.base + slot.spread:
+            start = slot.base + self.random.randint(0, slot.spread)
+        return steps_to_records(TABLE_4POST[slot_name, theater_mask(large, medium, small)], start)
+
+    def generate_5post_times(self, large, medium, small):
+        return steps_to_records(TABLE_5POST[theater_mask(large, medium, small)], self.recorded.post5_start)
+
+    def generate_other_times(self):
+        return {
+            key: format_minutes(self.recorded.other[key]).lstrip("0")
+            for key, _, _ in OTHER_TIMES
+        }